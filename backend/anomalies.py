@@ -0,0 +1,228 @@
+"""
+Поиск нетипичных сумм
+Для каждой категории и каждого часа суток считается устойчивая база сумм: медиана, MAD
+(медиана абсолютных отклонений) и перцентили p90/p99. Транзакция считается аномальной,
+если ее сумма выше базы своей категории больше чем на ANOMALY_THRESHOLD по модифицированному
+z-score (Iglewicz, Hoaglin): 3000₽ в продуктах — выброс, в электронике — обычная покупка.
+База часа используется, когда у категории нет своей (категории нет или в ней мало покупок).
+
+Группы кодируются через pandas.factorize, статистики считаются по одному отсортированному
+массиву для всех групп сразу (без цикла по группам), поэтому время — O(n log n)
+и на миллионах строк. База сериализуется в JSON: для сохраненных наборов она кэшируется
+в хранилище и переиспользуется при повторных анализах (см. store.TransactionStore.baselines)
+"""
+
+import numpy as np
+import pandas as pd
+
+# Порог модифицированного z-score
+ANOMALY_THRESHOLD = 3.5
+
+# Группы меньше этого размера не дают базы (медиана по 2-3 покупкам ничего не говорит)
+MIN_GROUP_SIZE = 8
+
+# Сколько аномальных транзакций перечисляется в ответе (счетчики — всегда полные)
+ANOMALIES_LISTED = 50
+
+# Поля базы группы (массивы одинаковой длины, по одному значению на группу)
+BASELINE_FIELDS = ('count', 'median', 'mad', 'mean_ad', 'p90', 'p99')
+
+# Масштаб MAD к стандартному отклонению нормального распределения (1 / 0.6745);
+# при MAD = 0 (больше половины сумм одинаковые) используется среднее отклонение (√(π/2))
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def anomaly_arrays(transactions):
+    """
+    Массивы для поиска аномалий из списка словарей или колоночного DataFrame
+    Возвращает (ids, categories, hours, amounts); categories — None, если категорий нет
+    """
+    if isinstance(transactions, pd.DataFrame):
+        n = len(transactions)
+        ids = transactions['id'].to_numpy() if 'id' in transactions else np.arange(n)
+        categories = transactions['category'] if 'category' in transactions else None
+        return (ids, categories, transactions['hour'].to_numpy(dtype=np.int64),
+                transactions['amount'].to_numpy(dtype=np.float64))
+
+    ids = np.array([t.get('id', i) for i, t in enumerate(transactions)], dtype=object)
+    categories = pd.Series([t.get('category') for t in transactions], dtype=object)
+    hours = np.fromiter((t['hour'] for t in transactions), dtype=np.int64, count=len(transactions))
+    amounts = np.array([t['amount'] for t in transactions], dtype=np.float64)
+    return ids, categories, hours, amounts
+
+
+def _quantiles(values, starts, counts, q):
+    """q-квантиль каждой группы отсортированного массива (линейная интерполяция, как np.percentile)"""
+    position = q * np.maximum(counts - 1, 0)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    if len(values) == 0:
+        return np.full(len(counts), np.nan)
+    last = len(values) - 1
+    lower = values[np.minimum(starts + low, last)]
+    upper = values[np.minimum(starts + high, last)]
+    return np.where(counts > 0, lower + (upper - lower) * (position - low), np.nan)
+
+
+def _grouped(codes, value_order):
+    """Порядок (группа, значение): value_order — argsort значений, досортировка по группе — стабильная"""
+    # Для небольших целых numpy использует поразрядную сортировку — O(n)
+    small = codes.astype(np.int16) if codes.max(initial=0) < np.iinfo(np.int16).max else codes
+    return value_order[np.argsort(small[value_order], kind='stable')]
+
+
+def group_baselines(codes, n_groups, values, value_order=None):
+    """
+    База сумм по группам: словарь BASELINE_FIELDS -> массив длины n_groups
+    codes — номер группы каждой суммы (-1 — без группы), values — суммы (NaN пропускаются),
+    value_order — np.argsort(values), если уже посчитан (общий для нескольких группировок)
+    """
+    # Суммы без группы и пропуски — в служебную группу n_groups (в конце порядка)
+    codes = np.where((codes >= 0) & ~np.isnan(values), codes, n_groups)
+    counts = np.bincount(codes, minlength=n_groups + 1)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[:n_groups]
+    counts = counts[:n_groups]
+
+    # Одна сортировка по (группа, сумма): квантили всех групп — индексами в массиве
+    if value_order is None:
+        value_order = np.argsort(values)
+    ordered = values[_grouped(codes, value_order)]
+    median = _quantiles(ordered, starts, counts, 0.5)
+    p90 = _quantiles(ordered, starts, counts, 0.9)
+    p99 = _quantiles(ordered, starts, counts, 0.99)
+
+    deviations = np.abs(values - np.append(median, np.nan)[codes])
+    mad = _quantiles(deviations[_grouped(codes, np.argsort(deviations))], starts, counts, 0.5)
+    grouped = codes < n_groups
+    mean_ad = (np.bincount(codes[grouped], weights=deviations[grouped], minlength=n_groups)
+               / np.maximum(counts, 1))
+    return {'count': counts, 'median': median, 'mad': mad, 'mean_ad': mean_ad, 'p90': p90, 'p99': p99}
+
+
+def compute_baselines(categories, hours, amounts):
+    """
+    Базы сумм по категориям и по часам (JSON-совместимый словарь)
+    {'category': {'keys': [...], 'count': [...], 'median': [...], ...}, 'hour': {...}}
+    """
+    amounts = np.abs(np.asarray(amounts, dtype=np.float64))
+    value_order = np.argsort(amounts)
+    baselines = {}
+    groups = [('hour', np.asarray(hours))]
+    if categories is not None:
+        groups.insert(0, ('category', categories))
+    for name, column in groups:
+        codes, keys = pd.factorize(column, sort=True)
+        stats = group_baselines(np.asarray(codes, dtype=np.int64), len(keys), amounts, value_order)
+        baselines[name] = {'keys': np.asarray(keys, dtype=object).tolist()}
+        baselines[name].update({field: _json_values(np.round(stats[field], 2)) for field in BASELINE_FIELDS})
+    return baselines
+
+
+def _json_values(values):
+    """Список для JSON: NaN (группа без сумм) -> None"""
+    return [None if value != value else value for value in values.tolist()]
+
+
+def _robust_scores(baseline, column, amounts):
+    """
+    Модифицированный z-score каждой суммы относительно базы ее группы
+    Возвращает (оценки, номера групп в базе, маска сумм, для которых у группы есть база)
+    """
+    # Ключи базы сопоставляются только уникальным значениям колонки
+    values, uniques = pd.factorize(column)
+    indexer = pd.Index(baseline['keys'], dtype=object).get_indexer(np.asarray(uniques, dtype=object))
+    codes = np.append(indexer, -1)[values]
+    stats = {field: np.append(np.asarray(baseline[field], dtype=np.float64), np.nan) for field in BASELINE_FIELDS}
+    median = stats['median'][codes]
+    scale = np.where(stats['mad'] > 0, MAD_SCALE * stats['mad'], MEAN_AD_SCALE * stats['mean_ad'])[codes]
+    usable = (stats['count'][codes] >= MIN_GROUP_SIZE) & (scale > 0) & ~np.isnan(amounts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(usable, (amounts - median) / scale, 0.0), codes, usable
+
+
+def detect_anomalies(ids, categories, hours, amounts, baselines=None):
+    """
+    Аномально крупные суммы относительно баз категории и часа
+    baselines — готовые базы (compute_baselines, например по всему набору); без них считаются по тем же данным
+    Возвращает блок anomalies для ответа анализа
+    """
+    amounts = np.abs(np.asarray(amounts, dtype=np.float64))
+    if baselines is None:
+        baselines = compute_baselines(categories, hours, amounts)
+
+    # Оценка по первой базе, которая есть у суммы: категория, затем час
+    n = len(amounts)
+    scores, reasons, assigned, baseline_codes = np.zeros(n), np.zeros(n, dtype=np.int64), np.zeros(n, dtype=bool), []
+    groups = [('category', categories), ('hour', hours)]
+    groups = [(name, column) for name, column in groups if name in baselines and column is not None]
+    for index, (name, column) in enumerate(groups):
+        group_scores, codes, usable = _robust_scores(baselines[name], column, amounts)
+        use = usable & ~assigned
+        scores[use] = group_scores[use]
+        reasons[use] = index
+        assigned |= use
+        baseline_codes.append(codes)
+
+    flagged = np.flatnonzero(scores > ANOMALY_THRESHOLD)
+    # Категории нужны только у найденных аномалий
+    flagged_categories = [None] * len(flagged)
+    if categories is not None:
+        values = pd.Series(categories).iloc[flagged].astype(object)
+        flagged_categories = values.where(values.notna(), None).tolist()
+
+    # Самые сильные выбросы — первыми
+    listed = []
+    for position in np.argsort(-scores[flagged], kind='stable')[:ANOMALIES_LISTED].tolist():
+        i = flagged[position]
+        baseline = baselines[groups[reasons[i]][0]]
+        code = baseline_codes[reasons[i]][i]
+        listed.append({
+            'id': ids[i].item() if hasattr(ids[i], 'item') else ids[i],
+            'category': flagged_categories[position],
+            'hour': int(hours[i]),
+            'amount': round(float(amounts[i]), 2),
+            'score': round(float(scores[i]), 2),
+            'baseline': groups[reasons[i]][0],
+            'median': baseline['median'][code],
+            'p99': baseline['p99'][code]
+        })
+
+    counts = pd.Series(flagged_categories, dtype=object).value_counts(sort=True)
+    by_category = [{'category': key, 'count': int(count)} for key, count in counts.items()]
+
+    return {
+        'count': int(len(flagged)),
+        'threshold': ANOMALY_THRESHOLD,
+        'transactions': listed,
+        'by_category': by_category,
+        'baselines': {name: _baseline_rows(name, baseline) for name, baseline in baselines.items()}
+    }
+
+
+def _baseline_rows(name, baseline):
+    """База в виде списка строк для ответа (только группы, по которым ищутся аномалии)"""
+    rows = []
+    for i, key in enumerate(baseline['keys']):
+        if baseline['count'][i] >= MIN_GROUP_SIZE:
+            row = {name: key}
+            row.update({field: baseline[field][i] for field in ('count', 'median', 'mad', 'p90', 'p99')})
+            rows.append(row)
+    return rows
+
+
+def with_anomalies(analysis, anomalies):
+    """Добавление блока anomalies (и паттерна с рекомендацией, если аномалии есть) к анализу риска"""
+    analysis['anomalies'] = anomalies
+    count = anomalies['count']
+    if count > 0:
+        analysis['patterns'].append({
+            'type': 'category_anomalies',
+            'description': 'Нетипично крупные покупки для своей категории или времени суток',
+            'count': count,
+            'percentage': round(count / analysis['total_transactions'] * 100, 1)
+        })
+        analysis['recommendations'].append(
+            'Некоторые покупки заметно дороже обычных для своей категории. Проверьте, были ли они запланированы.'
+        )
+    return analysis
@@ -3,16 +3,29 @@ Insight Backend API
 Flask приложение для анализа транзакций и определения рискованных паттернов
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
 import os
-from werkzeug.utils import secure_filename
-import json
+import time
+import uuid
+
+# Модули с pandas/numpy (parsing, risk, stats, store, jobs...) импортируются внутри обработчиков
+# и в фоне при старте (lazy.warm_up), чтобы /api/health отвечал сразу
+import lazy
+from lazy import Lazy
+from cache import ResultCache, file_digest, bytes_digest, make_key
+from uploads import UploadRequest, upload_digest, upload_size
+from streaming import NDJSON_MIMETYPE, iter_ndjson, json_body
+from serialization import JSONProvider
+from compression import compress_response
+from formats import registry as format_registry
+from metrics import Metrics, SlowProfiler, stage, count_rows, reset as reset_request_metrics
 
 app = Flask(__name__)
+# JSON через orjson, если он установлен
+app.json = JSONProvider(app)
+# Загружаемые файлы принимаются в память (большие — во временный файл) с хешем по ходу приема
+app.request_class = UploadRequest
 # CORS настройки для работы с Vercel и локальной разработкой
 # Разрешаем все origins для Vercel (так как домены могут быть разными)
 CORS(app, resources={
@@ -33,7 +46,8 @@ else:
 
 # Конфигурация
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'data', 'uploads')
-PROCESSED_FOLDER = os.path.join(BASE_DIR, 'data', 'processed')
+# Состояние сервера (кэш результатов, наборы, задачи); PROCESSED_FOLDER задает другой каталог
+PROCESSED_FOLDER = os.getenv('PROCESSED_FOLDER') or os.path.join(BASE_DIR, 'data', 'processed')
 EXAMPLES_FOLDER = os.path.join(BASE_DIR, 'examples')
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls', 'txt', 'json'}
 
@@ -42,7 +56,89 @@ os.makedirs(PROCESSED_FOLDER, exist_ok=True)
 os.makedirs(EXAMPLES_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# CSV/TXT/XLSX больше порога обрабатываются потоково, поэтому общий лимит можно держать выше
+STREAM_THRESHOLD = 16 * 1024 * 1024  # 16MB
+STREAM_PREVIEW_ROWS = 1000  # Сколько транзакций возвращать в ответе потоковой загрузки
+
+# Постраничная выдача транзакций набора (/api/datasets/<id>/transactions)
+TRANSACTIONS_PAGE_SIZE = 100
+TRANSACTIONS_PAGE_MAX = 1000
+# Лимит загрузки файла; JSON-тела остальных маршрутов ограничены 16MB (uploads.UploadRequest)
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', 256)) * 1024 * 1024
+
+# Кэш результатов по хешу содержимого (на диске общий для всех воркеров gunicorn)
+result_cache = ResultCache(
+    max_items=int(os.getenv('RESULT_CACHE_ITEMS', 256)),
+    max_bytes=int(os.getenv('RESULT_CACHE_MB', 64)) * 1024 * 1024,
+    persist_path=os.path.join(PROCESSED_FOLDER, 'result_cache.sqlite3') if os.getenv('RESULT_CACHE_PERSIST', '1') == '1' else None,
+    disk_max_bytes=int(os.getenv('RESULT_CACHE_DISK_MB', 256)) * 1024 * 1024
+)
+
+# Реестр форматов выписок: выученные заголовки сохраняются на диск и общие для всех воркеров
+format_registry.enable_persistence(os.path.join(PROCESSED_FOLDER, 'formats.json'))
+
+# Пакетная загрузка: максимум файлов за раз и размер пула процессов
+BATCH_MAX_FILES = 20
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', os.cpu_count() or 1))
+
+# Метрики запросов; выборочное профилирование включается PROFILE_SAMPLE_RATE (доля запросов, 0..1)
+metrics = Metrics(SlowProfiler(
+    os.path.join(PROCESSED_FOLDER, 'profiles'),
+    sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', 0)),
+    keep=int(os.getenv('PROFILE_KEEP', 20))
+))
+
+# Хранилища создаются при первом обращении (в каждом процессе — после fork под gunicorn)
+DATASET_TTL_DAYS = int(os.getenv('DATASET_TTL_DAYS', 30))
+# Сколько строк всех наборов хранить; сверх лимита удаляются наборы, к которым дольше всего не обращались
+DATASETS_MAX_ROWS = int(os.getenv('DATASETS_MAX_ROWS', 5000000))
+
+
+def create_job_store():
+    """Фоновые задачи для тяжелых загрузок (очередь в SQLite, пул процессов)"""
+    from jobs import JobStore
+    return JobStore(os.path.join(PROCESSED_FOLDER, 'jobs.sqlite3'), os.path.join(PROCESSED_FOLDER, 'jobs'))
+
+
+def create_job_runner():
+    from jobs import JobRunner
+    return JobRunner(job_store, max_workers=int(os.getenv('JOB_WORKERS', 2)),
+                     datasets_path=transaction_store.db_path)
+
+
+def create_transaction_store():
+    """Хранилище загруженных наборов транзакций (SQLite с индексами, общее для всех воркеров)"""
+    from store import TransactionStore
+    store = TransactionStore(os.path.join(PROCESSED_FOLDER, 'transactions.sqlite3'), max_rows=DATASETS_MAX_ROWS)
+    store.cleanup(DATASET_TTL_DAYS * 24 * 60 * 60)
+    return store
+
+
+def create_example_store():
+    """Примеры выписок: готовые ответы в памяти, пересборка при изменении файлов"""
+    from example_store import ExampleStore
+    return ExampleStore(
+        BASE_DIR, EXAMPLES_FOLDER,
+        serialize=lambda payload: app.json.response(payload).get_data(),
+        allowed_extensions=ALLOWED_EXTENSIONS
+    )
+
+
+job_store = Lazy(create_job_store)
+job_runner = Lazy(create_job_runner)
+transaction_store = Lazy(create_transaction_store)
+example_store = Lazy(create_example_store)
+
+
+def warm_up_examples():
+    """Сборка ответов примеров сразу после загрузки модулей анализа (PRELOAD_EXAMPLES=1)"""
+    if os.getenv('PRELOAD_EXAMPLES', '0') == '1':
+        example_store.warm()
+
+
+def load_data_stack():
+    """Загрузка модулей анализа в текущем процессе (мастер gunicorn --preload, см. gunicorn.conf.py)"""
+    lazy.load(after=warm_up_examples)
 
 
 def allowed_file(filename):
@@ -50,225 +146,149 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def parse_transactions(file_path, file_type):
+def request_flag(name):
+    """Флаг запроса (?name=1 или поле формы)"""
+    return request.args.get(name, request.form.get(name, '')).lower() in ('1', 'true')
+
+
+def stored_response(body, status, mimetype=None):
+    """Ответ из заранее сериализованного тела"""
+    return app.response_class(body, status=status, mimetype=mimetype or app.json.mimetype)
+
+
+def wants_ndjson():
+    """Потоковый ответ NDJSON (?format=ndjson, поле формы format или Accept: application/x-ndjson)"""
+    requested = request.args.get('format', request.form.get('format', ''))
+    return requested == 'ndjson' or request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def records_response(payload, frame):
     """
-    Парсинг транзакций из различных форматов
-    Поддерживает CSV, Excel, JSON и текстовые файлы
+    JSON-ответ с транзакциями из колоночного представления (как jsonify(payload + transactions))
+    Транзакции сериализуются порциями прямо из колонок
     """
-    transactions = []
-    
-    try:
-        if file_type == 'csv':
-            df = pd.read_csv(file_path, encoding='utf-8')
-        elif file_type in ['xlsx', 'xls']:
-            df = pd.read_excel(file_path)
-        elif file_type == 'json':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                df = pd.DataFrame(data)
-        else:  # txt
-            df = pd.read_csv(file_path, sep='\t', encoding='utf-8')
-        
-        # Нормализация колонок (приведение к нижнему регистру)
-        df.columns = df.columns.str.lower().str.strip()
-        
-        # Попытка определить колонки автоматически
-        date_col = None
-        amount_col = None
-        category_col = None
-        description_col = None
-        
-        for col in df.columns:
-            col_lower = col.lower()
-            if not date_col and ('date' in col_lower or 'дата' in col_lower or 'time' in col_lower):
-                date_col = col
-            if not amount_col and ('amount' in col_lower or 'сумма' in col_lower or 'price' in col_lower):
-                amount_col = col
-            if not category_col and ('category' in col_lower or 'категория' in col_lower or 'type' in col_lower):
-                category_col = col
-            if not description_col and ('description' in col_lower or 'описание' in col_lower or 'name' in col_lower):
-                description_col = col
-        
-        # Если не нашли, используем первые колонки
-        if not date_col and len(df.columns) > 0:
-            date_col = df.columns[0]
-        if not amount_col and len(df.columns) > 1:
-            amount_col = df.columns[1]
-        if not category_col and len(df.columns) > 2:
-            category_col = df.columns[2]
-        if not description_col and len(df.columns) > 3:
-            description_col = df.columns[3]
-        
-        # Обработка данных
-        for idx, row in df.iterrows():
-            try:
-                # Парсинг даты
-                date_str = str(row[date_col]) if date_col else None
-                if date_str:
-                    try:
-                        date = pd.to_datetime(date_str)
-                    except:
-                        date = datetime.now()
-                else:
-                    date = datetime.now()
-                
-                # Парсинг суммы
-                amount_str = str(row[amount_col]) if amount_col else '0'
-                amount = float(str(amount_str).replace(',', '.').replace(' ', ''))
-                
-                category = str(row[category_col]) if category_col else 'Другое'
-                description = str(row[description_col]) if description_col else 'Без описания'
-                
-                transactions.append({
-                    'id': idx,
-                    'date': date.isoformat(),
-                    'amount': amount,
-                    'category': category,
-                    'description': description,
-                    'hour': date.hour,
-                    'day_of_week': date.weekday(),  # 0 = Monday, 6 = Sunday
-                    'day_name': date.strftime('%A'),
-                    'is_weekend': date.weekday() >= 5
-                })
-            except Exception as e:
-                print(f"Ошибка обработки строки {idx}: {e}")
-                continue
-        
-        return transactions
-    
-    except Exception as e:
-        print(f"Ошибка парсинга файла: {e}")
-        return []
+    if app.debug:
+        # В режиме отладки jsonify форматирует ответ с отступами
+        from parsing import frame_to_records
+        return jsonify(dict(payload, transactions=frame_to_records(frame)))
+    body = json_body(payload, frame, lambda value: app.json.dumps(value, separators=(',', ':')))
+    return app.response_class(body + b'\n', mimetype=app.json.mimetype)
+
+
+def ndjson_response(payload, frames):
+    """Потоковый ответ: сводка (анализ) первой строкой, затем транзакции порциями из frames"""
+    return app.response_class(iter_ndjson(payload, frames), mimetype=NDJSON_MIMETYPE)
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics = metrics.begin()
+
+
+@app.errorhandler(413)
+def request_too_large(error):
+    """Тело запроса больше лимита маршрута (см. uploads.UploadRequest.max_content_length)"""
+    limit = request.max_content_length // (1024 * 1024)
+    return jsonify({'error': f'Размер запроса больше {limit}MB'}), 413
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Учет запроса в метриках и заголовок Server-Timing с длительностью этапов"""
+    context = g.pop('metrics', None)
+    if context is None:
+        return response
+    seconds, stages = metrics.end(
+        context,
+        endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+        method=request.method,
+        status=response.status_code,
+        bytes_in=request.content_length,
+        bytes_out=None if response.is_streamed else response.calculate_content_length(),
+        cache=response.headers.get('X-Cache', '').lower() or None
+    )
+    timings = [f'{name};dur={value * 1000:.1f}' for name, value in stages.items()]
+    response.headers['Server-Timing'] = ', '.join(timings + [f'total;dur={seconds * 1000:.1f}'])
+    return response
+
+
+@app.after_request
+def negotiate_compression(response):
+    """Сжатие ответа по Accept-Encoding (выполняется до record_request_metrics: в метрики попадает сжатый размер)"""
+    with stage('compress'):
+        return compress_response(response, request.accept_encodings)
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    reset_request_metrics()
+
+
+def cached_response(cache_key):
+    """Готовый ответ из кэша результатов или None"""
+    with stage('cache'):
+        body = result_cache.get(cache_key)
+    if body is None:
+        return None
+    response = app.response_class(body, mimetype=app.json.mimetype)
+    response.headers['X-Cache'] = 'HIT'
+    return response
+
+
+def cache_response(cache_key, response):
+    """Сохранение успешного ответа в кэш результатов"""
+    with stage('cache'):
+        result_cache.set(cache_key, response.get_data())
+    response.headers['X-Cache'] = 'MISS'
+    return response
 
 
-def analyze_risk_patterns(transactions):
+def with_dataset_id(body, dataset_id):
     """
-    Анализ паттернов для определения уровня риска
-    Использует ML-подход для выявления рискованных покупок
+    Тело ответа загрузки с id набора
+    В кэше результатов ответ загрузки хранится без dataset_id: каждая загрузка получает свой набор
     """
-    if not transactions:
-        return {
-            'risk_level': 'low',
-            'risk_score': 0,
-            'patterns': [],
-            'recommendations': []
-        }
-    
-    df = pd.DataFrame(transactions)
-    
-    # Признаки для анализа
-    features = []
-    risk_scores = []
-    
-    for trans in transactions:
-        hour = trans['hour']
-        day_of_week = trans['day_of_week']
-        amount = abs(trans['amount'])
-        is_weekend = trans['is_weekend']
-        
-        # Вычисление риска на основе паттернов
-        risk = 0
-        
-        # Ночные покупки (22:00 - 6:00) - высокий риск
-        if hour >= 22 or hour <= 6:
-            risk += 3
-        
-        # Поздний вечер (20:00 - 22:00) - средний риск
-        elif hour >= 20:
-            risk += 2
-        
-        # Вечер (18:00 - 20:00) - низкий риск
-        elif hour >= 18:
-            risk += 1
-        
-        # Пятница вечер - дополнительный риск
-        if day_of_week == 4 and hour >= 18:  # Пятница
-            risk += 2
-        
-        # Выходные вечером - дополнительный риск
-        if is_weekend and hour >= 18:
-            risk += 1
-        
-        # Большие суммы - дополнительный риск
-        if amount > 5000:
-            risk += 2
-        elif amount > 2000:
-            risk += 1
-        
-        risk_scores.append(risk)
-        features.append({
-            'hour': hour,
-            'day_of_week': day_of_week,
-            'amount': amount,
-            'is_weekend': is_weekend,
-            'risk': risk
-        })
-    
-    # Определение общего уровня риска
-    avg_risk = np.mean(risk_scores) if risk_scores else 0
-    recent_risk = np.mean(risk_scores[-10:]) if len(risk_scores) >= 10 else avg_risk
-    
-    # Классификация уровня риска
-    if recent_risk >= 5:
-        risk_level = 'high'
-    elif recent_risk >= 3:
-        risk_level = 'medium'
-    else:
-        risk_level = 'low'
-    
-    # Выявление паттернов
-    patterns = []
-    
-    night_count = sum(1 for t in transactions if t['hour'] >= 22 or t['hour'] <= 6)
-    if night_count > len(transactions) * 0.2:
-        patterns.append({
-            'type': 'night_purchases',
-            'description': 'Частые ночные покупки (после 22:00 или до 6:00)',
-            'count': night_count,
-            'percentage': round(night_count / len(transactions) * 100, 1)
-        })
-    
-    friday_evening = sum(1 for t in transactions if t['day_of_week'] == 4 and t['hour'] >= 18)
-    if friday_evening > 0:
-        patterns.append({
-            'type': 'friday_evening',
-            'description': 'Покупки в пятницу вечером',
-            'count': friday_evening
-        })
-    
-    high_amount = sum(1 for t in transactions if abs(t['amount']) > 3000)
-    if high_amount > len(transactions) * 0.15:
-        patterns.append({
-            'type': 'high_amount',
-            'description': 'Частые крупные покупки (более 3000₽)',
-            'count': high_amount,
-            'percentage': round(high_amount / len(transactions) * 100, 1)
-        })
-    
-    # Рекомендации
-    recommendations = []
-    if risk_level == 'high':
-        recommendations.append('Высокий риск импульсивных покупок. Рекомендуется отложить крупные покупки до утра.')
-    if night_count > 0:
-        recommendations.append('Обнаружены ночные покупки. Попробуйте отложить корзину до утра.')
-    if friday_evening > 0:
-        recommendations.append('Пятничные вечерние покупки могут быть импульсивными. Подумайте перед покупкой.')
-    
-    return {
-        'risk_level': risk_level,
-        'risk_score': round(recent_risk, 2),
-        'average_risk': round(avg_risk, 2),
-        'patterns': patterns,
-        'recommendations': recommendations,
-        'total_transactions': len(transactions),
-        'statistics': {
-            'night_purchases': night_count,
-            'evening_purchases': sum(1 for t in transactions if t['hour'] >= 18),
-            'weekend_purchases': sum(1 for t in transactions if t['is_weekend']),
-            'total_amount': round(sum(abs(t['amount']) for t in transactions), 2),
-            'average_amount': round(np.mean([abs(t['amount']) for t in transactions]), 2)
-        }
-    }
+    end = body.rstrip().rfind(b'}')
+    return body[:end] + b',"dataset_id":' + app.json.dumps(dataset_id).encode('utf-8') + body[end:]
+
+
+def upload_response(cache_key, response, dataset_id):
+    """Кэширование ответа загрузки (без id набора) и добавление id нового набора"""
+    cache_response(cache_key, response)
+    response.set_data(with_dataset_id(response.get_data(), dataset_id))
+    return response
+
+
+def cached_upload(cache_key, digest, file_type, name):
+    """Ответ загрузки из кэша с копией исходного набора или None (нет в кэше или исходный набор удален)"""
+    with stage('cache'):
+        body = result_cache.get(cache_key)
+    if body is None:
+        return None
+    with stage('persist'):
+        dataset_id = transaction_store.copy_upload(digest, file_type, name)
+    if dataset_id is None:
+        return None
+    response = app.response_class(with_dataset_id(body, dataset_id), mimetype=app.json.mimetype)
+    response.headers['X-Cache'] = 'HIT'
+    return response
+
+
+def revalidate(etag):
+    """Ответ 304, если у клиента актуальная версия (If-None-Match), иначе None"""
+    if request.if_none_match.contains_weak(etag):
+        return conditional(app.response_class(status=304), etag)
+    return None
+
+
+def conditional(response, etag):
+    """
+    ETag и Cache-Control для ответа по сохраненному набору
+    ETag слабый: тело может быть сжато по-разному; no-cache — браузер хранит ответ, но перепроверяет его
+    """
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @app.route('/api/health', methods=['GET'])
@@ -277,17 +297,21 @@ def health_check():
     import socket
     host = socket.gethostname()
     port = request.environ.get('SERVER_PORT', os.getenv('PORT', 'unknown'))
+    # Не ждет модулей анализа: сервер здоров, пока они загружаются в фоне (data_stack.status)
     return jsonify({
         'status': 'ok', 
         'message': 'Insight API is running',
         'port': port,
-        'host': host
+        'host': host,
+        'data_stack': lazy.status()
     }), 200
 
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Загрузка файла с транзакциями"""
+    from parsing import parse_transactions_frame, STREAMABLE_TYPES
+    from risk import analyze_risk_patterns, rules_version
     if 'file' not in request.files:
         return jsonify({'error': 'Файл не найден'}), 400
     
@@ -296,82 +320,708 @@ def upload_file():
         return jsonify({'error': 'Файл не выбран'}), 400
     
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        # Тип — по исходному имени (secure_filename удаляет кириллицу: 'выписка.csv' -> 'csv')
+        file_type = file.filename.rsplit('.', 1)[1].lower()
+        stream = request_flag('stream')
+        ndjson = wants_ndjson()
         
-        file_type = filename.rsplit('.', 1)[1].lower()
-        transactions = parse_transactions(file_path, file_type)
+        # Повторная загрузка того же файла отдается из кэша без парсинга
+        # (хеш посчитан при приеме файла, поток не перечитывается)
+        with stage('hash'):
+            digest = upload_digest(file)
+            cache_key = make_key('upload', rules_version(), file_type, stream, digest)
         
-        if not transactions:
+        # Асинхронный режим: сразу возвращаем id задачи, обработка идет в пуле процессов
+        if request_flag('async'):
+            return submit_upload_job(file, file_type, cache_key, digest)
+        
+        # Ответы NDJSON не кэшируются: они отдаются по мере сериализации
+        cached = None if ndjson else cached_upload(cache_key, digest, file_type, file.filename)
+        if cached is not None:
+            return cached
+        
+        # Файл разбирается прямо из принятого потока (память или временный файл запроса),
+        # в папку загрузок не копируется
+        source = file.stream
+        
+        # Большие CSV/TXT/XLSX (или по запросу stream=1) обрабатываем потоково
+        file_size = upload_size(file)
+        if file_type in STREAMABLE_TYPES and (stream or file_size > STREAM_THRESHOLD):
+            return stream_upload(source, file_type, cache_key, file.filename, digest, ndjson)
+        if file_size > STREAM_THRESHOLD:
+            return jsonify({'error': f'Файл формата {file_type} больше 16MB, используйте CSV, TXT или XLSX'}), 413
+        
+        frame = parse_transactions_frame(source, file_type)
+        
+        if frame.empty:
             return jsonify({'error': 'Не удалось распарсить транзакции из файла'}), 400
         
-        # Сохранение обработанных данных
-        processed_path = os.path.join(PROCESSED_FOLDER, f'processed_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
-        with open(processed_path, 'w', encoding='utf-8') as f:
-            json.dump(transactions, f, ensure_ascii=False, indent=2)
+        count_rows(len(frame))
         
-        # Анализ рисков
-        analysis = analyze_risk_patterns(transactions)
+        # Сохранение транзакций в хранилище наборов
+        with stage('persist'):
+            dataset_id = transaction_store.save(frame, file.filename, file_type, digest)
         
-        return jsonify({
+        # Анализ рисков (сразу по колоночному представлению)
+        with stage('analyze'):
+            analysis = analyze_risk_patterns(frame)
+        
+        if ndjson:
+            return ndjson_response({
+                'success': True,
+                'analysis': analysis,
+                'count': len(frame),
+                'dataset_id': dataset_id
+            }, [frame])
+        
+        with stage('serialize'):
+            response = records_response({
+                'success': True,
+                'analysis': analysis,
+                'count': len(frame)
+            }, frame)
+        return upload_response(cache_key, response, dataset_id)
+    
+    return jsonify({'error': 'Неподдерживаемый формат файла'}), 400
+
+
+def stream_upload(file_path, file_type, cache_key, name=None, digest=None, ndjson=False):
+    """
+    Потоковая обработка CSV/TXT/XLSX (путь или поток загрузки): чтение чанками и накопительный анализ
+    В ответ JSON попадает только первые STREAM_PREVIEW_ROWS транзакций, в хранилище — все;
+    в режиме NDJSON после сводки отдаются все транзакции, порциями из хранилища
+    """
+    from parsing import iter_transaction_frames, frame_to_records
+    from risk import RiskAccumulator
+    accumulator = RiskAccumulator()
+    preview = []
+    dataset_id = transaction_store.create(name, file_type, digest)
+    
+    try:
+        for frame in iter_transaction_frames(file_path, file_type):
+            if frame.empty:
+                continue
+            with stage('analyze'):
+                accumulator.update(frame)
+            if not ndjson and len(preview) < STREAM_PREVIEW_ROWS:
+                with stage('records'):
+                    preview.extend(frame_to_records(frame.iloc[:STREAM_PREVIEW_ROWS - len(preview)]))
+            
+            # Сохранение транзакций порциями
+            with stage('persist'):
+                transaction_store.append(dataset_id, frame)
+    except Exception as e:
+        print(f"Ошибка потокового парсинга файла: {e}")
+        transaction_store.delete(dataset_id)
+        return jsonify({'error': 'Не удалось распарсить транзакции из файла'}), 400
+    
+    if accumulator.count == 0:
+        transaction_store.delete(dataset_id)
+        return jsonify({'error': 'Не удалось распарсить транзакции из файла'}), 400
+    
+    transaction_store.finish(dataset_id)
+    
+    print(f"✅ Потоково обработано {accumulator.count} транзакций")
+    count_rows(accumulator.count)
+    
+    # Аномалии требуют баз по всем суммам и не считаются в запросе загрузки (память не зависит
+    # от размера файла) — они в GET /api/datasets/<id>/analysis
+    analysis = accumulator.result()
+    
+    if ndjson:
+        return ndjson_response({
+            'success': True,
+            'analysis': analysis,
+            'count': accumulator.count,
+            'streamed': True,
+            'truncated': False,
+            'dataset_id': dataset_id
+        }, transaction_store.iter_frames(dataset_id))
+    
+    with stage('serialize'):
+        response = jsonify({
             'success': True,
-            'transactions': transactions,
+            'transactions': preview,
             'analysis': analysis,
-            'count': len(transactions)
+            'count': accumulator.count,
+            'streamed': True,
+            'truncated': accumulator.count > len(preview)
         })
+    return upload_response(cache_key, response, dataset_id)
+
+
+@app.route('/api/upload-batch', methods=['POST'])
+def upload_batch():
+    """
+    Загрузка нескольких выписок за раз (поле files)
+    Файлы парсятся параллельно в пуле процессов, строки помечаются source, анализ общий
+    """
+    from batch import parse_batch
+    from risk import analyze_risk_patterns
+    files = request.files.getlist('files') or request.files.getlist('file')
+    files = [f for f in files if f.filename]
+    if not files:
+        return jsonify({'error': 'Файлы не найдены'}), 400
+    if len(files) > BATCH_MAX_FILES:
+        return jsonify({'error': f'Не более {BATCH_MAX_FILES} файлов за раз'}), 400
     
-    return jsonify({'error': 'Неподдерживаемый формат файла'}), 400
+    started = time.perf_counter()
+    batch = []
+    reports = []
+    for file in files:
+        if not allowed_file(file.filename):
+            reports.append({'file': file.filename, 'count': 0, 'duplicates': 0, 'seconds': None,
+                            'error': 'Неподдерживаемый формат файла'})
+            continue
+        file_type = file.filename.rsplit('.', 1)[1].lower()
+        if upload_size(file) > STREAM_THRESHOLD:
+            reports.append({'file': file.filename, 'count': 0, 'duplicates': 0, 'seconds': None,
+                            'error': 'Файл больше 16MB, загрузите его отдельно'})
+            continue
+        # Файлы разбираются в других процессах, поэтому сохраняются под уникальными именами
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f'batch_{uuid.uuid4().hex}.{file_type}')
+        with stage('save'):
+            file.save(file_path)
+        batch.append((file.filename, file_path, file_type))
+    
+    try:
+        with stage('parse'):
+            frame, parsed, dedup = parse_batch(batch, BATCH_WORKERS) if batch else (None, [], None)
+    finally:
+        for _, file_path, _ in batch:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+    reports = parsed + reports
+    parse_seconds = time.perf_counter() - started
+    
+    if frame is None:
+        return jsonify({
+            'success': False,
+            'error': 'Не удалось распарсить ни одного файла',
+            'files': reports
+        }), 400
+    
+    analysis_started = time.perf_counter()
+    with stage('analyze'):
+        analysis = analyze_risk_patterns(frame)
+    analysis_seconds = time.perf_counter() - analysis_started
+    count_rows(len(frame))
+    with stage('persist'):
+        dataset_id = transaction_store.save(frame, ', '.join(r['file'] for r in reports if r['count']), 'batch')
+    
+    print(f"✅ Пакетная загрузка: {len(frame)} транзакций из {len(batch)} файлов за {parse_seconds:.2f}с "
+          f"(повторов удалено: {dedup['duplicates_removed']})")
+    
+    with stage('serialize'):
+        response = records_response({
+            'success': True,
+            'analysis': analysis,
+            'count': len(frame),
+            'sources': sum(1 for r in reports if r['count']),
+            'files': reports,
+            'dedup': dedup,
+            'dataset_id': dataset_id,
+            'timings': {
+                'parse_seconds': round(parse_seconds, 4),
+                'analysis_seconds': round(analysis_seconds, 4)
+            }
+        }, frame)
+    return response
+
+
+def submit_upload_job(file, file_type, cache_key, digest):
+    """Создание фоновой задачи для загруженного файла (ответ 202 с id задачи)"""
+    cached = cached_upload(cache_key, digest, file_type, file.filename)
+    if cached is not None:
+        # Результат уже есть в кэше (и набор скопирован) — задача сразу завершена
+        job_id = job_store.create(file.filename, None, file_type, status='done')
+        result_path = job_store.result_path(job_id)
+        with open(result_path, 'wb') as f:
+            f.write(cached.get_data())
+        job_store.finish(job_id, 0, result_path)
+    else:
+        # Задача выполняется в другом процессе: файл сохраняется под уникальным именем
+        # и удаляется после обработки (jobs.run_upload_job)
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f'job_{uuid.uuid4().hex}.{file_type}')
+        file.save(file_path)
+        job_id = job_store.create(file.filename, file_path, file_type)
+        job_runner.submit(job_id)
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': job_store.get(job_id)['status'],
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Состояние фоновой задачи; после завершения в ответ добавляется result"""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+    
+    body = app.json.dumps({
+        'success': job['status'] != 'failed',
+        'job': {
+            'id': job['id'],
+            'status': job['status'],
+            'rows': job['rows'],
+            'file_name': job['file_name'],
+            'error': job['error'],
+            'created': job['created'],
+            'updated': job['updated']
+        }
+    })
+    if job['status'] == 'done':
+        # Готовый JSON результата вставляется как есть, без повторного разбора
+        with open(job['result_path'], 'r', encoding='utf-8') as f:
+            body = body[:-1] + ',"result":' + f.read() + '}'
+    return app.response_class(body, mimetype=app.json.mimetype)
 
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_transactions():
     """Анализ загруженных транзакций"""
-    data = request.json
+    from risk import analyze_risk_patterns, rules_version
+    # Тот же список транзакций, присланный повторно, отдается из кэша
+    with stage('hash'):
+        cache_key = make_key('analyze', rules_version(), bytes_digest(request.get_data()))
+    cached = cached_response(cache_key)
+    if cached is not None:
+        return cached
+    
+    with stage('decode'):
+        data = request.json
     
     if not data or 'transactions' not in data:
         return jsonify({'error': 'Транзакции не предоставлены'}), 400
     
     transactions = data['transactions']
-    analysis = analyze_risk_patterns(transactions)
+    count_rows(len(transactions))
+    with stage('analyze'):
+        analysis = analyze_risk_patterns(transactions)
     
-    return jsonify({
-        'success': True,
-        'analysis': analysis
-    })
+    with stage('serialize'):
+        response = jsonify({
+            'success': True,
+            'analysis': analysis
+        })
+    return cache_response(cache_key, response)
+
+
+def timeline_options():
+    """Окна (windows=24h,7d,30d) и число последних дней ряда (days) из query string (ValueError при ошибке)"""
+    from timeline import DEFAULT_WINDOWS
+    windows = request.args.get('windows') or DEFAULT_WINDOWS
+    # type=int молча превратил бы days=abc в None (весь ряд), поэтому значение проверяется явно
+    days = request.args.get('days') or None
+    if days is not None:
+        if not days.isdigit() or int(days) < 1:
+            raise ValueError(f'days должно быть положительным целым числом, получено {days}')
+        days = int(days)
+    return windows, days
+
+
+@app.route('/api/timeline', methods=['POST'])
+def transactions_timeline():
+    """Риск по окнам времени (24 часа, 7 и 30 дней) и дневной ряд по присланным транзакциям"""
+    from risk import rules_version
+    from timeline import build_timeline
+    with stage('hash'):
+        cache_key = make_key('timeline', rules_version(), request.query_string, bytes_digest(request.get_data()))
+    cached = cached_response(cache_key)
+    if cached is not None:
+        return cached
+    
+    with stage('decode'):
+        data = request.json
+    
+    if not data or 'transactions' not in data:
+        return jsonify({'error': 'Транзакции не предоставлены'}), 400
+    
+    try:
+        windows, days = timeline_options()
+        with stage('analyze'):
+            timeline = build_timeline(data['transactions'], windows, days)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Некорректный запрос: {e}'}), 400
+    count_rows(len(data['transactions']))
+    
+    with stage('serialize'):
+        response = jsonify({
+            'success': True,
+            'timeline': timeline
+        })
+    return cache_response(cache_key, response)
+
+
+def statistics_options(data):
+    """Дополнительные измерения (month, heatmap, source) и формат ответа (legacy/compact)"""
+    from stats import CORE_DIMENSIONS
+    extra = data.get('dimensions', request.args.get('dimensions', ''))
+    if isinstance(extra, str):
+        extra = [d.strip() for d in extra.split(',') if d.strip()]
+    output = data.get('format', request.args.get('format', 'legacy'))
+    dimensions = list(CORE_DIMENSIONS) + [d for d in extra if d not in CORE_DIMENSIONS]
+    return dimensions, output
 
 
 @app.route('/api/statistics', methods=['POST'])
 def get_statistics():
     """Получение статистики по транзакциям"""
-    data = request.json
+    from stats import build_statistics
+    with stage('hash'):
+        cache_key = make_key('statistics', request.query_string, bytes_digest(request.get_data()))
+    cached = cached_response(cache_key)
+    if cached is not None:
+        return cached
+    
+    with stage('decode'):
+        data = request.json
     
     if not data or 'transactions' not in data:
         return jsonify({'error': 'Транзакции не предоставлены'}), 400
     
-    transactions = data['transactions']
-    df = pd.DataFrame(transactions)
+    dimensions, output = statistics_options(data)
     
-    # Статистика по времени
-    hourly_stats = df.groupby('hour').agg({
-        'amount': ['count', 'sum', 'mean']
-    }).to_dict()
+    try:
+        with stage('aggregate'):
+            statistics = build_statistics(data['transactions'], dimensions, output)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Некорректные данные транзакций: {e}'}), 400
+    count_rows(len(data['transactions']))
     
-    # Статистика по дням недели
-    daily_stats = df.groupby('day_name').agg({
-        'amount': ['count', 'sum', 'mean']
-    }).to_dict()
+    if output == 'compact':
+        statistics['format'] = 'compact'
+    
+    with stage('serialize'):
+        response = jsonify({
+            'success': True,
+            **statistics
+        })
+    return cache_response(cache_key, response)
+
+
+@app.route('/api/datasets', methods=['GET'])
+def list_datasets():
+    """Сохраненные наборы транзакций (последние загрузки)"""
+    datasets = transaction_store.list_datasets(limit=request.args.get('limit', 100, type=int))
+    return jsonify({
+        'success': True,
+        'datasets': datasets,
+        'total': len(datasets)
+    })
+
+
+@app.route('/api/datasets/<dataset_id>', methods=['GET'])
+def get_dataset(dataset_id):
+    """Описание сохраненного набора"""
+    dataset = transaction_store.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Набор не найден'}), 404
+    etag = make_key('dataset', dataset_id, dataset['status'], dataset['updated'], dataset['rows'])
+    return revalidate(etag) or conditional(jsonify({'success': True, 'dataset': dataset}), etag)
+
+
+@app.route('/api/datasets/<dataset_id>', methods=['DELETE'])
+def delete_dataset(dataset_id):
+    """Удаление набора и его транзакций"""
+    if not transaction_store.delete(dataset_id):
+        return jsonify({'error': 'Набор не найден'}), 404
+    # Кэш не чистится: ключи ответов по набору содержат его id и updated
+    # и читаются только после проверки существования, а тела загрузок id не содержат
+    return jsonify({'success': True})
+
+
+def dataset_filters():
+    """Фильтры набора из query string (date_from, date_to, category, source, hour, amount_min, amount_max)"""
+    from store import FILTER_NAMES
+    return {name: request.args.get(name) for name in FILTER_NAMES if request.args.get(name)}
+
+
+def dataset_summary(dataset_id, dataset, filters):
+    """Анализ рисков набора и число транзакций по фильтрам (ValueError при неверном фильтре)"""
+    from risk import analyze_risk_patterns
+    if not filters:
+        # Весь набор: результат берется из накопленного состояния, транзакции не читаются
+        with stage('analyze'):
+            return transaction_store.analysis(dataset_id), dataset['rows']
+    with stage('query'):
+        frame = transaction_store.query(dataset_id, ['id', 'category', 'hour', 'day_of_week', 'amount'], filters)
+    count_rows(len(frame))
+    with stage('analyze'):
+        # Аномалии выборки — относительно баз сумм всего набора
+        return analyze_risk_patterns(frame, transaction_store.baselines(dataset_id)), len(frame)
+
+
+@app.route('/api/datasets/<dataset_id>/analysis', methods=['GET'])
+def dataset_analysis(dataset_id):
+    """Анализ рисков по сохраненному набору (с фильтрами) без повторной отправки транзакций"""
+    from risk import rules_version
+    dataset = transaction_store.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Набор не найден'}), 404
+    if dataset['status'] != 'ready':
+        return jsonify({'error': 'Набор еще сохраняется, повторите запрос позже'}), 409
+    
+    cache_key = make_key('dataset-analysis', rules_version(), dataset_id, dataset['updated'], request.query_string)
+    not_modified = revalidate(cache_key)
+    if not_modified is not None:
+        return not_modified
+    cached = cached_response(cache_key)
+    if cached is not None:
+        return conditional(cached, cache_key)
+    
+    try:
+        analysis, count = dataset_summary(dataset_id, dataset, dataset_filters())
+    except ValueError as e:
+        return jsonify({'error': f'Некорректный фильтр: {e}'}), 400
+    
+    with stage('serialize'):
+        response = jsonify({
+            'success': True,
+            'dataset_id': dataset_id,
+            'analysis': analysis,
+            'count': count
+        })
+    return conditional(cache_response(cache_key, response), cache_key)
+
+
+@app.route('/api/datasets/<dataset_id>/timeline', methods=['GET'])
+def dataset_timeline(dataset_id):
+    """Риск по окнам времени и дневной ряд сохраненного набора (с фильтрами)"""
+    from risk import rules_version
+    from timeline import build_timeline
+    dataset = transaction_store.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Набор не найден'}), 404
+    if dataset['status'] != 'ready':
+        return jsonify({'error': 'Набор еще сохраняется, повторите запрос позже'}), 409
+    
+    cache_key = make_key('dataset-timeline', rules_version(), dataset_id, dataset['updated'], request.query_string)
+    not_modified = revalidate(cache_key)
+    if not_modified is not None:
+        return not_modified
+    cached = cached_response(cache_key)
+    if cached is not None:
+        return conditional(cached, cache_key)
+    
+    try:
+        windows, days = timeline_options()
+        with stage('query'):
+            frame = transaction_store.query(dataset_id, ['date', 'hour', 'day_of_week', 'amount'], dataset_filters())
+        count_rows(len(frame))
+        with stage('analyze'):
+            timeline = build_timeline(frame, windows, days)
+    except ValueError as e:
+        return jsonify({'error': f'Некорректный запрос: {e}'}), 400
+    
+    with stage('serialize'):
+        response = jsonify({
+            'success': True,
+            'dataset_id': dataset_id,
+            'timeline': timeline
+        })
+    return conditional(cache_response(cache_key, response), cache_key)
+
+
+@app.route('/api/datasets/<dataset_id>/transactions', methods=['GET'])
+def dataset_transactions(dataset_id):
+    """
+    Постраничная выдача транзакций набора с сортировкой и фильтрами на стороне сервера
+    Параметры: limit, cursor (next_cursor предыдущей страницы), sort (position, date, amount, category),
+    order (asc, desc) и фильтры как у анализа. Первая страница содержит также анализ и total
+    """
+    from risk import rules_version
+    dataset = transaction_store.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Набор не найден'}), 404
+    if dataset['status'] != 'ready':
+        return jsonify({'error': 'Набор еще сохраняется, повторите запрос позже'}), 409
+    
+    # Страница не кэшируется на сервере, но пока набор не изменился, клиент получает 304
+    etag = make_key('dataset-transactions', rules_version(), dataset_id, dataset['updated'], request.query_string)
+    not_modified = revalidate(etag)
+    if not_modified is not None:
+        return not_modified
+    
+    limit = min(max(request.args.get('limit', TRANSACTIONS_PAGE_SIZE, type=int), 1), TRANSACTIONS_PAGE_MAX)
+    cursor = request.args.get('cursor')
+    filters = dataset_filters()
+    payload = {'success': True, 'dataset_id': dataset_id}
+    
+    try:
+        # Анализ отдается вместе с первой страницей, чтобы клиенту не нужен был отдельный запрос
+        if not cursor:
+            payload['analysis'], payload['total'] = dataset_summary(dataset_id, dataset, filters)
+        with stage('query'):
+            frame, next_cursor = transaction_store.page(
+                dataset_id,
+                sort=request.args.get('sort', 'position'),
+                order=request.args.get('order', 'asc'),
+                limit=limit,
+                cursor=cursor,
+                filters=filters
+            )
+    except ValueError as e:
+        return jsonify({'error': f'Некорректные параметры: {e}'}), 400
+    count_rows(len(frame))
     
-    # Статистика по категориям
-    category_stats = df.groupby('category').agg({
-        'amount': ['count', 'sum', 'mean']
-    }).to_dict()
+    payload['count'] = len(frame)
+    payload['next_cursor'] = next_cursor
     
+    with stage('serialize'):
+        response = records_response(payload, frame)
+    return conditional(response, etag)
+
+
+@app.route('/api/datasets/<dataset_id>/transactions', methods=['POST'])
+def append_transactions(dataset_id):
+    """
+    Дозагрузка новых транзакций в сохраненный набор
+    Операции, которые уже есть в наборе (пересекающийся период), пропускаются — см. dedup
+    Анализ риска обновляется только по новым строкам (накопленное состояние набора)
+    """
+    from parsing import parse_records
+    from dedup import drop_known, period as dedup_period
+    dataset = transaction_store.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Набор не найден'}), 404
+    if dataset['status'] != 'ready':
+        return jsonify({'error': 'Набор еще сохраняется, повторите запрос позже'}), 409
+    
+    with stage('decode'):
+        data = request.get_json(silent=True)
+    if not data or not data.get('transactions'):
+        return jsonify({'error': 'Транзакции не предоставлены'}), 400
+    
+    try:
+        frame = parse_records(data['transactions'])
+    except Exception as e:
+        print(f"Ошибка разбора транзакций: {e}")
+        return jsonify({'error': 'Не удалось распарсить транзакции'}), 400
+    if frame.empty:
+        return jsonify({'error': 'Не удалось распарсить транзакции'}), 400
+    
+    # Операции, которые уже есть в наборе (пересекающийся период выписок), не добавляются
+    with stage('dedup'):
+        date_from, date_to = dedup_period(frame)
+        existing = transaction_store.query(dataset_id, ['date', 'amount', 'description'],
+                                           {'date_from': date_from, 'date_to': date_to})
+        frame, dedup = drop_known(frame, existing)
+    count_rows(len(frame))
+    with stage('persist'):
+        # Новые транзакции нумеруются после последней строки набора (под блокировкой записи)
+        transaction_store.append(dataset_id, frame, renumber=True)
+    with stage('analyze'):
+        # Без аномалий: их базы пересчитываются по всему набору в GET /api/datasets/<id>/analysis
+        analysis = transaction_store.analysis(dataset_id, anomalies=False)
+    
+    with stage('serialize'):
+        response = records_response({
+            'success': True,
+            'dataset_id': dataset_id,
+            'analysis': analysis,
+            'added': len(frame),
+            'dedup': dedup,
+            'count': analysis.get('total_transactions', 0)
+        }, frame)
+    return response
+
+
+@app.route('/api/datasets/<dataset_id>/statistics', methods=['GET'])
+def dataset_statistics(dataset_id):
+    """Статистика по сохраненному набору (с фильтрами); параметры dimensions и format как у /api/statistics"""
+    from stats import build_statistics
+    dataset = transaction_store.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Набор не найден'}), 404
+    if dataset['status'] != 'ready':
+        return jsonify({'error': 'Набор еще сохраняется, повторите запрос позже'}), 409
+    
+    cache_key = make_key('dataset-statistics', dataset_id, dataset['updated'], request.query_string)
+    not_modified = revalidate(cache_key)
+    if not_modified is not None:
+        return not_modified
+    cached = cached_response(cache_key)
+    if cached is not None:
+        return conditional(cached, cache_key)
+    
+    dimensions, output = statistics_options({})
+    fields = ['hour', 'day_of_week', 'amount', 'category']
+    if 'month' in dimensions:
+        fields.append('date')
+    if 'source' in dimensions:
+        fields.append('source')
+    
+    try:
+        with stage('query'):
+            frame = transaction_store.query(dataset_id, fields, dataset_filters())
+        with stage('aggregate'):
+            statistics = build_statistics(frame, dimensions, output)
+    except ValueError as e:
+        return jsonify({'error': f'Некорректные параметры: {e}'}), 400
+    count_rows(len(frame))
+    
+    if output == 'compact':
+        statistics['format'] = 'compact'
+    
+    with stage('serialize'):
+        response = jsonify({
+            'success': True,
+            'dataset_id': dataset_id,
+            **statistics
+        })
+    return conditional(cache_response(cache_key, response), cache_key)
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Счетчики попаданий/промахов и размер кэша результатов"""
+    from risk import rules_version
+    return jsonify({
+        'success': True,
+        'rules_version': rules_version(),
+        'cache': result_cache.stats()
+    })
+
+
+@app.route('/api/rules', methods=['GET'])
+def get_rules():
+    """Действующий набор правил риска (risk_rules.json перечитывается при изменении, без перезапуска)"""
+    import rules
+    try:
+        current = rules.current()
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        return jsonify({'error': f'Не удалось загрузить правила риска: {e}'}), 500
+    return jsonify({
+        'success': True,
+        'rules': current.describe(),
+        'status': rules.status()
+    })
+
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    cache = result_cache.stats()['memory']
+    body = metrics.render({
+        'insight_result_cache_items': ('Записей в памяти кэша результатов', cache['items']),
+        'insight_result_cache_bytes': ('Размер кэша результатов в памяти', cache['bytes'])
+    })
+    return app.response_class(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/formats', methods=['GET'])
+def get_formats():
+    """Известные форматы выписок (встроенные и выученные по новым заголовкам)"""
+    formats = format_registry.entries()
     return jsonify({
         'success': True,
-        'hourly': hourly_stats,
-        'daily': daily_stats,
-        'categories': category_stats
+        'formats': formats,
+        'total': len(formats)
     })
 
 
@@ -379,74 +1029,7 @@ def get_statistics():
 def get_examples():
     """Получение списка примеров банковских выписок"""
     try:
-        examples = []
-        
-        # Список примеров с информацией (относительные пути для клиента)
-        example_files = [
-        {
-            'path': 'examples/vtb_statement.csv',
-            'name': 'Выписка ВТБ',
-            'bank': 'ВТБ',
-            'format': 'CSV'
-        },
-        {
-            'path': 'examples/sberbank_statement.csv',
-            'name': 'Выписка Сбербанк',
-            'bank': 'Сбербанк',
-            'format': 'CSV'
-        },
-        {
-            'path': 'examples/tinkoff_statement.csv',
-            'name': 'Выписка Тинькофф',
-            'bank': 'Тинькофф',
-            'format': 'CSV'
-        },
-        {
-            'path': 'examples/alfabank_statement.csv',
-            'name': 'Выписка Альфа-Банк',
-            'bank': 'Альфа-Банк',
-            'format': 'CSV'
-        },
-        {
-            'path': 'examples/gazprombank_statement.txt',
-            'name': 'Выписка Газпромбанк',
-            'bank': 'Газпромбанк',
-            'format': 'TXT'
-        },
-        {
-            'path': 'examples/raiffeisen_statement.json',
-            'name': 'Выписка Райффайзенбанк',
-            'bank': 'Райффайзенбанк',
-            'format': 'JSON'
-        },
-        {
-            'path': 'example_transactions.csv',
-            'name': 'Базовый пример',
-            'bank': 'Общий формат',
-            'format': 'CSV'
-        }
-        ]
-        
-        # Проверяем существование файлов (используем абсолютные пути)
-        for example in example_files:
-            # Преобразуем относительный путь в абсолютный
-            if example['path'].startswith('examples/'):
-                abs_path = os.path.join(EXAMPLES_FOLDER, example['path'].replace('examples/', ''))
-            else:
-                abs_path = os.path.join(BASE_DIR, example['path'])
-            
-            if os.path.exists(abs_path):
-                examples.append(example)
-            else:
-                print(f"⚠️ Файл не найден: {abs_path}")
-        
-        print(f"✅ Найдено {len(examples)} примеров из {len(example_files)}")
-        
-        return jsonify({
-            'success': True,
-            'examples': examples,
-            'total': len(examples)
-        })
+        return stored_response(*example_store.catalog())
     except Exception as e:
         print(f"❌ Ошибка при получении списка примеров: {e}")
         return jsonify({
@@ -459,6 +1042,8 @@ def get_examples():
 @app.route('/api/load-example', methods=['POST'])
 def load_example():
     """Загрузка примера банковской выписки"""
+    from parsing import parse_transactions_frame
+    from risk import analyze_risk_patterns, rules_version
     data = request.json
     
     if not data or 'file_path' not in data:
@@ -466,6 +1051,12 @@ def load_example():
     
     relative_path = data['file_path']
     
+    # Примеры из каталога отдаются готовыми из памяти, без обращений к диску на каждый запрос
+    ndjson = wants_ndjson()
+    if example_store.has(relative_path):
+        body, status = example_store.example(relative_path, ndjson)
+        return stored_response(body, status, NDJSON_MIMETYPE if ndjson and status == 200 else None)
+    
     # Преобразуем относительный путь в абсолютный для безопасности
     if relative_path.startswith('examples/'):
         file_path = os.path.join(EXAMPLES_FOLDER, relative_path.replace('examples/', ''))
@@ -493,98 +1084,47 @@ def load_example():
     if file_ext not in ALLOWED_EXTENSIONS:
         return jsonify({'error': f'Неподдерживаемый формат файла: {file_ext}'}), 400
     
+    cache_key = make_key('load-example', rules_version(), file_ext, file_digest(file_path))
+    cached = None if ndjson else cached_response(cache_key)
+    if cached is not None:
+        return cached
+    
     # Парсинг транзакций
     try:
-        transactions = parse_transactions(file_path, file_ext)
+        frame = parse_transactions_frame(file_path, file_ext)
     except Exception as e:
         print(f"❌ Ошибка парсинга файла: {e}")
         return jsonify({
             'error': f'Ошибка при чтении файла: {str(e)}'
         }), 500
     
-    if not transactions:
+    if frame.empty:
         return jsonify({'error': 'Не удалось распарсить транзакции из файла. Проверьте формат данных.'}), 400
     
     # Анализ рисков
-    analysis = analyze_risk_patterns(transactions)
-    
-    print(f"✅ Успешно загружено {len(transactions)} транзакций")
+    with stage('analyze'):
+        analysis = analyze_risk_patterns(frame)
+    count_rows(len(frame))
+    if ndjson:
+        return ndjson_response({'success': True, 'analysis': analysis, 'count': len(frame)}, [frame])
+    print(f"✅ Успешно загружено {len(frame)} транзакций")
     
-    return jsonify({
-        'success': True,
-        'transactions': transactions,
-        'analysis': analysis,
-        'count': len(transactions)
-    })
+    with stage('serialize'):
+        response = records_response({
+            'success': True,
+            'analysis': analysis,
+            'count': len(frame)
+        }, frame)
+    return cache_response(cache_key, response)
 
 
 @app.route('/api/load-all-examples', methods=['POST'])
 def load_all_examples():
     """Загрузка всех примеров банковских выписок для тестирования"""
+    ndjson = wants_ndjson()
     try:
-        all_transactions = []
-        
-        # Список всех примеров
-        example_files = [
-            'examples/vtb_statement.csv',
-            'examples/sberbank_statement.csv',
-            'examples/tinkoff_statement.csv',
-            'examples/alfabank_statement.csv',
-            'examples/gazprombank_statement.txt',
-            'examples/raiffeisen_statement.json',
-            'example_transactions.csv'
-        ]
-        
-        print("🔄 Загрузка всех примеров для тестирования...")
-        
-        for relative_path in example_files:
-            # Преобразуем относительный путь в абсолютный
-            if relative_path.startswith('examples/'):
-                file_path = os.path.join(EXAMPLES_FOLDER, relative_path.replace('examples/', ''))
-            else:
-                file_path = os.path.join(BASE_DIR, relative_path)
-            
-            if os.path.exists(file_path):
-                # Определение типа файла
-                file_ext = file_path.rsplit('.', 1)[1].lower() if '.' in file_path else ''
-                
-                if file_ext in ALLOWED_EXTENSIONS:
-                    try:
-                        transactions = parse_transactions(file_path, file_ext)
-                        if transactions:
-                            # Добавляем информацию о источнике
-                            for trans in transactions:
-                                trans['source'] = relative_path
-                            all_transactions.extend(transactions)
-                            print(f"  ✅ Загружено {len(transactions)} транзакций из {relative_path}")
-                        else:
-                            print(f"  ⚠️ Нет транзакций в {relative_path}")
-                    except Exception as e:
-                        print(f"  ❌ Ошибка при загрузке {relative_path}: {e}")
-                else:
-                    print(f"  ⚠️ Неподдерживаемый формат: {relative_path}")
-            else:
-                print(f"  ⚠️ Файл не найден: {file_path}")
-        
-        if not all_transactions:
-            return jsonify({
-                'success': False,
-                'error': 'Не удалось загрузить ни одного примера'
-            }), 400
-        
-        # Анализ всех транзакций
-        analysis = analyze_risk_patterns(all_transactions)
-        
-        print(f"✅ Всего загружено {len(all_transactions)} транзакций из {len(example_files)} примеров")
-        
-        return jsonify({
-            'success': True,
-            'transactions': all_transactions,
-            'analysis': analysis,
-            'count': len(all_transactions),
-            'sources': len(example_files)
-        })
-    
+        body, status = example_store.all_examples(ndjson)
+        return stored_response(body, status, NDJSON_MIMETYPE if ndjson and status == 200 else None)
     except Exception as e:
         print(f"❌ Ошибка при загрузке всех примеров: {e}")
         return jsonify({
@@ -613,6 +1153,7 @@ if __name__ == '__main__':
         print(f"✅ Сервер будет доступен по адресу вашего Railway/Heroku домена\n")
         
         try:
+            lazy.warm_up(after=warm_up_examples)
             app.run(debug=debug, port=port, host=host, use_reloader=False)
         except Exception as e:
             print(f"\n❌ КРИТИЧЕСКАЯ ОШИБКА запуска сервера: {e}")
@@ -654,6 +1195,7 @@ if __name__ == '__main__':
         print(f"🌐 Откройте http://localhost:3000 в браузере\n")
         
         try:
+            lazy.warm_up(after=warm_up_examples)
             app.run(debug=True, port=port, host='127.0.0.1', use_reloader=False)
         except OSError as e:
             print(f"\n❌ Ошибка запуска сервера: {e}")
@@ -0,0 +1,107 @@
+"""
+Пакетная загрузка
+Параллельный парсинг нескольких выписок в пуле процессов и объединение в один набор
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dedup import merge_statements
+from parsing import load_transactions_frame
+
+# Пул процессов создается лениво и отдельно в каждом процессе сервера (после fork).
+# Если процесс пула аварийно завершился (OOM, сбой в нативном коде pandas/openpyxl), пул
+# становится BrokenProcessPool и сбрасывается — следующая загрузка создаст новый (как jobs.JobRunner)
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+# Ошибка файла, разбор которого прервался из-за падения процесса пула
+POOL_BROKEN_ERROR = 'Процесс обработки аварийно завершился'
+
+
+def _pool(max_workers):
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=max_workers)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _discard(executor):
+    """Сброс сломанного пула: следующий вызов _pool создаст новый"""
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+            executor.shutdown(wait=False)
+
+
+def _submit(files, max_workers):
+    """Постановка файлов в пул; пул, сломавшийся на прошлой загрузке, пересоздается один раз"""
+    executor = _pool(max_workers)
+    try:
+        return executor, [executor.submit(_parse_file, file_path, file_type) for _, file_path, file_type in files]
+    except BrokenProcessPool:
+        _discard(executor)
+        executor = _pool(max_workers)
+        return executor, [executor.submit(_parse_file, file_path, file_type) for _, file_path, file_type in files]
+
+
+def _parse_file(file_path, file_type):
+    """Парсинг одного файла (выполняется в дочернем процессе); возвращает (frame, секунды)"""
+    started = time.perf_counter()
+    frame = load_transactions_frame(file_path, file_type)
+    return frame, time.perf_counter() - started
+
+
+def parse_batch(files, max_workers=None):
+    """
+    Парсинг списка файлов [(source, file_path, file_type), ...] параллельно
+    Повторы операций из пересекающихся выписок удаляются (приоритет — у файла раньше в списке)
+    Возвращает (объединенный DataFrame с колонкой source или None, отчеты по файлам, отчет дедупликации);
+    если процесс пула упал во время разбора, незавершенные файлы получают ошибку POOL_BROKEN_ERROR
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if len(files) == 1:
+        # Один файл парсим на месте, без накладных расходов на пул
+        futures = None
+    else:
+        executor, futures = _submit(files, max_workers)
+
+    frames = []
+    reports = []
+    parsed = []
+    for position, (source, file_path, file_type) in enumerate(files):
+        report = {'file': source, 'count': 0, 'duplicates': 0, 'seconds': None, 'error': None}
+        try:
+            if futures is None:
+                frame, seconds = _parse_file(file_path, file_type)
+            else:
+                frame, seconds = futures[position].result()
+            report['seconds'] = round(seconds, 4)
+            if frame.empty:
+                report['error'] = 'Не удалось распарсить транзакции из файла'
+            else:
+                # Добавляем информацию о источнике
+                frame['source'] = source
+                frames.append(frame)
+                parsed.append(report)
+                report['count'] = len(frame)
+        except BrokenProcessPool:
+            _discard(executor)
+            report['error'] = POOL_BROKEN_ERROR
+        except Exception as e:
+            report['error'] = str(e)
+        reports.append(report)
+
+    if not frames:
+        return None, reports, None
+    combined, dedup, removed = merge_statements(frames)
+    for report, duplicates in zip(parsed, removed):
+        report['duplicates'] = duplicates
+    return combined, reports, dedup
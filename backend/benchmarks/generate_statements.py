@@ -0,0 +1,156 @@
+"""
+Генератор синтетических банковских выписок
+Пишет выписки заданного размера во всех поддерживаемых форматах (CSV, TXT, JSON, XLSX)
+и со всеми стилями заголовков банков из examples/
+
+Запуск из папки backend:
+    python benchmarks/generate_statements.py --rows 1000,100000 --formats csv,xlsx --banks vtb,tinkoff
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+
+# Заголовки выписок (как в файлах examples/): дата, сумма, категория, описание
+BANK_HEADERS = {
+    'vtb': ['Дата', 'Сумма', 'Категория', 'Описание'],
+    'sberbank': ['date', 'amount', 'category', 'description'],
+    'tinkoff': ['Дата и время', 'Сумма', 'Категория', 'Название операции'],
+    'alfabank': ['Дата операции', 'Сумма операции', 'Категория расходов', 'Описание операции'],
+    'gazprombank': ['Дата', 'Сумма', 'Категория', 'Описание'],
+    'raiffeisen': ['date', 'amount', 'category', 'description']
+}
+
+FORMATS = ('csv', 'txt', 'json', 'xlsx')
+
+# Категории и описания (как в примерах выписок), типичная сумма покупки по категории
+CATEGORIES = {
+    'Продукты': (2000, ['Супермаркет Пятёрочка', 'Магнит супермаркет', 'Перекрёсток', 'Супермаркет Ашан']),
+    'Еда': (1500, ['Ресторан', 'Кафе', 'Доставка еды', 'Ресторан быстрого питания']),
+    'Электроника': (6000, ['Наушники онлайн Wildberries', 'Ozon электроника', 'DNS', 'Чехол для телефона']),
+    'Одежда': (3500, ['Одежда онлайн', 'Zara', 'Обувь', 'Lamoda']),
+    'Развлечения': (2500, ['Кинотеатр', 'Подписка на сервис', 'Боулинг', 'Концерт']),
+    'Транспорт': (500, ['Такси', 'Метро', 'Каршеринг', 'Заправка']),
+    'Красота': (3000, ['Салон красоты', 'Косметика Золотое яблоко', 'Маникюр', 'Парикмахерская'])
+}
+
+# Распределение покупок по часам: днем и вечером чаще, ночью реже
+HOUR_WEIGHTS = np.array([2, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 7, 7, 6, 6, 6, 7, 8, 9, 9, 8, 6, 4], dtype=float)
+
+# Размеры по умолчанию (1M строк — по явному запросу)
+DEFAULT_ROWS = (1000, 10000, 100000)
+
+
+def generate_frame(rows, seed=0, year=2025):
+    """
+    Синтетические транзакции: DataFrame с колонками date, amount, category, description
+    Одинаковый seed дает одинаковые данные
+    """
+    rng = np.random.default_rng(seed)
+    names = list(CATEGORIES)
+    codes = rng.integers(0, len(names), rows)
+
+    days = rng.integers(0, 365, rows)
+    hours = rng.choice(24, size=rows, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    seconds = hours * 3600 + rng.integers(0, 60, rows) * 60
+    timestamps = np.datetime64(f'{year}-01-01', 's') + days.astype('timedelta64[D]') + seconds.astype('timedelta64[s]')
+    timestamps.sort()
+    dates = pd.Series(np.datetime_as_string(timestamps, unit='s')).str.replace('T', ' ', regex=False)
+
+    # Суммы: логнормальное распределение вокруг типичной суммы категории, округление до 10 ₽
+    typical = np.array([CATEGORIES[name][0] for name in names], dtype=float)[codes]
+    amounts = np.maximum(10, np.round(typical * rng.lognormal(0, 0.6, rows), -1)).astype(np.int64)
+
+    descriptions = np.empty(rows, dtype=object)
+    picks = rng.integers(0, 4, rows)
+    for code, name in enumerate(names):
+        mask = codes == code
+        descriptions[mask] = np.array(CATEGORIES[name][1], dtype=object)[picks[mask]]
+
+    return pd.DataFrame({
+        'date': dates,
+        'amount': amounts,
+        'category': np.array(names, dtype=object)[codes],
+        'description': descriptions
+    })
+
+
+def write_statement(frame, path, file_format, bank='vtb'):
+    """Запись транзакций в файл выписки с заголовком выбранного банка"""
+    frame = frame.set_axis(BANK_HEADERS[bank], axis=1)
+    if file_format == 'csv':
+        frame.to_csv(path, index=False, encoding='utf-8')
+    elif file_format == 'txt':
+        frame.to_csv(path, sep='\t', index=False, encoding='utf-8')
+    elif file_format == 'json':
+        frame.to_json(path, orient='records', force_ascii=False, indent=0)
+    elif file_format == 'xlsx':
+        frame.to_excel(path, index=False, engine='openpyxl')
+    else:
+        raise ValueError(f'Неизвестный формат: {file_format}')
+    return path
+
+
+def statement_path(rows, file_format, bank='vtb', out_dir=DATA_DIR):
+    return os.path.join(out_dir, f'{bank}_{rows}.{file_format}')
+
+
+def ensure_statement(rows, file_format, bank='vtb', seed=0, out_dir=DATA_DIR):
+    """Путь к выписке; файл генерируется, только если его еще нет"""
+    os.makedirs(out_dir, exist_ok=True)
+    path = statement_path(rows, file_format, bank, out_dir)
+    if not os.path.exists(path):
+        write_statement(generate_frame(rows, seed), path, file_format, bank)
+    return path
+
+
+def parse_list(value, cast=str):
+    return [cast(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Генерация синтетических банковских выписок')
+    parser.add_argument('--rows', default=','.join(map(str, DEFAULT_ROWS)),
+                        help='размеры через запятую (например 1000,1000000)')
+    parser.add_argument('--formats', default=','.join(FORMATS), help='форматы через запятую')
+    parser.add_argument('--banks', default=','.join(BANK_HEADERS), help='стили заголовков через запятую')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=DATA_DIR, help='папка для файлов')
+    parser.add_argument('--force', action='store_true', help='перезаписать существующие файлы')
+    args = parser.parse_args(argv)
+
+    sizes = parse_list(args.rows, int)
+    formats = parse_list(args.formats)
+    banks = parse_list(args.banks)
+    for name in formats:
+        if name not in FORMATS:
+            parser.error(f'неизвестный формат: {name}')
+    for bank in banks:
+        if bank not in BANK_HEADERS:
+            parser.error(f'неизвестный банк: {bank}')
+
+    os.makedirs(args.out, exist_ok=True)
+    for rows in sizes:
+        frame = generate_frame(rows, args.seed)
+        for file_format in formats:
+            for bank in banks:
+                path = statement_path(rows, file_format, bank, args.out)
+                if os.path.exists(path) and not args.force:
+                    print(f"⏭️ {path} уже существует")
+                    continue
+                started = time.perf_counter()
+                write_statement(frame, path, file_format, bank)
+                size_mb = os.path.getsize(path) / 1024 / 1024
+                print(f"✅ {path}: {rows} строк, {size_mb:.1f} MB за {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,548 @@
+"""
+Нагрузочный тест сервера
+Запускает сервер локально (gunicorn -c gunicorn.conf.py с заданными воркерами и потоками
+или python app.py), прогоняет смесь запросов /api/upload, /api/analyze, /api/statistics
+и /api/load-all-examples по сгенерированным выпискам на нескольких уровнях конкурентности
+и считает пропускную способность, p50/p90/p99 задержки, долю ошибок и память каждого воркера.
+
+Клиенты — потоки с постоянным соединением (keep-alive), каждый отправляет следующий запрос
+сразу после ответа на предыдущий (замкнутая модель; пауза — --think). Память процессов сервера
+снимается из /proc (Linux): RSS и PSS — PSS делит общие после fork страницы между воркерами,
+поэтому сумма PSS — реальный расход памяти контейнера. Емкость конфигурации — наибольшая
+пропускная способность среди уровней, где доля ошибок и p99 укладываются в бюджет.
+
+Каждая конфигурация запускается с пустым временным каталогом состояния (PROCESSED_FOLDER):
+кэш результатов и наборы одной конфигурации не достаются следующей и не попадают в data/processed.
+Кэш результатов по умолчанию выключен — повторы нескольких выписок иначе отдавались бы из кэша;
+--cache включает его (замер с повторными загрузками).
+
+Запуск из папки backend:
+    python benchmarks/load_test.py --configs 2x1,4x1,4x4 --concurrency 1,4,16 --duration 20
+    python benchmarks/load_test.py --configs flask --mix upload=1,analyze=1 --rows 10000 --cache
+    python benchmarks/load_test.py --compare benchmarks/results/load_20250101_120000.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from generate_statements import DATA_DIR, BANK_HEADERS, ensure_statement, parse_list
+
+# Смесь запросов по умолчанию (веса)
+DEFAULT_MIX = 'upload=3,analyze=4,statistics=2,load-all-examples=1'
+ENDPOINTS = ('upload', 'analyze', 'statistics', 'load-all-examples')
+
+# Бюджет, в котором уровень конкурентности считается выдержанным
+MAX_ERROR_RATE = 0.01
+P99_BUDGET_MS = 2000
+
+# Как часто снимать память процессов сервера (секунды)
+MEMORY_INTERVAL = 0.5
+
+
+class Statement:
+    """
+    Сгенерированная выписка: файл для /api/upload и ее транзакции JSON-телом для /api/analyze
+    и /api/statistics (в том виде, в каком их возвращает загрузка и присылает фронтенд)
+    """
+
+    def __init__(self, rows, file_format, bank, seed):
+        from parsing import load_transactions_frame, frame_to_records
+        out_dir = os.path.join(DATA_DIR, 'load', f'seed{seed}')
+        self.path = ensure_statement(rows, file_format, bank, seed=seed, out_dir=out_dir)
+        with open(self.path, 'rb') as f:
+            self.content = f.read()
+        transactions = frame_to_records(load_transactions_frame(self.path, file_format))
+        self.body = json.dumps({'transactions': transactions}, ensure_ascii=False).encode('utf-8')
+
+
+def multipart(path, content):
+    """Тело multipart/form-data с файлом в поле file и его Content-Type"""
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8')
+    return head + content + f'\r\n--{boundary}--\r\n'.encode('utf-8'), f'multipart/form-data; boundary={boundary}'
+
+
+def build_request(endpoint, statement):
+    """(метод, путь, тело, Content-Type) запроса смеси"""
+    if endpoint == 'upload':
+        body, content_type = multipart(statement.path, statement.content)
+        return 'POST', '/api/upload', body, content_type
+    if endpoint == 'load-all-examples':
+        return 'POST', '/api/load-all-examples', b'', 'application/json'
+    return 'POST', f'/api/{endpoint}', statement.body, 'application/json'
+
+
+def parse_mix(value):
+    """Веса смеси из строки 'upload=3,analyze=4' -> {endpoint: вес}"""
+    mix = {}
+    for item in parse_list(value):
+        name, _, weight = item.partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f'неизвестный эндпоинт: {name} (доступны {", ".join(ENDPOINTS)})')
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError('нужен хотя бы один эндпоинт с положительным весом')
+    return mix
+
+
+def parse_config(value):
+    """Конфигурация сервера: 'flask' или 'ВОРКЕРЫxПОТОКИ' для gunicorn ('4x1', '2x8')"""
+    if value == 'flask':
+        return {'name': 'flask', 'server': 'flask', 'workers': 1, 'threads': None}
+    workers, _, threads = value.partition('x')
+    if not workers.isdigit() or not (threads or '1').isdigit():
+        raise ValueError(f'конфигурация: flask или воркерыxпотоки (например 4x2), получено {value}')
+    workers, threads = int(workers), int(threads or 1)
+    return {'name': f'{workers}x{threads}', 'server': 'gunicorn', 'workers': workers, 'threads': threads}
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def health(port):
+    """Ответ /api/health или None, если сервер еще не отвечает"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+    try:
+        connection.request('GET', '/api/health')
+        return json.loads(connection.getresponse().read())
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    finally:
+        connection.close()
+
+
+def start_server(config, port, env, timeout, verbose):
+    """Запуск сервера и ожидание готовности модулей анализа; (процесс, секунды до готовности)"""
+    if config['server'] == 'flask':
+        command = [sys.executable, 'app.py']
+    else:
+        command = [shutil.which('gunicorn'), '-c', 'gunicorn.conf.py', '--threads', str(config['threads']), 'app:app']
+    env = dict(env, PORT=str(port), WEB_CONCURRENCY=str(config['workers']))
+    output = None if verbose else subprocess.DEVNULL
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=output, stderr=output)
+    while time.perf_counter() - started < timeout and process.poll() is None:
+        body = health(port)
+        if body is not None and body.get('data_stack', {}).get('status') in ('ready', 'error'):
+            return process, round(time.perf_counter() - started, 3)
+        time.sleep(0.05)
+    stop_server(process)
+    raise RuntimeError(f"сервер {config['name']} не запустился за {timeout} с")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _children():
+    """ppid -> [pid] по /proc (пустой словарь, если /proc нет)"""
+    children = {}
+    if not os.path.isdir('/proc'):
+        return children
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r') as f:
+                # Имя процесса в скобках может содержать пробелы: поля — после последней ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(name))
+    return children
+
+
+def process_memory(pid):
+    """(RSS, PSS) процесса в MB по /proc/<pid>/smaps_rollup (PSS None, если недоступен)"""
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('Rss', 'Pss'):
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        try:
+            with open(f'/proc/{pid}/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        values['Rss'] = int(line.split()[1]) / 1024
+        except OSError:
+            return None
+    if 'Rss' not in values:
+        return None
+    return values['Rss'], values.get('Pss')
+
+
+class MemorySampler(threading.Thread):
+    """
+    Пиковая память процессов сервера во время уровня нагрузки
+    Воркеры — прямые потомки мастера gunicorn; их пулы процессов (фоновые задачи, пакетный
+    парсинг) учитываются в памяти воркера-родителя
+    """
+
+    def __init__(self, root_pid, server):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.server = server
+        self.peaks = {}
+        self.total_peak = {'rss_mb': 0.0, 'pss_mb': 0.0}
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        children = _children()
+        workers = children.get(self.root_pid, []) if self.server == 'gunicorn' else []
+        groups = {self.root_pid: [self.root_pid]}
+        for worker in workers:
+            group, pending = [], [worker]
+            while pending:
+                pid = pending.pop()
+                group.append(pid)
+                pending.extend(children.get(pid, []))
+            groups[worker] = group
+        total_rss = total_pss = 0.0
+        for pid, group in groups.items():
+            rss = pss = 0.0
+            for member in group:
+                memory = process_memory(member)
+                if memory is not None:
+                    rss += memory[0]
+                    pss += memory[1] if memory[1] is not None else memory[0]
+            peak = self.peaks.setdefault(pid, {'role': 'master' if pid == self.root_pid else 'worker',
+                                               'rss_mb': 0.0, 'pss_mb': 0.0})
+            peak['rss_mb'] = max(peak['rss_mb'], round(rss, 1))
+            peak['pss_mb'] = max(peak['pss_mb'], round(pss, 1))
+            total_rss += rss
+            total_pss += pss
+        self.total_peak['rss_mb'] = max(self.total_peak['rss_mb'], round(total_rss, 1))
+        self.total_peak['pss_mb'] = max(self.total_peak['pss_mb'], round(total_pss, 1))
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(MEMORY_INTERVAL)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+        workers = [dict(peak, pid=pid) for pid, peak in self.peaks.items() if peak['role'] == 'worker']
+        master = self.peaks.get(self.root_pid)
+        # Без /proc (не Linux) память не снимается
+        return {'master': master, 'workers': workers, 'total': self.total_peak} if self.total_peak['rss_mb'] else None
+
+
+class Client(threading.Thread):
+    """Виртуальный пользователь: запросы смеси по одному постоянному соединению до дедлайна"""
+
+    def __init__(self, port, mix, statements, deadline, think, seed, timeout, results):
+        super().__init__(daemon=True)
+        self.port = port
+        self.endpoints = list(mix)
+        self.weights = list(mix.values())
+        self.statements = statements
+        self.deadline = deadline
+        self.think = think
+        self.random = random.Random(seed)
+        self.timeout = timeout
+        self.results = results
+        self.connection = None
+
+    def send(self, method, path, body, content_type):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+        headers = {'Content-Type': content_type, 'Accept-Encoding': 'gzip'}
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        data = response.read()
+        return response, data
+
+    def run(self):
+        while time.perf_counter() < self.deadline:
+            endpoint = self.random.choices(self.endpoints, self.weights)[0]
+            request = build_request(endpoint, self.random.choice(self.statements))
+            started = time.perf_counter()
+            try:
+                response, data = self.send(*request)
+                seconds = time.perf_counter() - started
+                self.results.append((endpoint, response.status, seconds, len(data),
+                                     response.getheader('X-Cache'), started))
+            except (OSError, http.client.HTTPException) as e:
+                self.results.append((endpoint, type(e).__name__, time.perf_counter() - started, 0, None, started))
+                if self.connection is not None:
+                    self.connection.close()
+                    self.connection = None
+            if self.think:
+                time.sleep(self.think)
+        if self.connection is not None:
+            self.connection.close()
+
+
+def summarize(results, seconds):
+    """Пропускная способность, задержки, ошибки и доля ответов из кэша по результатам запросов"""
+    if not results:
+        return {'requests': 0, 'errors': 0, 'error_rate': None, 'rps': 0.0}
+    latencies = np.array([row[2] for row in results]) * 1000
+    errors = [row for row in results if not isinstance(row[1], int) or row[1] >= 400]
+    cached = [row for row in results if row[4] is not None]
+    statuses = {}
+    for row in results:
+        statuses[str(row[1])] = statuses.get(str(row[1]), 0) + 1
+    return {
+        'requests': len(results),
+        'errors': len(errors),
+        'error_rate': round(len(errors) / len(results), 4),
+        'rps': round(len(results) / seconds, 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+        'p90_ms': round(float(np.percentile(latencies, 90)), 1),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+        'max_ms': round(float(latencies.max()), 1),
+        'mean_kb': round(float(np.mean([row[3] for row in results])) / 1024, 1),
+        'cache_hit_rate': round(sum(row[4] == 'HIT' for row in cached) / len(cached), 3) if cached else None,
+        'statuses': statuses
+    }
+
+
+def run_level(port, config, root_pid, mix, statements, concurrency, duration, think, timeout, seed):
+    """Один уровень конкурентности: concurrency клиентов в течение duration секунд"""
+    results = []
+    sampler = MemorySampler(root_pid, config['server'])
+    sampler.start()
+    started = time.perf_counter()
+    deadline = started + duration
+    clients = [Client(port, mix, statements, deadline, think, seed * 1000 + i, timeout, results)
+               for i in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    # Запросы, начатые до дедлайна, дожидаются ответа: делим на фактическое время
+    elapsed = time.perf_counter() - started
+    level = {'concurrency': concurrency, 'seconds': round(elapsed, 2), 'total': summarize(results, elapsed)}
+    level['endpoints'] = {endpoint: summarize([row for row in results if row[0] == endpoint], elapsed)
+                          for endpoint in mix}
+    level['memory'] = sampler.stop()
+    return level
+
+
+def within_budget(level, max_error_rate, p99_budget):
+    total = level['total']
+    return total['requests'] > 0 and total['error_rate'] <= max_error_rate and total['p99_ms'] <= p99_budget
+
+
+def capacity(levels, max_error_rate, p99_budget):
+    """Емкость: уровень с наибольшей пропускной способностью среди укладывающихся в бюджет"""
+    passed = [level for level in levels if within_budget(level, max_error_rate, p99_budget)]
+    if not passed:
+        return None
+    best = max(passed, key=lambda level: level['total']['rps'])
+    return {
+        'concurrency': best['concurrency'],
+        'rps': best['total']['rps'],
+        'p99_ms': best['total']['p99_ms'],
+        'max_concurrency': max(level['concurrency'] for level in passed)
+    }
+
+
+def run_config(config, args, mix, statements, env):
+    """Все уровни конкурентности для одной конфигурации сервера (с пустым каталогом состояния)"""
+    port = free_port()
+    processed = tempfile.mkdtemp(prefix=f"load_{config['name']}_")
+    try:
+        process, ready_s = start_server(config, port, dict(env, PROCESSED_FOLDER=processed), args.timeout,
+                                        args.verbose)
+        result = dict(config, ready_s=ready_s, levels=[])
+        try:
+            # Прогрев: по запросу каждого вида (не учитывается в результатах)
+            warmup = Client(port, mix, statements, 0, 0, 0, args.request_timeout, [])
+            for endpoint in mix:
+                try:
+                    warmup.send(*build_request(endpoint, statements[0]))
+                except (OSError, http.client.HTTPException):
+                    continue
+            for concurrency in args.concurrency:
+                level = run_level(port, config, process.pid, mix, statements, concurrency, args.duration,
+                                  args.think / 1000, args.request_timeout, args.seed)
+                result['levels'].append(level)
+                print_level(config['name'], level)
+        finally:
+            stop_server(process)
+    finally:
+        shutil.rmtree(processed, ignore_errors=True)
+    result['capacity'] = capacity(result['levels'], args.max_error_rate, args.p99_budget)
+    return result
+
+
+def print_level(name, level):
+    total = level['total']
+    memory = level['memory']
+    if total['requests'] == 0:
+        print(f"❌ {name:<6} c={level['concurrency']:<4} нет ответов")
+        return
+    mark = '✅' if total['error_rate'] == 0 else '⚠️'
+    workers = ''
+    if memory:
+        per_worker = [worker['pss_mb'] for worker in memory['workers']] or [memory['master']['pss_mb']]
+        workers = f"  PSS воркера до {max(per_worker):.0f} MB, всего {memory['total']['pss_mb']:.0f} MB"
+    print(f"{mark} {name:<6} c={level['concurrency']:<4} {total['rps']:>8.1f} запр/с  p50 {total['p50_ms']:>8.1f} ms  "
+          f"p90 {total['p90_ms']:>8.1f} ms  p99 {total['p99_ms']:>8.1f} ms  ошибок {total['error_rate'] * 100:.1f}%"
+          f"{workers}")
+    for endpoint, metrics in level['endpoints'].items():
+        if metrics['requests']:
+            hits = f"  кэш {metrics['cache_hit_rate'] * 100:.0f}%" if metrics['cache_hit_rate'] is not None else ''
+            print(f"    {endpoint:<18} {metrics['requests']:>6} запр  p50 {metrics['p50_ms']:>8.1f} ms  "
+                  f"p99 {metrics['p99_ms']:>8.1f} ms  ошибок {metrics['errors']}{hits}")
+
+
+def print_report(report):
+    print(f"\n📋 Емкость (ошибок ≤ {report['budget']['max_error_rate'] * 100:g}%, "
+          f"p99 ≤ {report['budget']['p99_ms']:g} ms)")
+    best = None
+    for result in report['configs']:
+        if 'error' in result:
+            print(f"  ❌ {result['name']:<6} {result['error']}")
+            continue
+        found = result['capacity']
+        if found is None:
+            print(f"  🔴 {result['name']:<6} ни один уровень не укладывается в бюджет")
+            continue
+        print(f"  🟢 {result['name']:<6} {found['rps']:>8.1f} запр/с при c={found['concurrency']}, "
+              f"p99 {found['p99_ms']:.1f} ms, выдерживает до c={found['max_concurrency']}")
+        if best is None or found['rps'] > best['capacity']['rps']:
+            best = result
+    if best is not None:
+        print(f"🏆 Лучшая конфигурация: {best['name']}")
+
+
+def print_comparison(current, baseline_path):
+    """Сравнение емкости конфигураций с предыдущим запуском (отношение < 1 — стало хуже)"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result['name']: result for result in json.load(f)['configs']}
+
+    print(f"\n🔍 Сравнение с {baseline_path}")
+    for result in current['configs']:
+        old = baseline.get(result['name'])
+        if not old or not old.get('capacity') or not result.get('capacity'):
+            continue
+        ratio = result['capacity']['rps'] / old['capacity']['rps']
+        mark = '🔴' if ratio < 0.9 else '🟢' if ratio > 1.1 else '⚪'
+        print(f"  {mark} {result['name']:<6} {old['capacity']['rps']:>8.1f} -> {result['capacity']['rps']:>8.1f} "
+              f"запр/с (x{ratio:.2f})")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузочный тест сервера и отчет о емкости')
+    parser.add_argument('--configs', default='4x1,4x4',
+                        help='конфигурации через запятую: воркерыxпотоки gunicorn (4x1, 2x8) или flask')
+    parser.add_argument('--concurrency', default='1,4,16', help='уровни конкурентности через запятую')
+    parser.add_argument('--duration', type=float, default=15, help='длительность уровня, с')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='веса эндпоинтов (upload=3,analyze=4,...)')
+    parser.add_argument('--rows', type=int, default=1000, help='строк в сгенерированной выписке')
+    parser.add_argument('--formats', default='csv', help='форматы выписок для загрузки через запятую')
+    parser.add_argument('--statements', type=int, default=8,
+                        help='разных выписок (с --cache повторы попадают в кэш результатов)')
+    parser.add_argument('--cache', action='store_true',
+                        help='включить кэш результатов на сервере (по умолчанию выключен)')
+    parser.add_argument('--think', type=float, default=0, help='пауза клиента между запросами, мс')
+    parser.add_argument('--max-error-rate', type=float, default=MAX_ERROR_RATE, help='допустимая доля ошибок')
+    parser.add_argument('--p99-budget', type=float, default=P99_BUDGET_MS, help='бюджет p99, мс')
+    parser.add_argument('--request-timeout', type=float, default=120, help='таймаут запроса, с')
+    parser.add_argument('--timeout', type=float, default=120, help='сколько ждать запуска сервера, с')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='показывать вывод сервера')
+    parser.add_argument('--output', help='файл результатов (по умолчанию benchmarks/results/load_<время>.json)')
+    parser.add_argument('--compare', help='файл результатов предыдущего запуска для сравнения')
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+        configs = [parse_config(value) for value in parse_list(args.configs)]
+        args.concurrency = parse_list(args.concurrency, int)
+    except ValueError as e:
+        parser.error(str(e))
+    if any(config['server'] == 'gunicorn' for config in configs) and (
+            shutil.which('gunicorn') is None or sys.platform == 'win32'):
+        parser.error('gunicorn не установлен (или Windows): используйте --configs flask')
+
+    banks = list(BANK_HEADERS)
+    formats = parse_list(args.formats)
+    print(f"📄 Подготовка {args.statements} выписок по {args.rows} строк ({', '.join(formats)})")
+    statements = [Statement(args.rows, formats[i % len(formats)], banks[i % len(banks)], args.seed + i)
+                  for i in range(args.statements)]
+
+    env = dict(os.environ)
+    if not args.cache:
+        env.update(RESULT_CACHE_MB='0', RESULT_CACHE_PERSIST='0')
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {'mix': mix, 'rows': args.rows, 'formats': formats, 'statements': args.statements,
+                   'duration_s': args.duration, 'concurrency': args.concurrency, 'think_ms': args.think,
+                   'cache': args.cache},
+        'budget': {'max_error_rate': args.max_error_rate, 'p99_ms': args.p99_budget},
+        'configs': []
+    }
+    for config in configs:
+        print(f"\n🚀 Конфигурация {config['name']}")
+        try:
+            report['configs'].append(run_config(config, args, mix, statements, env))
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            report['configs'].append(dict(config, error=str(e)))
+
+    print_report(report)
+    output = args.output or os.path.join(RESULTS_DIR, f'load_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Результаты сохранены: {output}")
+
+    if args.compare:
+        print_comparison(report, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
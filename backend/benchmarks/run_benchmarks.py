@@ -0,0 +1,256 @@
+"""
+Бенчмарк конвейера парсинга и анализа
+Замеряет этапы (парсинг, записи, анализ риска, статистика, сериализация) и эндпоинты
+через тестовый клиент Flask: строк/с, p50/p99 задержки и пиковый RSS.
+Каждый случай (формат × банк × размер) выполняется в отдельном процессе,
+поэтому пиковый RSS относится только к нему. Результаты сохраняются в JSON для сравнения запусков.
+
+Запуск из папки backend:
+    python benchmarks/run_benchmarks.py --rows 1000,100000 --formats csv,json
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/bench_20250101_120000.json
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from generate_statements import DATA_DIR, DEFAULT_ROWS, FORMATS, BANK_HEADERS, ensure_statement, parse_list
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ENDPOINTS = ('upload', 'analyze', 'statistics')
+
+
+def peak_rss_mb():
+    """Пиковый RSS текущего процесса в MB (None, если недоступен)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает KB, macOS — байты
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def summarize(samples, rows):
+    """p50/p99/среднее и пропускная способность по замерам (секунды)"""
+    values = np.array(samples, dtype=float)
+    p50 = float(np.percentile(values, 50))
+    return {
+        'runs': len(values),
+        'p50_ms': round(p50 * 1000, 3),
+        'p99_ms': round(float(np.percentile(values, 99)) * 1000, 3),
+        'mean_ms': round(float(values.mean()) * 1000, 3),
+        'rows_per_sec': round(rows / p50) if p50 > 0 else None,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def measure(func, repeat, warmup):
+    """Замер функции: (список секунд, результат последнего вызова)"""
+    result = None
+    for _ in range(warmup):
+        result = func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return samples, result
+
+
+def run_case(path, file_format, rows, repeat, warmup, endpoints, queue):
+    """Один случай бенчмарка (выполняется в отдельном процессе)"""
+    try:
+        os.environ.setdefault('RESULT_CACHE_PERSIST', '0')
+        os.chdir(BACKEND_DIR)
+
+        from parsing import load_transactions_frame, frame_to_records
+        from risk import analyze_risk_patterns
+        from stats import build_statistics
+
+        case = {'stages': {}, 'endpoints': {}, 'baseline_rss_mb': peak_rss_mb()}
+
+        samples, frame = measure(lambda: load_transactions_frame(path, file_format), repeat, warmup)
+        case['rows_parsed'] = len(frame)
+        case['stages']['parse'] = summarize(samples, rows)
+
+        samples, transactions = measure(lambda: frame_to_records(frame), repeat, warmup)
+        case['stages']['records'] = summarize(samples, rows)
+
+        samples, analysis = measure(lambda: analyze_risk_patterns(transactions), repeat, warmup)
+        case['stages']['analyze'] = summarize(samples, rows)
+
+        samples, _ = measure(lambda: build_statistics(transactions), repeat, warmup)
+        case['stages']['statistics'] = summarize(samples, rows)
+
+        payload = {'success': True, 'transactions': transactions, 'analysis': analysis, 'count': len(transactions)}
+        samples, _ = measure(lambda: json.dumps(payload, ensure_ascii=False), repeat, warmup)
+        case['stages']['serialize'] = summarize(samples, rows)
+
+        if endpoints:
+            from app import app, result_cache, transaction_store, UPLOAD_FOLDER, PROCESSED_FOLDER
+            client = app.test_client()
+            datasets = {dataset['id'] for dataset in transaction_store.list_datasets(limit=-1)}
+            existing = {folder: set(os.listdir(folder)) for folder in (UPLOAD_FOLDER, PROCESSED_FOLDER)}
+            with open(path, 'rb') as f:
+                content = f.read()
+            body = json.dumps({'transactions': transactions}, ensure_ascii=False).encode('utf-8')
+            calls = {
+                'upload': lambda: client.post('/api/upload', data={
+                    'file': (io.BytesIO(content), os.path.basename(path))
+                }, content_type='multipart/form-data'),
+                'analyze': lambda: client.post('/api/analyze', data=body, content_type='application/json'),
+                'statistics': lambda: client.post('/api/statistics', data=body, content_type='application/json')
+            }
+            for name in ENDPOINTS:
+                def call(request=calls[name]):
+                    # Кэш результатов очищаем, чтобы замерять полную обработку
+                    result_cache.clear()
+                    return request()
+                samples, response = measure(call, repeat, warmup)
+                case['endpoints'][name] = dict(summarize(samples, rows), status=response.status_code,
+                                               response_kb=round(len(response.get_data()) / 1024, 1))
+
+            # Удаляем загруженные файлы и наборы транзакций, которые сервер сохранил во время замеров
+            for folder, names in existing.items():
+                for name in set(os.listdir(folder)) - names:
+                    path_created = os.path.join(folder, name)
+                    if os.path.isfile(path_created) and (folder == UPLOAD_FOLDER or name.startswith('processed_')):
+                        os.remove(path_created)
+            for dataset in transaction_store.list_datasets(limit=-1):
+                if dataset['id'] not in datasets:
+                    transaction_store.delete(dataset['id'])
+
+        queue.put(case)
+    except Exception as e:
+        queue.put({'error': f'{type(e).__name__}: {e}'})
+
+
+def run_isolated(path, file_format, rows, repeat, warmup, endpoints):
+    """Запуск случая в новом процессе (spawn), чтобы RSS не смешивался между случаями"""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=run_case, args=(path, file_format, rows, repeat, warmup, endpoints, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(case):
+    return case['format'], case['bank'], case['rows']
+
+
+def print_case(case):
+    label = f"{case['format']:<5} {case['bank']:<12} {case['rows']:>8}"
+    if 'error' in case:
+        print(f"❌ {label}: {case['error']}")
+        return
+    print(f"📊 {label} ({case['file_mb']} MB)")
+    for group in ('stages', 'endpoints'):
+        for name, metrics in case[group].items():
+            status = f" HTTP {metrics['status']}" if 'status' in metrics else ''
+            print(f"    {group[:-1]:<8} {name:<11} p50 {metrics['p50_ms']:>10.2f} ms  "
+                  f"p99 {metrics['p99_ms']:>10.2f} ms  {metrics['rows_per_sec'] or 0:>10} строк/с  "
+                  f"RSS {metrics['peak_rss_mb']} MB{status}")
+
+
+def print_comparison(current, baseline_path):
+    """Сравнение p50 с предыдущим запуском (отношение > 1 — стало медленнее)"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {case_key(case): case for case in json.load(f)['cases']}
+
+    print(f"\n🔍 Сравнение с {baseline_path}")
+    for case in current['cases']:
+        old = baseline.get(case_key(case))
+        if old is None or 'error' in case or 'error' in old:
+            continue
+        for group in ('stages', 'endpoints'):
+            for name, metrics in case[group].items():
+                before = old.get(group, {}).get(name)
+                if not before or not before['p50_ms']:
+                    continue
+                ratio = metrics['p50_ms'] / before['p50_ms']
+                mark = '🔴' if ratio > 1.1 else '🟢' if ratio < 0.9 else '⚪'
+                print(f"  {mark} {case['format']:<5} {case['bank']:<12} {case['rows']:>8} {name:<11} "
+                      f"{before['p50_ms']:>10.2f} -> {metrics['p50_ms']:>10.2f} ms (x{ratio:.2f})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк парсинга и анализа выписок')
+    parser.add_argument('--rows', default=','.join(map(str, DEFAULT_ROWS)), help='размеры через запятую')
+    parser.add_argument('--formats', default=','.join(FORMATS), help='форматы через запятую')
+    parser.add_argument('--banks', default='vtb', help='стили заголовков через запятую')
+    parser.add_argument('--repeat', type=int, default=5, help='замеров на этап')
+    parser.add_argument('--warmup', type=int, default=1, help='прогревочных запусков на этап')
+    parser.add_argument('--no-endpoints', action='store_true', help='не замерять эндпоинты')
+    parser.add_argument('--data', default=DATA_DIR, help='папка сгенерированных выписок')
+    parser.add_argument('--output', help='файл результатов (по умолчанию benchmarks/results/bench_<время>.json)')
+    parser.add_argument('--compare', help='файл результатов предыдущего запуска для сравнения')
+    args = parser.parse_args(argv)
+
+    sizes = parse_list(args.rows, int)
+    formats = parse_list(args.formats)
+    banks = parse_list(args.banks)
+    for bank in banks:
+        if bank not in BANK_HEADERS:
+            parser.error(f'неизвестный банк: {bank}')
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {'repeat': args.repeat, 'warmup': args.warmup, 'endpoints': not args.no_endpoints},
+        'cases': []
+    }
+
+    for rows in sizes:
+        for file_format in formats:
+            for bank in banks:
+                path = ensure_statement(rows, file_format, bank, out_dir=args.data)
+                case = {'format': file_format, 'bank': bank, 'rows': rows,
+                        'file_mb': round(os.path.getsize(path) / 1024 / 1024, 2)}
+                case.update(run_isolated(path, file_format, rows, args.repeat, args.warmup, not args.no_endpoints))
+                report['cases'].append(case)
+                print_case(case)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'bench_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Результаты сохранены: {output}")
+
+    if args.compare:
+        print_comparison(report, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Бенчмарк холодного старта
+Замеряет в новых процессах: импорт app (и что он не тянет pandas/numpy), время до первого
+ответа /api/health у сервера (python app.py и gunicorn -c gunicorn.conf.py, если установлен)
+и до готовности модулей анализа. Превышение бюджета — код выхода 1, так что скрипт
+можно запускать в CI после изменений импортов.
+
+Запуск из папки backend:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --import-budget 0.5 --health-budget 1.5 --top 15
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+# Бюджет по умолчанию (секунды)
+IMPORT_BUDGET = 1.0
+HEALTH_BUDGET = 2.0
+
+# Модули, которых не должно быть после импорта app
+HEAVY = ('numpy', 'pandas', 'openpyxl')
+
+IMPORT_SCRIPT = (
+    'import json, sys, time\n'
+    'started = time.perf_counter()\n'
+    'import app\n'
+    'seconds = time.perf_counter() - started\n'
+    f'print(json.dumps({{"seconds": seconds, "heavy": [m for m in {HEAVY!r} if m in sys.modules]}}))\n'
+)
+
+
+def measure_import(repeat):
+    """Время импорта app в новых процессах (медиана) и тяжелые модули, загруженные при импорте"""
+    samples, heavy = [], set()
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT], cwd=BACKEND_DIR, text=True)
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result['seconds'])
+        heavy.update(result['heavy'])
+    return {'median_s': round(statistics.median(samples), 3), 'max_s': round(max(samples), 3), 'heavy': sorted(heavy)}
+
+
+def slowest_imports(top):
+    """Самые долгие прямые импорты app по python -X importtime (вместе с вложенными, мс)"""
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=BACKEND_DIR,
+                             capture_output=True, text=True)
+    rows = []
+    for line in process.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)', line)
+        if match and len(match.group(3)) == 3:  # отступ второго уровня: импортированы из app
+            rows.append((int(match.group(2)) / 1000, match.group(4)))
+    return [{'module': name, 'ms': round(ms, 1)} for ms, name in sorted(rows, reverse=True)[:top]]
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def health(port):
+    """Ответ /api/health или None, если сервер еще не отвечает"""
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1) as response:
+            return json.loads(response.read())
+    except OSError:
+        return None
+
+
+def measure_server(command, timeout):
+    """Время от запуска процесса до первого ответа /api/health и до загрузки модулей анализа"""
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=os.getenv('WEB_CONCURRENCY', '2'))
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = {'health_s': None, 'ready_s': None}
+    try:
+        while time.perf_counter() - started < timeout and process.poll() is None:
+            body = health(port)
+            if body is not None:
+                elapsed = round(time.perf_counter() - started, 3)
+                if result['health_s'] is None:
+                    result['health_s'] = elapsed
+                if body.get('data_stack', {}).get('status') in ('ready', 'error'):
+                    result['ready_s'] = elapsed
+                    break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк холодного старта сервера')
+    parser.add_argument('--repeat', type=int, default=5, help='запусков импорта')
+    parser.add_argument('--top', type=int, default=10, help='сколько самых долгих импортов показать')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET, help='бюджет импорта app, с')
+    parser.add_argument('--health-budget', type=float, default=HEALTH_BUDGET, help='бюджет до первого /api/health, с')
+    parser.add_argument('--timeout', type=float, default=60, help='сколько ждать запуска сервера, с')
+    parser.add_argument('--output', help='файл результатов (по умолчанию benchmarks/results/startup_<время>.json)')
+    args = parser.parse_args(argv)
+
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0]}
+    report['import'] = measure_import(args.repeat)
+    report['slowest_imports'] = slowest_imports(args.top)
+    report['servers'] = {'flask': measure_server([sys.executable, 'app.py'], args.timeout)}
+    gunicorn = shutil.which('gunicorn')
+    if gunicorn and sys.platform != 'win32':
+        report['servers']['gunicorn'] = measure_server([gunicorn, '-c', 'gunicorn.conf.py', 'app:app'], args.timeout)
+
+    imported = report['import']
+    print(f"📦 Импорт app: медиана {imported['median_s']:.3f} с, максимум {imported['max_s']:.3f} с")
+    for row in report['slowest_imports']:
+        print(f"    {row['module']:<24} {row['ms']:>8.1f} ms")
+    for name, server in report['servers'].items():
+        print(f"🚀 {name:<9} /api/health через {server['health_s']} с, модули анализа через {server['ready_s']} с")
+
+    failures = []
+    if imported['heavy']:
+        failures.append(f"импорт app загружает {', '.join(imported['heavy'])}")
+    if imported['median_s'] > args.import_budget:
+        failures.append(f"импорт app {imported['median_s']:.3f} с > {args.import_budget} с")
+    for name, server in report['servers'].items():
+        if server['health_s'] is None or server['health_s'] > args.health_budget:
+            failures.append(f"{name}: /api/health через {server['health_s']} с > {args.health_budget} с")
+    report['failures'] = failures
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f'startup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Результаты сохранены: {output}")
+
+    for failure in failures:
+        print(f"❌ Бюджет превышен: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
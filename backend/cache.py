@@ -0,0 +1,197 @@
+"""
+Кэш результатов
+Готовые JSON-ответы по хешу содержимого (файла или тела запроса)
+
+Два уровня:
+- память процесса: LRU с ограничением по количеству записей и байтам
+- диск (SQLite в data/processed): общий для всех воркеров gunicorn, LRU по времени доступа
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def file_digest(fileobj, chunk_size=1024 * 1024):
+    """SHA-256 содержимого файла (путь или файловый объект; позиция восстанавливается)"""
+    digest = hashlib.sha256()
+    if isinstance(fileobj, (str, os.PathLike)):
+        with open(fileobj, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    position = fileobj.tell()
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        digest.update(chunk)
+    fileobj.seek(position)
+    return digest.hexdigest()
+
+
+def bytes_digest(data):
+    """SHA-256 байтов (тело запроса и т.п.)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(*parts):
+    """Ключ кэша из частей (тип запроса, версия правил, хеш содержимого...)"""
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Двухуровневый кэш сериализованных ответов (bytes)
+    Счетчики попаданий/промахов памяти ведутся в процессе, диска — в общей базе
+    """
+
+    def __init__(self, max_items=256, max_bytes=64 * 1024 * 1024,
+                 persist_path=None, disk_max_bytes=256 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.persist_path = persist_path
+        self.disk_max_bytes = disk_max_bytes
+
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.persist_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS entries ('
+                        'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+                    conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            except sqlite3.Error as e:
+                # Без диска кэш продолжает работать только в памяти процесса
+                print(f"⚠️ Дисковый кэш недоступен: {e}")
+                self.persist_path = None
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.persist_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Получение ответа по ключу или None"""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._disk_get(key) if self.persist_path else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        """Сохранение ответа (bytes) в память и на диск"""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._remember(key, value)
+        if self.persist_path:
+            self._disk_set(key, value)
+
+    def _remember(self, key, value):
+        """Добавление в LRU памяти с вытеснением старых записей (под блокировкой)"""
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._items[key] = value
+        self._bytes += len(value)
+        while self._items and (len(self._items) > self.max_items or self._bytes > self.max_bytes):
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _disk_get(self, key):
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+                name = 'hits' if row else 'misses'
+                if row:
+                    conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+                conn.execute(
+                    'INSERT INTO counters (name, value) VALUES (?, 1) '
+                    'ON CONFLICT(name) DO UPDATE SET value = value + 1', (name,)
+                )
+            return bytes(row[0]) if row else None
+        except sqlite3.Error as e:
+            print(f"⚠️ Ошибка чтения кэша: {e}")
+            return None
+
+    def _disk_set(self, key, value):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                    (key, sqlite3.Binary(value), len(value), time.time())
+                )
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+                # Вытеснение самых давно использованных записей
+                while total > self.disk_max_bytes:
+                    row = conn.execute('SELECT key, size FROM entries ORDER BY accessed LIMIT 1').fetchone()
+                    if row is None:
+                        break
+                    conn.execute('DELETE FROM entries WHERE key = ?', (row[0],))
+                    total -= row[1]
+        except sqlite3.Error as e:
+            print(f"⚠️ Ошибка записи кэша: {e}")
+
+    def clear(self):
+        """Очистка обоих уровней кэша"""
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+        if self.persist_path:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM entries')
+
+    def stats(self):
+        """Счетчики и размер кэша"""
+        with self._lock:
+            stats = {
+                'memory': {
+                    'pid': os.getpid(),
+                    'items': len(self._items),
+                    'bytes': self._bytes,
+                    'max_items': self.max_items,
+                    'max_bytes': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses
+                }
+            }
+        if self.persist_path:
+            try:
+                with self._connect() as conn:
+                    items, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+                    counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+                stats['disk'] = {
+                    'items': items,
+                    'bytes': size,
+                    'max_bytes': self.disk_max_bytes,
+                    'hits': counters.get('hits', 0),
+                    'misses': counters.get('misses', 0)
+                }
+            except sqlite3.Error as e:
+                stats['disk'] = {'error': str(e)}
+        return stats
@@ -0,0 +1,94 @@
+"""
+Сжатие ответов gzip и brotli по заголовку Accept-Encoding
+brotli используется, если установлен пакет Brotli. Потоковые ответы (NDJSON) сжимаются
+по фрагментам со сбросом буфера, чтобы клиент получал строки по мере готовности
+"""
+
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # только gzip
+    brotli = None
+
+# Ответы меньше этого размера не сжимаются
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+# Уровни сжатия: быстрые настройки, для JSON степень сжатия почти как у максимальных
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '5'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html', 'text/csv')
+
+# Кодировки в порядке предпочтения сервера
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+class Compressor:
+    """Потоковый компрессор: compress (со сбросом буфера) и finish"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 — формат gzip
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress(data, encoding):
+    """Сжатие тела ответа целиком"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Сжатие потокового ответа по фрагментам"""
+    compressor = Compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response, accept_encodings):
+    """
+    Сжатие ответа Flask, если клиент принимает gzip или brotli (accept_encodings — request.accept_encodings)
+    Не сжимаются ответы с ошибками, файлы (direct_passthrough), нетекстовые и маленькие ответы
+    """
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,157 @@
+"""
+Дедупликация транзакций при объединении выписок
+Выписки за пересекающиеся периоды содержат одни и те же операции, и без дедупликации они
+завышают total_amount, число паттернов и оценку риска.
+
+Ключ операции — нормализованные (время с точностью до секунды, сумма в копейках, описание
+без учета регистра и лишних пробелов). Описания кодируются через хэш-таблицу уникальных
+значений (pandas.factorize), затем все операции сортируются один раз по (сумма, описание, время):
+точные повторы и почти-повторы (та же сумма и описание в пределах окна по времени) оказываются
+соседями в отсортированном индексе, попарного сравнения нет — O(n log n).
+
+Внутри одной выписки одинаковые операции не считаются повторами (две поездки в метро за день
+с датой без времени): повтором считается только операция, которая уже есть в выписке
+с более высоким приоритетом (раньше в списке), с учетом кратности
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Окно (в секундах), в котором операция с той же суммой и описанием считается почти-повтором
+DEDUP_WINDOW_SECONDS = int(os.getenv('DEDUP_WINDOW_SECONDS', 300))
+
+# Сколько почти-повторов перечисляется в отчете (счетчик — всегда полный)
+NEAR_DUPLICATES_LISTED = 1000
+
+# Ключ для пустой суммы (NaN не равен сам себе)
+_MISSING_AMOUNT = np.iinfo(np.int64).min
+
+
+def _description_codes(descriptions):
+    """Коды нормализованных описаний: нормализуются только уникальные значения"""
+    codes, uniques = pd.factorize(descriptions)
+    normalized = pd.Series(np.asarray(uniques, dtype=object), dtype=object).astype(str)
+    normalized = normalized.str.lower().str.split().str.join(' ')
+    normalized_codes, _ = pd.factorize(normalized)
+    return np.where(codes >= 0, normalized_codes[codes], -1)
+
+
+def _amount_cents(amounts):
+    cents = np.round(np.asarray(amounts, dtype=np.float64) * 100)
+    return np.where(np.isfinite(cents), cents, _MISSING_AMOUNT).astype(np.int64)
+
+
+def find_duplicates(timestamps, amounts, descriptions, sources, window=DEDUP_WINDOW_SECONDS):
+    """
+    Повторы операций между выписками
+    timestamps — datetime64, sources — номер выписки для каждой операции (меньше — приоритетнее)
+    Возвращает (маска точных повторов, маска почти-повторов среди остальных операций)
+    """
+    n = len(timestamps)
+    duplicate = np.zeros(n, dtype=bool)
+    near = np.zeros(n, dtype=bool)
+    if n == 0:
+        return duplicate, near
+
+    seconds = np.asarray(timestamps).astype('datetime64[s]').astype(np.int64)
+    cents = _amount_cents(amounts)
+    description = _description_codes(descriptions)
+    sources = np.asarray(sources, dtype=np.int64)
+
+    # Сортированный индекс: (сумма, описание) -> время -> выписка -> исходный порядок
+    order = np.lexsort((np.arange(n), sources, seconds, description, cents))
+    cents, description, seconds, sources = cents[order], description[order], seconds[order], sources[order]
+    same_group = np.zeros(n, dtype=bool)
+    same_group[1:] = (cents[1:] == cents[:-1]) & (description[1:] == description[:-1])
+
+    # Точные повторы: серии с одинаковым ключом, внутри серии — отрезки по выпискам.
+    # k-я одинаковая операция выписки — повтор, если в более приоритетной выписке таких операций больше k
+    same_key = same_group.copy()
+    same_key[1:] &= seconds[1:] == seconds[:-1]
+    segment_start = ~(same_key & np.concatenate(([False], sources[1:] == sources[:-1])))
+    segment = np.cumsum(segment_start) - 1
+    starts = np.flatnonzero(segment_start)
+    sizes = np.diff(np.append(starts, n))
+    run = (np.cumsum(~same_key) - 1)[starts]
+    prior = pd.Series(sizes).groupby(run).cummax().groupby(run).shift(fill_value=0).to_numpy()
+    rank = np.arange(n) - starts[segment]
+    duplicate[order] = rank < prior[segment]
+
+    # Почти-повторы: соседние (после удаления точных повторов) операции из разных выписок
+    # с той же суммой и описанием и разницей во времени не больше окна; помечается менее приоритетная
+    kept = np.flatnonzero(~duplicate[order])
+    if len(kept) > 1:
+        previous, current = kept[:-1], kept[1:]
+        delta = seconds[current] - seconds[previous]
+        close = ((cents[current] == cents[previous]) & (description[current] == description[previous])
+                 & (sources[current] != sources[previous]) & (delta > 0) & (delta <= window))
+        flagged = np.where(sources[current] > sources[previous], current, previous)[close]
+        near[order[flagged]] = True
+    return duplicate, near
+
+
+def _concat(frames):
+    """Объединение выписок; категории и описания остаются Categorical (общий словарь)"""
+    combined = pd.concat(frames, ignore_index=True)
+    for field in ('category', 'description'):
+        if all(isinstance(frame[field].dtype, pd.CategoricalDtype) for frame in frames):
+            combined[field] = union_categoricals([frame[field] for frame in frames], sort_categories=True)
+    return combined
+
+
+def _report(frame, removed, near):
+    near_rows = frame.loc[near, ['id', 'source'] if 'source' in frame else ['id']].iloc[:NEAR_DUPLICATES_LISTED]
+    return {
+        'duplicates_removed': int(removed),
+        'near_duplicates': int(near.sum()),
+        'near_duplicate_rows': near_rows.to_dict('records')
+    }
+
+
+def merge_statements(frames, window=DEDUP_WINDOW_SECONDS):
+    """
+    Объединение выписок (колоночные DataFrame в порядке приоритета) без повторяющихся операций
+    Возвращает (DataFrame, отчет, число удаленных повторов по выпискам)
+    """
+    combined = _concat(frames) if len(frames) > 1 else frames[0]
+    sources = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+    duplicate, near = find_duplicates(
+        combined['timestamp'].to_numpy(), combined['amount'].to_numpy(), combined['description'], sources, window
+    )
+    removed = np.bincount(sources[duplicate], minlength=len(frames))
+    report = _report(combined, duplicate.sum(), near)
+    if duplicate.any():
+        combined = combined[~duplicate].reset_index(drop=True)
+    return combined, report, removed.tolist()
+
+
+def period(frame, window=DEDUP_WINDOW_SECONDS):
+    """Период операций frame, расширенный на окно (ISO-строки начала и конца) — где искать повторы"""
+    timestamps = frame['timestamp'].to_numpy().astype('datetime64[s]')
+    shift = np.timedelta64(window, 's')
+    return (np.datetime_as_string(timestamps.min() - shift, unit='s'),
+            np.datetime_as_string(timestamps.max() + shift, unit='s'))
+
+
+def drop_known(frame, existing, window=DEDUP_WINDOW_SECONDS):
+    """
+    Новые операции без тех, что уже есть в сохраненном наборе
+    existing — сохраненные операции (date в ISO, amount, description), обычно только за период frame
+    Возвращает (DataFrame, отчет)
+    """
+    stored = pd.Series(existing['date'], dtype=object).str.slice(0, 19).to_numpy().astype('datetime64[s]')
+    n = len(existing)
+    timestamps = np.concatenate([stored, frame['timestamp'].to_numpy().astype('datetime64[s]')])
+    amounts = np.concatenate([existing['amount'].to_numpy(dtype=np.float64), frame['amount'].to_numpy(dtype=np.float64)])
+    descriptions = np.concatenate([existing['description'].to_numpy(dtype=object),
+                                   frame['description'].to_numpy(dtype=object)])
+    sources = np.repeat([0, 1], [n, len(frame)])
+    duplicate, near = find_duplicates(timestamps, amounts, descriptions, sources, window)
+    duplicate, near = duplicate[n:], near[n:]
+    report = _report(frame, duplicate.sum(), near)
+    if duplicate.any():
+        frame = frame[~duplicate].reset_index(drop=True)
+    return frame, report
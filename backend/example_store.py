@@ -0,0 +1,253 @@
+"""
+Примеры банковских выписок
+Каталог, разобранные примеры и общий анализ хранятся в памяти как готовые ответы
+и пересобираются только при изменении mtime исходных файлов или версии правил риска
+"""
+
+import os
+import threading
+import time
+
+from dedup import merge_statements
+from parsing import parse_transactions_frame, frame_to_records
+from risk import analyze_risk_patterns, rules_version
+from streaming import ndjson_body
+
+# Список примеров с информацией (относительные пути для клиента)
+EXAMPLE_CATALOG = [
+    {
+        'path': 'examples/vtb_statement.csv',
+        'name': 'Выписка ВТБ',
+        'bank': 'ВТБ',
+        'format': 'CSV'
+    },
+    {
+        'path': 'examples/sberbank_statement.csv',
+        'name': 'Выписка Сбербанк',
+        'bank': 'Сбербанк',
+        'format': 'CSV'
+    },
+    {
+        'path': 'examples/tinkoff_statement.csv',
+        'name': 'Выписка Тинькофф',
+        'bank': 'Тинькофф',
+        'format': 'CSV'
+    },
+    {
+        'path': 'examples/alfabank_statement.csv',
+        'name': 'Выписка Альфа-Банк',
+        'bank': 'Альфа-Банк',
+        'format': 'CSV'
+    },
+    {
+        'path': 'examples/gazprombank_statement.txt',
+        'name': 'Выписка Газпромбанк',
+        'bank': 'Газпромбанк',
+        'format': 'TXT'
+    },
+    {
+        'path': 'examples/raiffeisen_statement.json',
+        'name': 'Выписка Райффайзенбанк',
+        'bank': 'Райффайзенбанк',
+        'format': 'JSON'
+    },
+    {
+        'path': 'example_transactions.csv',
+        'name': 'Базовый пример',
+        'bank': 'Общий формат',
+        'format': 'CSV'
+    }
+]
+
+EXAMPLE_PATHS = [example['path'] for example in EXAMPLE_CATALOG]
+
+# Как часто проверять mtime файлов готового ответа (секунды); между проверками — без обращений к диску
+CHECK_INTERVAL = 1.0
+
+
+class ExampleStore:
+    """
+    Готовые ответы для /api/examples, /api/load-example и /api/load-all-examples
+    Каждый ответ — (сериализованное тело, HTTP-статус); serialize превращает dict в bytes.
+    Успешные ответы с транзакциями хранятся также в формате NDJSON (streaming.ndjson_body)
+    """
+
+    def __init__(self, base_dir, examples_dir, serialize, allowed_extensions):
+        self.base_dir = base_dir
+        self.examples_dir = examples_dir
+        self.serialize = serialize
+        self.allowed_extensions = allowed_extensions
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, relative_path):
+        """Преобразование относительного пути примера в абсолютный"""
+        if relative_path.startswith('examples/'):
+            return os.path.join(self.examples_dir, relative_path.replace('examples/', ''))
+        return os.path.join(self.base_dir, relative_path)
+
+    def has(self, relative_path):
+        """Входит ли путь в каталог примеров"""
+        return relative_path in EXAMPLE_PATHS
+
+    def _mtime(self, relative_path):
+        try:
+            return os.stat(self.resolve(relative_path)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _get(self, name, paths, build, ndjson=False):
+        """
+        Готовый ответ по имени; пересборка, если изменился mtime любого из файлов или правила риска
+        mtime проверяется не чаще раза в CHECK_INTERVAL (как файл правил в rules.current)
+        """
+        if ndjson:
+            name = (name, 'ndjson')
+        version = rules_version()
+        now = time.monotonic()
+        cached = self._responses.get(name)
+        if cached is not None and cached[0][0] == version and now - cached[2] < CHECK_INTERVAL:
+            return cached[1]
+
+        signature = (version,) + tuple(self._mtime(path) for path in paths)
+        if cached is not None and cached[0] == signature:
+            self._responses[name] = (signature, cached[1], now)
+            return cached[1]
+
+        with self._lock:
+            cached = self._responses.get(name)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+            payload, status = build()
+            body = ndjson_body(payload) if ndjson and status == 200 else self.serialize(payload)
+            response = (body, status)
+            self._responses[name] = (signature, response, now)
+            return response
+
+    def catalog(self):
+        """Ответ /api/examples"""
+        return self._get('catalog', EXAMPLE_PATHS, self._build_catalog)
+
+    def example(self, relative_path, ndjson=False):
+        """Ответ /api/load-example для примера из каталога"""
+        return self._get(('example', relative_path), [relative_path],
+                         lambda: self._build_example(relative_path), ndjson)
+
+    def all_examples(self, ndjson=False):
+        """Ответ /api/load-all-examples"""
+        return self._get('all', EXAMPLE_PATHS, self._build_all, ndjson)
+
+    def warm(self):
+        """Предварительная сборка всех ответов"""
+        self.catalog()
+        for relative_path in EXAMPLE_PATHS:
+            self.example(relative_path)
+        self.all_examples()
+
+    def _build_catalog(self):
+        examples = []
+        # Проверяем существование файлов (используем абсолютные пути)
+        for example in EXAMPLE_CATALOG:
+            abs_path = self.resolve(example['path'])
+            if os.path.exists(abs_path):
+                examples.append(example)
+            else:
+                print(f"⚠️ Файл не найден: {abs_path}")
+
+        print(f"✅ Найдено {len(examples)} примеров из {len(EXAMPLE_CATALOG)}")
+
+        return {
+            'success': True,
+            'examples': examples,
+            'total': len(examples)
+        }, 200
+
+    def _build_example(self, relative_path):
+        file_path = self.resolve(relative_path)
+        file_ext = file_path.rsplit('.', 1)[1].lower() if '.' in file_path else ''
+        if not os.path.exists(file_path):
+            print(f"❌ Файл не найден: {file_path} (относительный путь: {relative_path})")
+            return {'error': f'Файл не найден: {relative_path}'}, 404
+
+        # Парсинг транзакций
+        try:
+            frame = parse_transactions_frame(file_path, file_ext)
+        except Exception as e:
+            print(f"❌ Ошибка парсинга файла: {e}")
+            return {'error': f'Ошибка при чтении файла: {str(e)}'}, 500
+
+        if frame.empty:
+            return {'error': 'Не удалось распарсить транзакции из файла. Проверьте формат данных.'}, 400
+
+        # Анализ рисков
+        analysis = analyze_risk_patterns(frame)
+        transactions = frame_to_records(frame)
+
+        print(f"✅ Пример {relative_path} подготовлен: {len(transactions)} транзакций")
+
+        return {
+            'success': True,
+            'transactions': transactions,
+            'analysis': analysis,
+            'count': len(transactions)
+        }, 200
+
+    def _build_all(self):
+        try:
+            frames = []
+
+            print("🔄 Подготовка всех примеров...")
+
+            for relative_path in EXAMPLE_PATHS:
+                file_path = self.resolve(relative_path)
+                if not os.path.exists(file_path):
+                    print(f"  ⚠️ Файл не найден: {file_path}")
+                    continue
+
+                # Определение типа файла
+                file_ext = file_path.rsplit('.', 1)[1].lower() if '.' in file_path else ''
+                if file_ext not in self.allowed_extensions:
+                    print(f"  ⚠️ Неподдерживаемый формат: {relative_path}")
+                    continue
+
+                try:
+                    frame = parse_transactions_frame(file_path, file_ext)
+                    if frame.empty:
+                        print(f"  ⚠️ Нет транзакций в {relative_path}")
+                        continue
+                    # Добавляем информацию о источнике
+                    frame['source'] = relative_path
+                    frames.append(frame)
+                    print(f"  ✅ Загружено {len(frame)} транзакций из {relative_path}")
+                except Exception as e:
+                    print(f"  ❌ Ошибка при загрузке {relative_path}: {e}")
+
+            if not frames:
+                return {
+                    'success': False,
+                    'error': 'Не удалось загрузить ни одного примера'
+                }, 400
+
+            # Объединение без повторов (примеры могут пересекаться по периодам) и анализ всех транзакций
+            frame, dedup, _ = merge_statements(frames)
+            analysis = analyze_risk_patterns(frame)
+            transactions = frame_to_records(frame)
+
+            print(f"✅ Всего подготовлено {len(transactions)} транзакций из {len(EXAMPLE_PATHS)} примеров "
+                  f"(повторов удалено: {dedup['duplicates_removed']})")
+
+            return {
+                'success': True,
+                'transactions': transactions,
+                'analysis': analysis,
+                'count': len(transactions),
+                'sources': len(EXAMPLE_PATHS),
+                'dedup': dedup
+            }, 200
+
+        except Exception as e:
+            print(f"❌ Ошибка при загрузке всех примеров: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }, 500
@@ -0,0 +1,216 @@
+"""
+Реестр форматов банковских выписок
+Известные раскладки колонок по отпечатку нормализованного заголовка:
+точное соответствие колонок, формат даты, десятичный разделитель, кодировка и разделитель полей
+"""
+
+import csv
+import hashlib
+import json
+import os
+import threading
+
+# Формат даты во всех примерах из backend/examples
+EXAMPLE_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Встроенные форматы (по одному на банк из backend/examples)
+KNOWN_FORMATS = [
+    {
+        'bank': 'ВТБ',
+        'file_type': 'csv',
+        'columns': ['дата', 'сумма', 'категория', 'описание'],
+        'mapping': {'date': 'дата', 'amount': 'сумма', 'category': 'категория', 'description': 'описание'},
+        'date_format': EXAMPLE_DATE_FORMAT,
+        'decimal': '.',
+        'encoding': 'utf-8',
+        'sep': ','
+    },
+    {
+        'bank': 'Сбербанк',
+        'file_type': 'csv',
+        'columns': ['date', 'amount', 'category', 'description'],
+        'mapping': {'date': 'date', 'amount': 'amount', 'category': 'category', 'description': 'description'},
+        'date_format': EXAMPLE_DATE_FORMAT,
+        'decimal': '.',
+        'encoding': 'utf-8',
+        'sep': ','
+    },
+    {
+        'bank': 'Тинькофф',
+        'file_type': 'csv',
+        'columns': ['дата и время', 'сумма', 'категория', 'название операции'],
+        'mapping': {'date': 'дата и время', 'amount': 'сумма', 'category': 'категория',
+                    'description': 'название операции'},
+        'date_format': EXAMPLE_DATE_FORMAT,
+        'decimal': '.',
+        'encoding': 'utf-8',
+        'sep': ','
+    },
+    {
+        'bank': 'Альфа-Банк',
+        'file_type': 'csv',
+        'columns': ['дата операции', 'сумма операции', 'категория расходов', 'описание операции'],
+        'mapping': {'date': 'дата операции', 'amount': 'сумма операции', 'category': 'категория расходов',
+                    'description': 'описание операции'},
+        'date_format': EXAMPLE_DATE_FORMAT,
+        'decimal': '.',
+        'encoding': 'utf-8',
+        'sep': ','
+    },
+    {
+        'bank': 'Газпромбанк',
+        'file_type': 'txt',
+        'columns': ['дата', 'сумма', 'категория', 'описание'],
+        'mapping': {'date': 'дата', 'amount': 'сумма', 'category': 'категория', 'description': 'описание'},
+        'date_format': EXAMPLE_DATE_FORMAT,
+        'decimal': '.',
+        'encoding': 'utf-8',
+        'sep': '\t'
+    },
+    {
+        'bank': 'Райффайзенбанк',
+        'file_type': 'json',
+        'columns': ['date', 'amount', 'category', 'description'],
+        'mapping': {'date': 'date', 'amount': 'amount', 'category': 'category', 'description': 'description'},
+        'date_format': EXAMPLE_DATE_FORMAT,
+        'decimal': '.',
+        'encoding': 'utf-8',
+        'sep': None
+    }
+]
+
+# Предел количества выученных форматов
+MAX_LEARNED = 500
+
+# Кодировки, которые пробуем при чтении заголовка CSV/TXT
+HEADER_ENCODINGS = ('utf-8', 'cp1251')
+
+
+def normalize_header(columns):
+    """Нормализация заголовка (как у колонок DataFrame: нижний регистр, без пробелов по краям)"""
+    return [str(col).lower().strip() for col in columns]
+
+
+def fingerprint(file_type, columns):
+    """Отпечаток формата: тип файла + нормализованный заголовок"""
+    key = file_type + '\x1f' + '\x1f'.join(normalize_header(columns))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def sniff_header(file_path, file_type):
+    """
+    Чтение строки заголовка CSV/TXT без загрузки файла (путь или двоичный поток с seek)
+    Возвращает (колонки, кодировка) или (None, None)
+    """
+    if hasattr(file_path, 'readline'):
+        file_path.seek(0)
+        line = file_path.readline(64 * 1024)
+        file_path.seek(0)
+    else:
+        with open(file_path, 'rb') as f:
+            line = f.readline(64 * 1024)
+    for encoding in HEADER_ENCODINGS:
+        try:
+            text = line.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        text = text.lstrip('﻿').rstrip('\r\n')
+        delimiter = '\t' if file_type == 'txt' else ','
+        return next(csv.reader([text], delimiter=delimiter), []), encoding
+    return None, None
+
+
+class FormatRegistry:
+    """
+    Встроенные и выученные форматы выписок
+    Выученные форматы сохраняются в JSON-файл (если задан) и видны всем процессам;
+    файл перечитывается только после изменения (mtime и размер), как risk_rules.json в rules
+    """
+
+    def __init__(self):
+        self._formats = {}
+        self._learned = {}
+        self._lock = threading.Lock()
+        self._signature = None
+        self.persist_path = None
+        for entry in KNOWN_FORMATS:
+            self._formats[fingerprint(entry['file_type'], entry['columns'])] = dict(entry, source='builtin')
+
+    def enable_persistence(self, persist_path):
+        """Подключение файла с выученными форматами"""
+        self.persist_path = persist_path
+        self._load()
+
+    def _file_signature(self):
+        """(mtime, размер) файла реестра или None, если файла нет"""
+        try:
+            stat = os.stat(self.persist_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        if not self.persist_path:
+            return
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                learned = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Не удалось прочитать реестр форматов: {e}")
+            return
+        with self._lock:
+            self._learned.update(learned)
+            self._signature = signature
+
+    def lookup(self, file_type, columns):
+        """Формат по заголовку или None"""
+        key = fingerprint(file_type, columns)
+        entry = self._formats.get(key) or self._learned.get(key)
+        if entry is None and self.persist_path:
+            # Формат мог выучить другой воркер (файл читается, только если изменился)
+            self._load()
+            entry = self._learned.get(key)
+        return entry
+
+    def learn(self, file_type, columns, mapping, date_format, encoding='utf-8', sep=None):
+        """Запоминание формата нового заголовка"""
+        key = fingerprint(file_type, columns)
+        entry = {
+            'bank': None,
+            'file_type': file_type,
+            'columns': normalize_header(columns),
+            'mapping': mapping,
+            'date_format': date_format,
+            'decimal': '.',
+            'encoding': encoding,
+            'sep': sep,
+            'source': 'learned'
+        }
+        with self._lock:
+            if len(self._learned) >= MAX_LEARNED:
+                return entry
+            self._learned[key] = entry
+            if self.persist_path:
+                tmp_path = f'{self.persist_path}.{os.getpid()}.tmp'
+                try:
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(self._learned, f, ensure_ascii=False)
+                    os.replace(tmp_path, self.persist_path)
+                    # Свою запись перечитывать не нужно
+                    self._signature = self._file_signature()
+                except OSError as e:
+                    print(f"⚠️ Не удалось сохранить реестр форматов: {e}")
+        return entry
+
+    def entries(self):
+        """Все форматы (встроенные и выученные) с отпечатками"""
+        with self._lock:
+            items = list(self._formats.items()) + list(self._learned.items())
+        return [dict(entry, fingerprint=key) for key, entry in items]
+
+
+# Общий реестр процесса (наследуется дочерними процессами пулов)
+registry = FormatRegistry()
@@ -0,0 +1,19 @@
+"""
+Настройки gunicorn: gunicorn -c gunicorn.conf.py app:app (из папки backend)
+Приложение загружается один раз в мастер-процессе (preload_app), там же — модули анализа
+(pandas/numpy). Воркеры получают их через fork готовыми, без повторного импорта в каждом,
+и общими страницами памяти. Хранилища (SQLite, пулы процессов) создаются уже в воркерах
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+timeout = 120
+preload_app = True
+
+
+def when_ready(server):
+    """Сокет уже слушает, воркеры еще не запущены: запросы ждут в очереди, пока грузятся модули"""
+    from app import load_data_stack
+    load_data_stack()
@@ -0,0 +1,294 @@
+"""
+Фоновые задачи
+Асинхронная обработка тяжелых загрузок без внешнего брокера:
+очередь и состояние задач в SQLite (общие для всех воркеров), выполнение в локальном пуле процессов
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from parsing import parse_transactions_frame, iter_transaction_frames, STREAMABLE_TYPES
+from risk import analyze_risk_patterns, RiskAccumulator
+from serialization import dumps, encode_records
+from store import TransactionStore
+
+# Задача в статусе running без обновлений дольше этого времени считается прерванной
+STALE_SECONDS = 600
+# Как часто процесс задачи отмечает ее живой, пока идет долгий шаг без прогресса (разбор XLS/JSON)
+HEARTBEAT_SECONDS = 30
+# Задачи, которые так и не начались за это время, подхватываются заново (например, после рестарта)
+REQUEUE_SECONDS = 60
+# Сколько хранить результаты завершенных задач
+RESULT_TTL_SECONDS = 24 * 60 * 60
+
+
+class JobStore:
+    """Таблица задач в SQLite: queued -> running -> done / failed"""
+
+    def __init__(self, db_path, results_dir):
+        self.db_path = db_path
+        self.results_dir = results_dir
+        os.makedirs(results_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, status TEXT NOT NULL, file_name TEXT, file_path TEXT, file_type TEXT, '
+                'rows INTEGER NOT NULL DEFAULT 0, error TEXT, result_path TEXT, worker INTEGER, '
+                'created REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def result_path(self, job_id):
+        return os.path.join(self.results_dir, f'{job_id}.json')
+
+    def create(self, file_name, file_path, file_type, status='queued'):
+        """Новая задача; возвращает ее id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, file_name, file_path, file_type, created, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, status, file_name, file_path, file_type, now, now)
+            )
+        return job_id
+
+    def claim(self, job_id):
+        """Атомарный захват задачи воркером (False, если ее уже взял другой)"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, updated = ? WHERE id = ? AND status = 'queued'",
+                (os.getpid(), time.time(), job_id)
+            )
+            return cursor.rowcount == 1
+
+    def progress(self, job_id, rows):
+        with self._connect() as conn:
+            conn.execute('UPDATE jobs SET rows = ?, updated = ? WHERE id = ?', (rows, time.time(), job_id))
+
+    def heartbeat(self, job_id):
+        """Задача еще выполняется: обновление времени без изменения прогресса"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET updated = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+    def finish(self, job_id, rows, result_path):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', rows = ?, result_path = ?, updated = ? WHERE id = ?",
+                (rows, result_path, time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?",
+                (error, time.time(), job_id)
+            )
+
+    def get(self, job_id):
+        """Состояние задачи или None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['status'] == 'running' and time.time() - job['updated'] > STALE_SECONDS:
+            job['status'] = 'failed'
+            job['error'] = 'Задача прервана'
+        return job
+
+    def cleanup(self, max_age):
+        """Удаление завершенных задач, их результатов и оставшихся загруженных файлов старше max_age секунд"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, file_path, result_path FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                (time.time() - max_age,)
+            ).fetchall()
+            for row in rows:
+                for path in (row['file_path'], row['result_path']):
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                conn.execute('DELETE FROM jobs WHERE id = ?', (row['id'],))
+
+    def pending(self, older_than):
+        """Задачи в очереди, созданные раньше older_than секунд назад"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND created < ?",
+                (time.time() - older_than,)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+
+@contextmanager
+def heartbeat(store, job_id):
+    """
+    Фоновое обновление времени задачи, пока выполняется блок
+    XLS/JSON разбираются одним вызовом без прогресса; если процесс задачи упал, обновления
+    прекращаются и задача становится прерванной через STALE_SECONDS
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                store.heartbeat(job_id)
+            except sqlite3.Error as e:
+                print(f"⚠️ Задача {job_id}: не удалось обновить время: {e}")
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_upload_job(db_path, results_dir, job_id, datasets_path=None):
+    """
+    Обработка загруженного файла в дочернем процессе
+    Результат (тот же JSON, что у /api/upload) пишется в файл порциями, прогресс — в таблицу задач,
+    транзакции — в хранилище наборов (если задан datasets_path)
+    """
+    store = JobStore(db_path, results_dir)
+    if not store.claim(job_id):
+        return
+    job = store.get(job_id)
+    file_path, file_type = job['file_path'], job['file_type']
+    result_path = store.result_path(job_id)
+    tmp_path = result_path + '.tmp'
+    datasets = TransactionStore(datasets_path) if datasets_path else None
+    dataset_id = datasets.create(job['file_name'], file_type) if datasets else None
+
+    try:
+        rows = 0
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # Компактный JSON; транзакции сериализуются прямо из колонок
+            f.write('{"success":true,"transactions":[')
+            if file_type in STREAMABLE_TYPES:
+                # CSV/TXT/XLSX: чанки с обновлением прогресса после каждого
+                accumulator = RiskAccumulator()
+                for frame in iter_transaction_frames(file_path, file_type):
+                    if frame.empty:
+                        continue
+                    accumulator.update(frame)
+                    if datasets:
+                        datasets.append(dataset_id, frame)
+                    for lines in encode_records(frame, dumps, sort_keys=False):
+                        f.write((',' if rows else '') + ','.join(lines))
+                        rows += len(lines)
+                    store.progress(job_id, rows)
+                # Аномалии требуют баз по всем суммам — по запросу GET /api/datasets/<id>/analysis
+                analysis = accumulator.result()
+            else:
+                # XLS/JSON: файл разбирается целиком, пока идет разбор и анализ — фоновый heartbeat
+                with heartbeat(store, job_id):
+                    frame = parse_transactions_frame(file_path, file_type)
+                    if datasets:
+                        datasets.append(dataset_id, frame)
+                    for lines in encode_records(frame, dumps, sort_keys=False):
+                        f.write((',' if rows else '') + ','.join(lines))
+                        rows += len(lines)
+                    store.progress(job_id, rows)
+                    analysis = analyze_risk_patterns(frame)
+
+            if rows == 0:
+                raise ValueError('Не удалось распарсить транзакции из файла')
+            f.write(f'],"analysis":{dumps(analysis)},"count":{rows},"dataset_id":{dumps(dataset_id)}}}')
+
+        os.replace(tmp_path, result_path)
+        if datasets:
+            datasets.finish(dataset_id)
+        store.finish(job_id, rows, result_path)
+        print(f"✅ Задача {job_id}: обработано {rows} транзакций")
+    except Exception as e:
+        print(f"❌ Задача {job_id} завершилась с ошибкой: {e}")
+        store.fail(job_id, str(e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if datasets:
+            datasets.delete(dataset_id)
+    finally:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+
+class JobRunner:
+    """
+    Локальный пул процессов для задач; создается лениво в каждом процессе сервера
+    Если процесс пула аварийно завершился (OOM, сбой в нативном коде pandas/openpyxl), пул
+    становится BrokenProcessPool: его задачи помечаются failed, а пул пересоздается
+    """
+
+    def __init__(self, store, max_workers=2, datasets_path=None):
+        self.store = store
+        self.max_workers = max_workers
+        self.datasets_path = datasets_path
+        self._executor = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    def _pool(self):
+        with self._lock:
+            # После fork (gunicorn) пул родителя недоступен, создаем свой; сломанный пул сброшен в _discard
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                self._pid = os.getpid()
+                self.store.cleanup(RESULT_TTL_SECONDS)
+                for job_id in self.store.pending(REQUEUE_SECONDS):
+                    self._submit(self._executor, job_id)
+            return self._executor
+
+    def _submit(self, executor, job_id):
+        future = executor.submit(run_upload_job, self.store.db_path, self.store.results_dir, job_id,
+                                 self.datasets_path)
+        future.add_done_callback(lambda done: self._finished(executor, job_id, done))
+
+    def _finished(self, executor, job_id, future):
+        """Задача, не выполненная из-за сломанного пула, помечается failed, пул сбрасывается"""
+        if future.cancelled() or not isinstance(future.exception(), BrokenProcessPool):
+            return
+        job = self.store.get(job_id)
+        if job is not None and job['status'] in ('queued', 'running'):
+            print(f"❌ Задача {job_id}: процесс обработки аварийно завершился")
+            self.store.fail(job_id, 'Процесс обработки аварийно завершился')
+            # Процесс упал, не удалив загруженный файл
+            if job['file_path'] and os.path.exists(job['file_path']):
+                os.remove(job['file_path'])
+        self._discard(executor)
+
+    def _discard(self, executor):
+        """Сброс сломанного пула: следующая задача создаст новый"""
+        with self._lock:
+            if self._executor is executor and self._executor is not None:
+                self._executor = None
+                executor.shutdown(wait=False)
+
+    def submit(self, job_id):
+        """Постановка задачи в пул"""
+        with self._lock:
+            executor = self._pool()
+            try:
+                self._submit(executor, job_id)
+            except BrokenProcessPool:
+                # Пул сломался раньше, чем это заметили колбэки его задач
+                self._discard(executor)
+                self._submit(self._pool(), job_id)
@@ -0,0 +1,80 @@
+"""
+Отложенная загрузка стека анализа данных
+app.py при импорте не загружает pandas/numpy: сервер начинает отвечать (в том числе /api/health)
+сразу после старта процесса. Модули анализа импортируются в фоне (warm_up) или при первом
+запросе, которому они нужны; под gunicorn --preload — один раз в мастер-процессе до fork,
+и воркеры получают их готовыми
+"""
+
+import importlib
+import sys
+import threading
+import time
+
+# Модули, которые тянут pandas/numpy (в порядке зависимостей)
+HEAVY_MODULES = ('numpy', 'pandas', 'parsing', 'rules', 'risk', 'timeline', 'stats', 'dedup', 'store', 'batch', 'jobs', 'example_store')
+
+_state = {'status': 'pending', 'seconds': None, 'error': None}
+_lock = threading.Lock()
+
+
+class Lazy:
+    """
+    Объект, который создается factory при первом обращении к атрибуту (один раз на процесс)
+    Собственные атрибуты — только с подчеркиванием, чтобы не закрывать методы объекта (get, create...)
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+        return self._value
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+def load(modules=HEAVY_MODULES, after=None):
+    """
+    Импорт стека анализа данных (повторный вызов ничего не делает)
+    after — что выполнить после импорта (например, прогрев примеров)
+    """
+    with _lock:
+        if _state['status'] != 'pending':
+            return
+        _state['status'] = 'loading'
+    started = time.perf_counter()
+    try:
+        for name in modules:
+            importlib.import_module(name)
+        if after is not None:
+            after()
+    except Exception as e:
+        # Ошибка повторится и будет видна в запросе, которому нужен модуль
+        _state['error'] = str(e)
+        print(f"❌ Ошибка загрузки модулей анализа: {e}")
+    _state['seconds'] = round(time.perf_counter() - started, 3)
+    if _state['error'] is None:
+        _state['status'] = 'ready'
+        print(f"✅ Модули анализа загружены за {_state['seconds']:.2f}с")
+    else:
+        _state['status'] = 'error'
+
+
+def warm_up(after=None):
+    """Фоновая загрузка стека анализа данных: сервер отвечает, пока модули импортируются"""
+    thread = threading.Thread(target=load, kwargs={'after': after}, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def status():
+    """Состояние загрузки для /api/health: pending, loading, ready или error"""
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    return dict(_state, modules=len(loaded), total=len(HEAVY_MODULES))
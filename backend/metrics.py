@@ -0,0 +1,259 @@
+"""
+Метрики запросов
+Время этапов обработки каждого запроса, строки, байты, попадания в кэш,
+гистограммы задержек по эндпоинтам и экспорт в текстовом формате Prometheus.
+Метрики считаются в памяти своего процесса (у каждого воркера gunicorn — свои)
+"""
+
+import contextvars
+import cProfile
+import heapq
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Границы корзин гистограмм задержек (секунды)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Скользящее окно для квантилей: последние замеры не старше WINDOW_SECONDS
+WINDOW_SECONDS = 300
+WINDOW_SAMPLES = 1000
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Текущий запрос: {'stages': {этап: секунды}, 'rows': int}; вне запроса — None
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+@contextmanager
+def stage(name):
+    """
+    Замер этапа текущего запроса (повторные замеры одного этапа суммируются)
+    Вне запроса (например, в пуле процессов) ничего не делает
+    """
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages = current['stages']
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - started
+
+
+def timed_iter(iterable, name):
+    """Итерация с замером времени получения каждого элемента как этапа name"""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def reset():
+    """Сброс контекста запроса (teardown_request)"""
+    _current.set(None)
+
+
+def count_rows(rows):
+    """Количество строк, обработанных текущим запросом"""
+    current = _current.get()
+    if current is not None:
+        current['rows'] += rows
+
+
+class Histogram:
+    """Кумулятивная гистограмма в стиле Prometheus и скользящее окно замеров для квантилей"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=WINDOW_SAMPLES)
+
+    def observe(self, seconds, now):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        self.total += seconds
+        self.count += 1
+        self.recent.append((now, seconds))
+
+    def quantiles(self, now):
+        values = sorted(seconds for at, seconds in self.recent if now - at <= WINDOW_SECONDS)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+class SlowProfiler:
+    """
+    Выборочное профилирование запросов (cProfile)
+    Профилируется доля sample_rate запросов, на диске хранятся профили keep самых медленных
+    """
+
+    def __init__(self, output_dir, sample_rate=0.0, keep=20):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self._slowest = []  # min-heap (секунды, путь к файлу)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def start(self):
+        """Профайлер для текущего запроса или None (запрос не попал в выборку)"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Другой профайлер уже активен (например, параллельный запрос в Python 3.12+)
+            return None
+        return profiler
+
+    def finish(self, profiler, endpoint, seconds):
+        """Остановка профайлера; профиль сохраняется, если запрос среди самых медленных"""
+        profiler.disable()
+        with self._lock:
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return
+            os.makedirs(self.output_dir, exist_ok=True)
+            name = endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+            path = os.path.join(self.output_dir, f'{int(seconds * 1000):07d}ms_{name}_{int(time.time())}.txt')
+            stream = io.StringIO()
+            stream.write(f'{endpoint}: {seconds:.4f} s\n\n')
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(40)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(stream.getvalue())
+            print(f"🐢 Профиль медленного запроса сохранен: {path}")
+            heapq.heappush(self._slowest, (seconds, path))
+            if len(self._slowest) > self.keep:
+                _, removed = heapq.heappop(self._slowest)
+                if os.path.exists(removed):
+                    os.remove(removed)
+
+
+class Metrics:
+    """Счетчики и гистограммы по эндпоинтам"""
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)   # (endpoint, method, status) -> count
+        self._latency = defaultdict(Histogram)  # endpoint -> Histogram
+        self._stages = defaultdict(Histogram)   # (endpoint, stage) -> Histogram
+        self._rows = defaultdict(int)
+        self._bytes_in = defaultdict(int)
+        self._bytes_out = defaultdict(int)
+        self._cache = defaultdict(int)  # (endpoint, hit|miss) -> count
+
+    def begin(self):
+        """Начало запроса (before_request)"""
+        context = {
+            'stages': {},
+            'rows': 0,
+            'started': time.perf_counter(),
+            'profiler': self.profiler.start() if self.profiler else None
+        }
+        _current.set(context)
+        return context
+
+    def end(self, context, endpoint, method, status, bytes_in, bytes_out, cache):
+        """Завершение запроса (after_request); возвращает длительность этапов"""
+        seconds = time.perf_counter() - context['started']
+        if context['profiler'] is not None:
+            self.profiler.finish(context['profiler'], endpoint, seconds)
+        stages = context['stages']
+        now = time.time()
+        with self._lock:
+            self._requests[(endpoint, method, status)] += 1
+            self._latency[endpoint].observe(seconds, now)
+            for name, stage_seconds in stages.items():
+                self._stages[(endpoint, name)].observe(stage_seconds, now)
+            self._rows[endpoint] += context['rows']
+            self._bytes_in[endpoint] += bytes_in or 0
+            self._bytes_out[endpoint] += bytes_out or 0
+            if cache:
+                self._cache[(endpoint, cache)] += 1
+        return seconds, stages
+
+    def render(self, gauges=None):
+        """Текстовый формат Prometheus (text/plain; version=0.0.4)"""
+        now = time.time()
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def labels(**values):
+            return ','.join(f'{key}="{_escape(value)}"' for key, value in values.items())
+
+        def histogram(name, items):
+            for key, hist in items:
+                label = labels(**key)
+                for bound, count in zip(BUCKETS, hist.buckets):
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {hist.count}')
+                lines.append(f'{name}_sum{{{label}}} {hist.total:.6f}')
+                lines.append(f'{name}_count{{{label}}} {hist.count}')
+
+        with self._lock:
+            header('insight_requests_total', 'counter', 'Количество запросов')
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'insight_requests_total{{{labels(endpoint=endpoint, method=method, status=status)}}} {count}')
+
+            header('insight_request_duration_seconds', 'histogram', 'Длительность запросов')
+            histogram('insight_request_duration_seconds',
+                      [({'endpoint': endpoint}, hist) for endpoint, hist in sorted(self._latency.items())])
+
+            header('insight_request_duration_recent_seconds', 'summary',
+                   f'Квантили длительности запросов за последние {WINDOW_SECONDS} с')
+            for endpoint, hist in sorted(self._latency.items()):
+                for q, value in hist.quantiles(now).items():
+                    lines.append(f'insight_request_duration_recent_seconds'
+                                 f'{{{labels(endpoint=endpoint, quantile=q)}}} {value:.6f}')
+
+            header('insight_stage_duration_seconds', 'histogram', 'Длительность этапов обработки запросов')
+            histogram('insight_stage_duration_seconds',
+                      [({'endpoint': endpoint, 'stage': name}, hist)
+                       for (endpoint, name), hist in sorted(self._stages.items())])
+
+            for name, help_text, values in (
+                ('insight_rows_processed_total', 'Обработано транзакций', self._rows),
+                ('insight_request_bytes_total', 'Получено байт', self._bytes_in),
+                ('insight_response_bytes_total', 'Отправлено байт', self._bytes_out)
+            ):
+                header(name, 'counter', help_text)
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{{{labels(endpoint=endpoint)}}} {value}')
+
+            header('insight_cache_requests_total', 'counter', 'Ответы из кэша результатов (hit) и без него (miss)')
+            for (endpoint, result), count in sorted(self._cache.items()):
+                lines.append(f'insight_cache_requests_total{{{labels(endpoint=endpoint, result=result)}}} {count}')
+
+        for name, (help_text, value) in (gauges or {}).items():
+            header(name, 'gauge', help_text)
+            lines.append(f'{name} {value}')
+
+        header('insight_uptime_seconds', 'gauge', 'Время работы процесса')
+        lines.append(f'insight_uptime_seconds{{{labels(pid=os.getpid())}}} {now - self.started:.1f}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,599 @@
+"""
+Парсинг банковских выписок
+Колоночный разбор транзакций из CSV, Excel, JSON и текстовых файлов.
+Источник (file_path) — путь к файлу или двоичный поток с seek (загрузка, принятая в память
+или во временный файл, см. uploads); поток всегда читается с начала
+"""
+
+import json
+import warnings
+from contextlib import closing
+from datetime import datetime
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+from formats import registry, sniff_header
+from metrics import stage, timed_iter
+
+# Имена дней недели (как strftime('%A')), индекс = weekday()
+DAY_NAMES = np.array(
+    ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+    dtype=object
+)
+
+# Размер чанка (в строках) для потокового чтения CSV/TXT
+CHUNK_SIZE = 50000
+
+# Для .xlsx чанк меньше: разбор XML листа в openpyxl в десятки раз медленнее чтения CSV,
+# а первый чанк должен появиться быстро
+EXCEL_CHUNK_SIZE = 10000
+
+# Текстовые форматы (заголовок читается до разбора файла)
+TEXT_TYPES = {'csv', 'txt'}
+
+# Форматы, которые можно читать потоково (.xlsx — через openpyxl в режиме read-only)
+STREAMABLE_TYPES = TEXT_TYPES | {'xlsx'}
+
+# Среди скольких первых непустых строк листа Excel ищется строка заголовка
+HEADER_SCAN_ROWS = 20
+
+# Признаки колонок даты и суммы в названиях (detect_columns)
+DATE_KEYWORDS = ('date', 'дата', 'time')
+AMOUNT_KEYWORDS = ('amount', 'сумма', 'price')
+
+# Сколько значений даты проверяется при выводе формата для нового заголовка
+DATE_FORMAT_SAMPLE = 200
+
+# Поля транзакции в формате API (в порядке полей JSON)
+RECORD_FIELDS = ['id', 'date', 'amount', 'category', 'description',
+                 'hour', 'day_of_week', 'day_name', 'is_weekend']
+
+# Колонки компактного колоночного представления (parse_frame): типизированные массивы,
+# категория и описание — pandas.Categorical (коды + словарь строк). ISO-дата, day_name и is_weekend
+# выводятся из timestamp и day_of_week только при преобразовании в формат API (frame_to_records).
+# Необязательная колонка date содержит ISO-строки, которые нельзя вывести из timestamp
+# (даты с часовым поясом), и None для остальных строк
+FRAME_FIELDS = ['id', 'timestamp', 'amount', 'category', 'description', 'hour', 'day_of_week']
+
+
+def rewind(source):
+    """Путь — как есть, поток — на начало (источник можно прочитать повторно)"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+
+def read_frame(file_path, file_type, encoding='utf-8', sep=None, decimal='.'):
+    """Чтение файла выписки в DataFrame"""
+    rewind(file_path)
+    if file_type == 'csv':
+        return pd.read_csv(file_path, sep=sep or ',', encoding=encoding, decimal=decimal)
+    if file_type == 'xlsx':
+        return next(iter_excel_chunks(file_path, chunksize=None))
+    if file_type == 'xls':
+        return pd.read_excel(file_path)
+    if file_type == 'json':
+        if hasattr(file_path, 'read'):
+            return pd.DataFrame(json.loads(file_path.read().decode(encoding)))
+        with open(file_path, 'r', encoding=encoding) as f:
+            data = json.load(f)
+        return pd.DataFrame(data)
+    # txt
+    return pd.read_csv(file_path, sep=sep or '\t', encoding=encoding, decimal=decimal)
+
+
+def _resolve_format(file_path, file_type):
+    """
+    Поиск формата выписки в реестре до чтения файла
+    Для CSV/TXT заголовок читается отдельно; возвращает (формат или None, заголовок или None, параметры чтения)
+    """
+    header, encoding = None, 'utf-8'
+    if file_type in TEXT_TYPES:
+        header, encoding = sniff_header(file_path, file_type)
+        encoding = encoding or 'utf-8'
+    entry = registry.lookup(file_type, header) if header else None
+    options = {'encoding': encoding}
+    if entry:
+        options['sep'] = entry['sep']
+        options['decimal'] = entry['decimal']
+    return entry, header, options
+
+
+def _format_columns(entry, columns):
+    """Соответствие колонок из реестра (None, если в файле нет нужных колонок)"""
+    if entry is None:
+        return None
+    mapping = entry['mapping']
+    if all(col is None or col in columns for col in mapping.values()):
+        return mapping
+    return None
+
+
+def _ambiguous(sample, date_format):
+    """
+    Неоднозначна ли выборка для формата с днем и месяцем: все значения разбираются и с переставленными
+    %d и %m (03/04/2025 — 3 апреля или 4 марта), то есть порядок взят не из данных
+    Формат с годом в начале (ISO, 2025-03-04) однозначен
+    """
+    if date_format.startswith('%Y') or '%d' not in date_format or '%m' not in date_format:
+        return False
+    swapped = date_format.replace('%d', '%_').replace('%m', '%d').replace('%_', '%m')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return not pd.to_datetime(sample, format=swapped, errors='coerce').isna().any()
+
+
+def _infer_date_format(series):
+    """
+    Вывод явного формата даты по выборке значений
+    Формат принимается, только если на выборке он дает тот же результат, что и общий разбор,
+    и выборка однозначна (есть день больше 12): иначе первый файл закрепил бы порядок дня и месяца
+    для всех следующих выписок с тем же заголовком
+    """
+    if series.dtype.kind == 'M':
+        return None
+    sample = series.dropna().astype(str).iloc[:DATE_FORMAT_SAMPLE]
+    if sample.empty:
+        return None
+
+    expected = None
+    for dayfirst in (False, True):
+        # Пробы формата не должны засорять лог предупреждениями pandas
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            date_format = guess_datetime_format(sample.iloc[0], dayfirst=dayfirst)
+            if date_format is None:
+                continue
+            parsed = pd.to_datetime(sample, format=date_format, errors='coerce')
+        if parsed.isna().any():
+            continue
+        if expected is None:
+            expected, _, _ = _parse_dates(sample, datetime.now())
+        if np.array_equal(parsed.to_numpy(dtype='datetime64[ns]'), expected):
+            return None if _ambiguous(sample, date_format) else date_format
+    return None
+
+
+def _learn_format(file_type, header, df, encoding):
+    """Эвристическое определение колонок для нового заголовка и запоминание формата в реестре"""
+    columns = detect_columns(df.columns)
+    date_format = _infer_date_format(df[columns['date']]) if columns['date'] else None
+    entry = registry.learn(file_type, header if header is not None else df.columns, columns, date_format,
+                           encoding=encoding)
+    return entry['mapping'], entry['date_format']
+
+
+def _entry_date_format(entry, file_type, header, df, encoding):
+    """
+    Формат даты известного заголовка
+    Если выученный формат не сохранен (выборка первого файла была неоднозначной), он выводится
+    по этому файлу и запоминается, как только выборка однозначна
+    """
+    date_col = entry['mapping']['date']
+    if entry['date_format'] is not None or entry.get('source') != 'learned' or not date_col:
+        return entry['date_format']
+    date_format = _infer_date_format(df[date_col])
+    if date_format is not None:
+        registry.learn(file_type, header if header is not None else df.columns, entry['mapping'], date_format,
+                       encoding=encoding, sep=entry['sep'])
+    return date_format
+
+
+def detect_columns(columns):
+    """
+    Автоматическое определение колонок даты, суммы, категории и описания
+    Колонки должны быть уже приведены к нижнему регистру
+    """
+    date_col = None
+    amount_col = None
+    category_col = None
+    description_col = None
+
+    for col in columns:
+        col_lower = col.lower()
+        if not date_col and any(word in col_lower for word in DATE_KEYWORDS):
+            date_col = col
+        if not amount_col and any(word in col_lower for word in AMOUNT_KEYWORDS):
+            amount_col = col
+        if not category_col and ('category' in col_lower or 'категория' in col_lower or 'type' in col_lower):
+            category_col = col
+        if not description_col and ('description' in col_lower or 'описание' in col_lower or 'name' in col_lower):
+            description_col = col
+
+    # Если не нашли, используем первые колонки
+    if not date_col and len(columns) > 0:
+        date_col = columns[0]
+    if not amount_col and len(columns) > 1:
+        amount_col = columns[1]
+    if not category_col and len(columns) > 2:
+        category_col = columns[2]
+    if not description_col and len(columns) > 3:
+        description_col = columns[3]
+
+    return {
+        'date': date_col,
+        'amount': amount_col,
+        'category': category_col,
+        'description': description_col
+    }
+
+
+def _is_header(names):
+    """Похожа ли строка на заголовок выписки: есть колонки и даты, и суммы"""
+    return (any(word in name for name in names for word in DATE_KEYWORDS)
+            and any(word in name for name in names for word in AMOUNT_KEYWORDS))
+
+
+def _header_names(row):
+    """Названия колонок из строки заголовка Excel (как у pandas: Unnamed: i, дубликаты с суффиксом .N)"""
+    names = []
+    seen = {}
+    for pos, value in enumerate(row):
+        name = str(value).lower().strip() if value is not None else f'unnamed: {pos}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _trim(row):
+    """Строка листа без пустых ячеек в конце"""
+    end = len(row)
+    while end and (row[end - 1] is None or row[end - 1] == ''):
+        end -= 1
+    return row[:end]
+
+
+def iter_excel_chunks(file_path, chunksize=EXCEL_CHUNK_SIZE):
+    """
+    Потоковое чтение первого листа .xlsx (openpyxl read-only): DataFrame по chunksize строк
+    Весь лист в памяти не собирается. Строка заголовка ищется среди первых HEADER_SCAN_ROWS
+    непустых строк (строки над ней — шапка выписки), иначе заголовок — первая непустая строка.
+    Пустые строки пропускаются; индекс DataFrame сквозной, как у pd.read_excel.
+    chunksize=None — весь лист одним DataFrame
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(rewind(file_path), read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.active
+        # Размер листа в файле может быть записан неверно — читаем до последней строки
+        sheet.reset_dimensions()
+        rows = (row for row in map(_trim, sheet.iter_rows(values_only=True)) if row)
+
+        scanned = []
+        for row in rows:
+            scanned.append(row)
+            if len(scanned) >= HEADER_SCAN_ROWS:
+                break
+        start = next((pos for pos, row in enumerate(scanned)
+                      if _is_header(_header_names(row)) and all(isinstance(v, str) or v is None for v in row)), 0)
+        names = _header_names(scanned[start]) if scanned else []
+        width = len(names)
+
+        def chunk(batch, offset):
+            frame = pd.DataFrame.from_records(batch, columns=names,
+                                              index=pd.RangeIndex(offset, offset + len(batch)))
+            # Пустые ячейки — NaN, как у pd.read_excel
+            return frame.fillna(np.nan) if len(batch) else frame
+
+        offset = 0
+        batch = []
+        for row in chain(scanned[start + 1:], rows):
+            batch.append(row[:width] if len(row) >= width else row + (None,) * (width - len(row)))
+            if chunksize and len(batch) >= chunksize:
+                yield chunk(batch, offset)
+                offset += len(batch)
+                batch = []
+        if batch or not offset:
+            yield chunk(batch, offset)
+    finally:
+        workbook.close()
+
+
+def _row_compatible(df):
+    """
+    Приведение колонок к типу, который видела построчная обработка:
+    если все колонки числовые, строки DataFrame получают общий тип (int + float -> float)
+    """
+    kinds = {dtype.kind for dtype in df.dtypes}
+    if len(df.columns) > 1 and kinds and kinds <= {'i', 'u', 'f'}:
+        common = np.result_type(*df.dtypes)
+        return df.astype(common)
+    return df
+
+
+def _parse_date_scalar(date_str, now):
+    """Разбор одной даты (медленный путь для нестандартных значений)"""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return pd.to_datetime(date_str)
+    except Exception:
+        return now
+
+
+def format_iso(values):
+    """ISO-строки (как datetime.isoformat) для массива datetime64[ns] без NaT"""
+    # Строки без дробной части секунд собираем векторно
+    iso = np.datetime_as_string(values, unit='s').astype(object)
+    fractional = values.astype('datetime64[s]') != values
+    for pos in np.flatnonzero(fractional):
+        iso[pos] = pd.Timestamp(values[pos]).isoformat()
+    return iso
+
+
+def _parse_dates(series, now, date_format=None):
+    """
+    Разбор колонки дат одним вызовом
+    С явным форматом (из реестра форматов) строки разбираются без угадывания формата
+    Возвращает (naive datetime64 колонку, ISO-строки, которые не выводятся из нее, или None,
+    маску валидных строк)
+    """
+    if series.dtype.kind == 'M' and getattr(series.dtype, 'tz', None) is None:
+        # Excel и подобные источники уже отдают готовые даты
+        parsed = series
+        raw = None
+    else:
+        raw = series.astype(str)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                parsed = pd.to_datetime(raw, format=date_format or 'ISO8601', errors='coerce')
+                if date_format and (parsed.isna() & series.notna()).any():
+                    # Формат из реестра подходит не ко всем датам (выписка с тем же заголовком, но другим
+                    # порядком дня и месяца): колонка разбирается без него, как у нового заголовка
+                    parsed = pd.to_datetime(raw, format='ISO8601', errors='coerce')
+            if parsed.dtype.kind != 'M' or getattr(parsed.dtype, 'tz', None) is not None:
+                raise ValueError('mixed timezones')
+        except Exception:
+            parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+
+    values = parsed.to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(values)
+    overrides = None
+
+    # Значения, которые не разобрались по формату, разбираем по одному (с кэшем по строке)
+    if raw is not None:
+        pending = np.flatnonzero(~valid)
+        if len(pending):
+            raw_values = raw.to_numpy(dtype=object)
+            cache = {}
+            for pos in pending:
+                date_str = raw_values[pos]
+                if date_str not in cache:
+                    cache[date_str] = _parse_date_scalar(date_str, now)
+                date = cache[date_str]
+                if date is pd.NaT:
+                    continue
+                if getattr(date, 'tzinfo', None) is not None:
+                    # Смещение пояса остается только в ISO-строке, timestamp — локальное время
+                    if overrides is None:
+                        overrides = np.full(len(values), None, dtype=object)
+                    overrides[pos] = date.isoformat()
+                    date = date.replace(tzinfo=None)
+                values[pos] = np.datetime64(pd.Timestamp(date).to_datetime64(), 'ns')
+                valid[pos] = True
+
+    return values, overrides, valid
+
+
+def _parse_amounts(series):
+    """
+    Нормализация сумм одним проходом
+    Возвращает (массив float64, маску валидных строк)
+    """
+    if series.dtype.kind in 'iuf':
+        return series.to_numpy(dtype=np.float64), np.ones(len(series), dtype=bool)
+
+    cleaned = (
+        series.astype(str)
+        .str.replace(',', '.', regex=False)
+        .str.replace(' ', '', regex=False)
+        .to_numpy(dtype=object)
+    )
+    try:
+        return cleaned.astype(np.float64), np.ones(len(cleaned), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+
+    amounts = np.zeros(len(cleaned), dtype=np.float64)
+    valid = np.ones(len(cleaned), dtype=bool)
+    for pos, value in enumerate(cleaned):
+        try:
+            amounts[pos] = float(value)
+        except (TypeError, ValueError):
+            valid[pos] = False
+    return amounts, valid
+
+
+def parse_frame(df, columns=None, date_format=None):
+    """
+    Колоночный разбор DataFrame выписки
+    columns и date_format берутся из реестра форматов; без них колонки определяются эвристически
+    Возвращает компактный DataFrame (FRAME_FIELDS и, для дат с часовым поясом, date)
+    """
+    if columns is None:
+        columns = detect_columns(df.columns)
+    df = _row_compatible(df)
+    now = datetime.now()
+    n = len(df)
+
+    date_col = columns['date']
+    amount_col = columns['amount']
+    category_col = columns['category']
+    description_col = columns['description']
+
+    if date_col:
+        timestamps, overrides, date_valid = _parse_dates(df[date_col], now, date_format)
+    else:
+        timestamps = np.full(n, np.datetime64(now, 'ns'))
+        overrides = None
+        date_valid = np.ones(n, dtype=bool)
+
+    if amount_col:
+        amounts, amount_valid = _parse_amounts(df[amount_col])
+    else:
+        amounts, amount_valid = np.zeros(n, dtype=np.float64), np.ones(n, dtype=bool)
+
+    valid = date_valid & amount_valid
+    skipped = n - int(valid.sum())
+    if skipped:
+        print(f"Пропущено строк с ошибками: {skipped}")
+
+    index = pd.Index(df.index[valid])
+    timestamps = pd.DatetimeIndex(timestamps[valid])
+
+    if category_col:
+        category = df[category_col].astype(str).to_numpy(dtype=object)[valid]
+    else:
+        category = np.full(len(index), 'Другое', dtype=object)
+    if description_col:
+        description = df[description_col].astype(str).to_numpy(dtype=object)[valid]
+    else:
+        description = np.full(len(index), 'Без описания', dtype=object)
+
+    frame = pd.DataFrame({
+        'id': index.to_numpy(),
+        'timestamp': timestamps.to_numpy(),
+        'amount': amounts[valid],
+        'category': pd.Categorical(category),
+        'description': pd.Categorical(description),
+        'hour': timestamps.hour.to_numpy(dtype=np.int8),
+        'day_of_week': timestamps.dayofweek.to_numpy(dtype=np.int8)  # 0 = Monday, 6 = Sunday
+    })
+    if overrides is not None:
+        frame['date'] = overrides[valid]
+    return frame
+
+
+def iso_dates(frame):
+    """
+    ISO-строки дат транзакций
+    Явные значения колонки date, остальные — из timestamp (у наборов из хранилища date заполнена целиком)
+    """
+    if 'timestamp' not in frame:
+        return frame['date'].to_numpy(dtype=object)
+    iso = format_iso(frame['timestamp'].to_numpy(dtype='datetime64[ns]'))
+    if 'date' in frame:
+        explicit = frame['date'].to_numpy(dtype=object)
+        present = ~pd.isna(explicit)
+        iso[present] = explicit[present]
+    return iso
+
+
+def frame_to_records(frame):
+    """
+    Преобразование колоночного представления в список словарей (формат API)
+    Выполняется только на границе JSON; колонка source (источник выписки) добавляется, если она есть
+    """
+    fields = RECORD_FIELDS + ['source'] if 'source' in frame else RECORD_FIELDS
+    weekdays = frame['day_of_week'].to_numpy(dtype=np.int64)
+    derived = {
+        'date': iso_dates(frame),
+        'day_name': DAY_NAMES[weekdays],
+        'is_weekend': weekdays >= 5
+    }
+    columns = [derived[field].tolist() if field in derived else frame[field].tolist() for field in fields]
+    return [dict(zip(fields, row)) for row in zip(*columns)]
+
+
+def parse_records(records):
+    """
+    Колоночный разбор транзакций из JSON (список словарей с датой, суммой, категорией и описанием)
+    Колонки определяются так же, как у загружаемых файлов
+    """
+    df = pd.DataFrame(records)
+    df.columns = df.columns.astype(str).str.lower().str.strip()
+    with stage('parse'):
+        return parse_frame(df)
+
+
+def load_transactions_frame(file_path, file_type):
+    """
+    Парсинг транзакций в колоночное представление
+    Ошибки чтения файла пробрасываются вызывающему коду
+    """
+    with stage('read'):
+        entry, header, options = _resolve_format(file_path, file_type)
+        df = read_frame(file_path, file_type, **options)
+
+    # Нормализация колонок (приведение к нижнему регистру)
+    df.columns = df.columns.str.lower().str.strip()
+
+    with stage('parse'):
+        if entry is None and header is None:
+            # Excel/JSON: заголовок известен только после чтения
+            entry = registry.lookup(file_type, df.columns)
+        columns = _format_columns(entry, df.columns)
+        if columns is not None:
+            return parse_frame(df, columns, _entry_date_format(entry, file_type, header, df, options['encoding']))
+
+        columns, date_format = _learn_format(file_type, header, df, options['encoding'])
+        return parse_frame(df, columns, date_format)
+
+
+def parse_transactions_frame(file_path, file_type):
+    """
+    Парсинг транзакций в колоночное представление
+    При ошибке чтения файла возвращает пустой DataFrame
+    """
+    try:
+        return load_transactions_frame(file_path, file_type)
+    except Exception as e:
+        print(f"Ошибка парсинга файла: {e}")
+        return pd.DataFrame(columns=FRAME_FIELDS)
+
+
+def iter_transaction_frames(file_path, file_type, chunksize=None):
+    """
+    Потоковый парсинг CSV/TXT/XLSX чанками фиксированного размера
+    Колонки определяются один раз по заголовку (из реестра форматов или по первому чанку),
+    память не зависит от размера файла
+    Ошибки чтения пробрасываются вызывающему коду
+    """
+    if file_type not in STREAMABLE_TYPES:
+        raise ValueError(f'Потоковое чтение не поддерживается для формата: {file_type}')
+
+    entry, header, options = _resolve_format(file_path, file_type)
+    if file_type == 'xlsx':
+        reader = iter_excel_chunks(file_path, chunksize or EXCEL_CHUNK_SIZE)
+    else:
+        sep = options.get('sep') or ('\t' if file_type == 'txt' else ',')
+        reader = pd.read_csv(rewind(file_path), sep=sep, encoding=options['encoding'],
+                             decimal=options.get('decimal', '.'), chunksize=chunksize or CHUNK_SIZE)
+    columns = None
+    date_format = None
+    with closing(reader):
+        for chunk in timed_iter(reader, 'read'):
+            with stage('parse'):
+                chunk.columns = chunk.columns.str.lower().str.strip()
+                if columns is None:
+                    if entry is None and header is None:
+                        # Excel: заголовок известен только после чтения первого чанка
+                        entry = registry.lookup(file_type, chunk.columns)
+                    columns = _format_columns(entry, chunk.columns)
+                    if columns is not None:
+                        date_format = _entry_date_format(entry, file_type, header, chunk, options['encoding'])
+                    else:
+                        columns, date_format = _learn_format(file_type, header, chunk, options['encoding'])
+                frame = parse_frame(chunk, columns, date_format)
+            yield frame
+
+
+def parse_transactions(file_path, file_type):
+    """
+    Парсинг транзакций из различных форматов
+    Поддерживает CSV, Excel, JSON и текстовые файлы
+    """
+    return frame_to_records(parse_transactions_frame(file_path, file_type))
@@ -0,0 +1,265 @@
+"""
+Анализ рисков
+Векторизованная оценка риска импульсивных покупок по массивам часа, дня недели и суммы
+по скомпилированным правилам (см. rules и risk_rules.json);
+нетипичные для категории и времени суток суммы ищутся по устойчивым базам (см. anomalies)
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+import rules as risk_rules
+from anomalies import anomaly_arrays, detect_anomalies, with_anomalies
+
+# Версия алгоритма анализа; вместе с версией набора правил (rules_version) входит в ключ кэша результатов
+RULES_VERSION = '2'
+
+# Вечерние покупки для статистики (с 18:00)
+EVENING_HOUR = 18
+
+
+def rules_version(rules=None):
+    """Версия анализа для ключей кэша и сохраненного состояния: алгоритм и действующий набор правил"""
+    return f'{RULES_VERSION}.{(rules or risk_rules.current()).version}'
+
+
+def _as_arrays(transactions):
+    """
+    Извлечение массивов признаков из списка словарей или колоночного DataFrame
+    Возвращает (hours, weekdays, amounts, weekend)
+    """
+    if isinstance(transactions, pd.DataFrame):
+        weekdays = transactions['day_of_week'].to_numpy(dtype=np.int64)
+        # В компактном представлении is_weekend не хранится и выводится из дня недели
+        weekend = (transactions['is_weekend'].to_numpy(dtype=bool)
+                   if 'is_weekend' in transactions else weekdays >= 5)
+        return (
+            transactions['hour'].to_numpy(dtype=np.int64),
+            weekdays,
+            transactions['amount'].to_numpy(dtype=np.float64),
+            weekend
+        )
+
+    n = len(transactions)
+    hours = np.fromiter((t['hour'] for t in transactions), dtype=np.int64, count=n)
+    weekdays = np.fromiter((t['day_of_week'] for t in transactions), dtype=np.int64, count=n)
+    # Тип сумм сохраняем: целые суммы дают целый total_amount, как и раньше
+    amounts = np.array([t['amount'] for t in transactions])
+    weekend = np.fromiter((bool(t['is_weekend']) for t in transactions), dtype=bool, count=n)
+    return hours, weekdays, amounts, weekend
+
+
+def exact_sum_parts(values):
+    """
+    Точная сумма значений в виде нескольких float (их сумма без округления равна сумме values)
+    math.fsum(parts) — корректно округленная сумма, не зависящая от порядка и разбиения на порции
+    """
+    parts = []
+    rest = list(values)
+    while True:
+        total = math.fsum(rest)
+        if total == 0:
+            return parts
+        parts.append(total)
+        if not math.isfinite(total):
+            return parts
+        rest.append(-total)
+
+
+def risk_scores(hours, weekdays, amounts, weekend=None, rules=None):
+    """
+    Риск каждой транзакции (массив int) по правилам из risk_rules.json
+
+    Правила по умолчанию:
+    - ночь (22:00 - 6:00): +3, поздний вечер (20:00 - 22:00): +2, вечер (18:00 - 20:00): +1
+    - пятница вечером: +2, выходные вечером: +1
+    - сумма более 5000: +2, более 2000: +1
+    """
+    rules = rules or risk_rules.current()
+    weekdays = np.asarray(weekdays)
+    if weekend is None:
+        weekend = weekdays >= 5
+    amounts = np.abs(np.asarray(amounts, dtype=np.float64))
+    return rules.scores(rules.cells(hours, weekdays, weekend), amounts)
+
+
+def score_risk(hours, weekdays, amounts, weekend=None, rules=None):
+    """
+    Полный анализ риска по массивам признаков
+    Возвращает тот же JSON, что и analyze_risk_patterns
+    """
+    rules = rules or risk_rules.current()
+    n = len(hours)
+    if n == 0:
+        return {
+            'risk_level': 'low',
+            'risk_score': 0,
+            'patterns': [],
+            'recommendations': []
+        }
+
+    hours = np.asarray(hours)
+    weekdays = np.asarray(weekdays)
+    amounts = np.abs(np.asarray(amounts))
+    if weekend is None:
+        weekend = weekdays >= 5
+    weekend = np.asarray(weekend, dtype=bool)
+
+    cells = rules.cells(hours, weekdays, weekend)
+    amounts_float = amounts.astype(np.float64)
+    scores = rules.scores(cells, amounts_float)
+
+    evening_count = int(np.count_nonzero(hours >= EVENING_HOUR))
+    weekend_count = int(np.count_nonzero(weekend))
+    # Последовательная сумма (как sum() по списку), чтобы округление совпадало до копейки
+    total_amount = np.cumsum(amounts)[-1].item()
+    # Среднее по точной сумме: накопительный анализ (RiskAccumulator) дает то же значение
+    average_amount = np.float64(math.fsum(amounts.tolist())) / n
+
+    return _build_result(
+        rules=rules,
+        n=n,
+        avg_risk=scores.mean(),
+        recent_risk=scores[-10:].mean() if n >= 10 else scores.mean(),
+        pattern_counts=rules.pattern_counts(cells, amounts_float),
+        evening_count=evening_count,
+        weekend_count=weekend_count,
+        total_amount=total_amount,
+        average_amount=average_amount
+    )
+
+
+def risk_level(score, rules=None):
+    """Уровень риска по средней оценке (по умолчанию: high от 5, medium от 3, иначе low)"""
+    return (rules or risk_rules.current()).level(score)[0]
+
+
+def _build_result(rules, n, avg_risk, recent_risk, pattern_counts, evening_count, weekend_count,
+                  total_amount, average_amount):
+    """Сборка итогового JSON анализа из агрегатов"""
+    # Классификация уровня риска
+    level, level_recommendation = rules.level(recent_risk)
+
+    # Паттерны: доля транзакций выше порога правила
+    patterns = []
+    recommendations = [level_recommendation] if level_recommendation else []
+    for rule in rules.patterns:
+        count = pattern_counts[rule['type']]
+        if count > n * rule['min_share']:
+            pattern = {'type': rule['type'], 'description': rule['description'], 'count': count}
+            if rule['min_share'] > 0:
+                pattern['percentage'] = round(count / n * 100, 1)
+            patterns.append(pattern)
+        if count > 0 and rule.get('recommendation'):
+            recommendations.append(rule['recommendation'])
+
+    return {
+        'risk_level': level,
+        'risk_score': round(recent_risk, 2),
+        'average_risk': round(avg_risk, 2),
+        'patterns': patterns,
+        'recommendations': recommendations,
+        'total_transactions': n,
+        'statistics': {
+            'night_purchases': pattern_counts.get('night_purchases', 0),
+            'evening_purchases': evening_count,
+            'weekend_purchases': weekend_count,
+            'total_amount': round(total_amount, 2),
+            'average_amount': round(average_amount, 2)
+        }
+    }
+
+
+class RiskAccumulator:
+    """
+    Накопительный анализ риска для потоковой обработки и дозагрузки в сохраненный набор
+    Хранит только счетчики, суммы и последние RECENT_WINDOW оценок,
+    поэтому память не зависит от количества транзакций. Результат совпадает
+    с analyze_risk_patterns по всем транзакциям; состояние сериализуется в JSON (to_state).
+    Набор правил фиксируется при создании: смена правил во время потоковой обработки
+    не смешивает оценки (версия — в self.version)
+    """
+
+    RECENT_WINDOW = 10
+
+    def __init__(self, rules=None):
+        self.rules = rules or risk_rules.current()
+        self.version = rules_version(self.rules)
+        self.count = 0
+        self.score_sum = 0
+        self.pattern_counts = {pattern['type']: 0 for pattern in self.rules.patterns}
+        self.evening_count = 0
+        self.weekend_count = 0
+        self.total_amount = 0.0
+        self.amount_parts = []  # точная сумма модулей сумм (exact_sum_parts)
+        self.recent = np.zeros(0, dtype=np.int64)
+
+    def update(self, transactions):
+        """Добавление порции транзакций (список словарей или колоночный DataFrame)"""
+        if transactions is None or len(transactions) == 0:
+            return
+        hours, weekdays, amounts, weekend = _as_arrays(transactions)
+        amounts = np.abs(amounts.astype(np.float64))
+        cells = self.rules.cells(hours, weekdays, weekend)
+        scores = self.rules.scores(cells, amounts)
+
+        self.count += len(hours)
+        self.score_sum += int(scores.sum())
+        for name, count in self.rules.pattern_counts(cells, amounts).items():
+            self.pattern_counts[name] += count
+        self.evening_count += int(np.count_nonzero(hours >= EVENING_HOUR))
+        self.weekend_count += int(np.count_nonzero(weekend))
+        # Продолжаем последовательную сумму с накопленного значения
+        self.total_amount = np.cumsum(np.concatenate(([self.total_amount], amounts)))[-1].item()
+        self.amount_parts = exact_sum_parts(self.amount_parts + amounts.tolist())
+        self.recent = np.concatenate((self.recent, scores[-self.RECENT_WINDOW:]))[-self.RECENT_WINDOW:]
+
+    def result(self):
+        """Текущий результат анализа в формате analyze_risk_patterns"""
+        if self.count == 0:
+            return score_risk([], [], [], rules=self.rules)
+        avg_risk = np.float64(self.score_sum) / self.count
+        return _build_result(
+            rules=self.rules,
+            n=self.count,
+            avg_risk=avg_risk,
+            recent_risk=self.recent.mean() if self.count >= self.RECENT_WINDOW else avg_risk,
+            pattern_counts=self.pattern_counts,
+            evening_count=self.evening_count,
+            weekend_count=self.weekend_count,
+            total_amount=self.total_amount,
+            average_amount=np.float64(math.fsum(self.amount_parts)) / self.count
+        )
+
+    STATE_FIELDS = ('count', 'score_sum', 'pattern_counts', 'evening_count', 'weekend_count',
+                    'total_amount', 'amount_parts')
+
+    def to_state(self):
+        """Состояние для сохранения (JSON-совместимый словарь; действительно для той же версии правил)"""
+        state = {field: getattr(self, field) for field in self.STATE_FIELDS}
+        state['recent'] = self.recent.tolist()
+        return state
+
+    @classmethod
+    def from_state(cls, state, rules=None):
+        """Восстановление из to_state() (rules — тот же набор правил, что и при сохранении)"""
+        accumulator = cls(rules)
+        for field in cls.STATE_FIELDS:
+            setattr(accumulator, field, state[field])
+        accumulator.recent = np.array(state['recent'], dtype=np.int64)
+        return accumulator
+
+
+def analyze_risk_patterns(transactions, baselines=None):
+    """
+    Анализ паттернов для определения уровня риска
+    Правила по времени и сумме (risk_scores) и аномальные суммы относительно баз категорий и часов
+    Принимает список транзакций (словарей) или колоночный DataFrame из parsing.parse_frame;
+    baselines — готовые базы сумм (например, всего сохраненного набора), иначе считаются по transactions
+    """
+    if transactions is None or len(transactions) == 0:
+        return score_risk([], [], [])
+    analysis = score_risk(*_as_arrays(transactions))
+    return with_anomalies(analysis, detect_anomalies(*anomaly_arrays(transactions), baselines=baselines))
@@ -0,0 +1,195 @@
+"""
+Правила оценки риска
+Правила задаются в risk_rules.json (путь можно переопределить переменной RISK_RULES_PATH)
+и один раз компилируются в таблицы (RuleSet):
+- правила по времени -> таблица оценок 2×7×24 (выходной или нет × день недели × час);
+- уровни суммы -> отсортированные границы, уровень суммы находится через searchsorted;
+- паттерны по правилам времени -> маски той же таблицы.
+Оценка транзакций — выборка из таблиц по массивам, без ветвлений на каждую транзакцию.
+
+Файл перечитывается при изменении (mtime проверяется не чаще раза в RELOAD_INTERVAL секунд)
+в каждом процессе, поэтому новые правила применяются без перезапуска воркеров. Версия набора
+правил (version из файла и отпечаток содержимого) входит в ключи кэша и состояние сохраненных наборов.
+Если измененный файл содержит ошибку, продолжают действовать предыдущие правила.
+
+Формат файла:
+- version — версия набора правил;
+- time_rules — {name, hours: [с, по] (включительно, через полночь — [22, 6]),
+  days: all, weekend, workdays или список дней (0 — понедельник), score}; оценки складываются;
+- amount_tiers — {above, score} по возрастанию above: сумма больше above получает score
+  (действует старший подходящий уровень);
+- patterns — {type, rule (имя правила времени) или amount_above, min_share, description,
+  recommendation}: паттерн попадает в анализ, если доля транзакций больше min_share,
+  рекомендация — если есть хотя бы одна такая транзакция; счетчик night_purchases
+  выводится также в statistics;
+- levels — {level, min_score, recommendation} по убыванию min_score, последний уровень — без min_score
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+RULES_PATH = os.getenv('RISK_RULES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'risk_rules.json'))
+
+# Как часто проверять, не изменился ли файл правил (секунды)
+RELOAD_INTERVAL = 1.0
+
+DAY_GROUPS = {
+    'all': np.ones((2, 7), dtype=bool),
+    'weekend': np.array([[False] * 7, [True] * 7]),
+    'workdays': np.array([[True] * 7, [False] * 7])
+}
+
+_state = {'rules': None, 'mtime': None, 'checked': 0.0, 'loaded': None, 'error': None}
+_lock = threading.Lock()
+
+
+def _hours_mask(rule):
+    """Часы правила [с, по] включительно; если с > по — интервал через полночь"""
+    start, end = rule['hours']
+    if not (0 <= start <= 23 and 0 <= end <= 23):
+        raise ValueError(f"{rule['name']}: часы должны быть от 0 до 23")
+    hours = np.arange(24)
+    return (hours >= start) & (hours <= end) if start <= end else (hours >= start) | (hours <= end)
+
+
+def _days_mask(rule):
+    """Дни правила: таблица 2×7 (выходной или нет × день недели)"""
+    days = rule.get('days', 'all')
+    if isinstance(days, str):
+        if days not in DAY_GROUPS:
+            raise ValueError(f"{rule['name']}: days — {', '.join(DAY_GROUPS)} или список дней")
+        return DAY_GROUPS[days]
+    if not all(isinstance(day, int) and 0 <= day <= 6 for day in days):
+        raise ValueError(f"{rule['name']}: дни недели — числа от 0 (понедельник) до 6")
+    return np.broadcast_to(np.isin(np.arange(7), days), (2, 7))
+
+
+def _integer(value, name):
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f'{name}: оценка должна быть целым числом')
+    return value
+
+
+class RuleSet:
+    """Скомпилированный набор правил (неизменяемый; новый файл — новый RuleSet)"""
+
+    def __init__(self, config):
+        self.config = config
+        canonical = json.dumps(config, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        self.version = f"{config['version']}-{hashlib.sha1(canonical).hexdigest()[:8]}"
+
+        # Таблица оценок и маски правил по (выходной, день недели, час)
+        self.table = np.zeros((2, 7, 24), dtype=np.int64)
+        masks = {}
+        for rule in config.get('time_rules', []):
+            mask = _days_mask(rule)[:, :, None] & _hours_mask(rule)[None, None, :]
+            self.table += _integer(rule['score'], rule['name']) * mask
+            masks[rule['name']] = mask.ravel()
+        self.table = self.table.ravel()
+
+        tiers = config.get('amount_tiers', [])
+        self.breakpoints = np.array([tier['above'] for tier in tiers], dtype=np.float64)
+        if np.any(np.diff(self.breakpoints) <= 0):
+            raise ValueError('amount_tiers: границы above должны возрастать')
+        self.tier_scores = np.array([0] + [_integer(tier['score'], f"above {tier['above']}") for tier in tiers],
+                                    dtype=np.int64)
+
+        self.patterns = []
+        for pattern in config.get('patterns', []):
+            if 'rule' in pattern and pattern['rule'] not in masks:
+                raise ValueError(f"{pattern['type']}: нет правила {pattern['rule']}")
+            if ('rule' in pattern) == ('amount_above' in pattern):
+                raise ValueError(f"{pattern['type']}: нужно либо rule, либо amount_above")
+            self.patterns.append(dict(pattern, mask=masks.get(pattern.get('rule'))))
+
+        self.levels = config['levels']
+        if not all('level' in level for level in self.levels):
+            raise ValueError('levels: у каждого уровня должно быть имя level')
+        if not self.levels or 'min_score' in self.levels[-1]:
+            raise ValueError('levels: последний уровень — без min_score')
+
+    def cells(self, hours, weekdays, weekend):
+        """Номер ячейки таблицы для каждой транзакции (час и день недели за пределами диапазона — к ближайшему)"""
+        # Номера ячеек < 336: int16 вчетверо компактнее intp и быстрее в арифметике
+        hours = np.clip(np.asarray(hours), 0, 23).astype(np.int16)
+        weekdays = np.clip(np.asarray(weekdays), 0, 6).astype(np.int16)
+        return (np.asarray(weekend, dtype=np.int16) * 7 + weekdays) * 24 + hours
+
+    def scores(self, cells, amounts):
+        """Оценки транзакций: выборка по ячейкам + уровень модуля суммы (пропуск суммы — уровень 0)"""
+        tiers = np.searchsorted(self.breakpoints, amounts, side='left')
+        tiers[np.isnan(amounts)] = 0
+        return self.table[cells] + self.tier_scores[tiers]
+
+    def pattern_counts(self, cells, amounts):
+        """Число транзакций каждого паттерна: {type: count}"""
+        per_cell = np.bincount(cells, minlength=self.table.size)
+        counts = {}
+        for pattern in self.patterns:
+            if pattern['mask'] is not None:
+                counts[pattern['type']] = int(per_cell[pattern['mask']].sum())
+            else:
+                counts[pattern['type']] = int(np.count_nonzero(amounts > pattern['amount_above']))
+        return counts
+
+    def level(self, score):
+        """Уровень риска и его рекомендация (или None) по средней оценке"""
+        for level in self.levels:
+            if 'min_score' not in level or score >= level['min_score']:
+                return level['level'], level.get('recommendation')
+
+    def describe(self):
+        """Набор правил для ответа API"""
+        return dict(self.config, version=self.version)
+
+
+def load_rules(path=RULES_PATH):
+    """Чтение и компиляция файла правил (ValueError/KeyError/OSError при ошибке)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return RuleSet(json.load(f))
+
+
+def current():
+    """
+    Действующий набор правил
+    Не чаще раза в RELOAD_INTERVAL проверяет mtime файла и при изменении перекомпилирует правила
+    """
+    now = time.monotonic()
+    if _state['rules'] is not None and now - _state['checked'] < RELOAD_INTERVAL:
+        return _state['rules']
+    with _lock:
+        if _state['rules'] is None or now - _state['checked'] >= RELOAD_INTERVAL:
+            _reload(now)
+    return _state['rules']
+
+
+def _reload(now):
+    _state['checked'] = now
+    mtime = None
+    try:
+        mtime = os.stat(RULES_PATH).st_mtime_ns
+        if _state['rules'] is not None and mtime == _state['mtime']:
+            return
+        rules = load_rules(RULES_PATH)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        if _state['rules'] is None:
+            raise
+        # Действуют прежние правила; файл будет прочитан снова после следующего изменения
+        if mtime != _state['mtime']:
+            print(f"❌ Ошибка в правилах риска ({RULES_PATH}): {e}")
+        _state.update(mtime=mtime, error=str(e))
+        return
+    if _state['rules'] is not None and rules.version != _state['rules'].version:
+        print(f"🔄 Правила риска обновлены: {_state['rules'].version} -> {rules.version}")
+    _state.update(rules=rules, mtime=mtime, loaded=time.time(), error=None)
+
+
+def status():
+    """Версия действующих правил, время загрузки и последняя ошибка перечитывания"""
+    rules = current()
+    return {'version': rules.version, 'path': RULES_PATH, 'loaded': _state['loaded'], 'error': _state['error']}
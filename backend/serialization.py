@@ -0,0 +1,114 @@
+"""
+Сериализация JSON
+Быстрый путь через orjson, если он установлен; без него — стандартный json.
+Транзакции сериализуются прямо из колоночного представления, без словарей на каждую строку:
+колонка кодируется целиком (категории и описания — по словарю уникальных значений),
+а объекты транзакций собираются по шаблону строки.
+pandas/numpy импортируются при первой сериализации транзакций: JSONProvider нужен приложению
+уже при старте (см. lazy)
+"""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # стандартный json
+    orjson = None
+
+# Сколько транзакций сериализуется за один фрагмент ответа
+ROWS_PER_CHUNK = 1000
+
+# Колонки со значениями из небольшого словаря (кодируются один раз на уникальное значение)
+TABLE_FIELDS = ('category', 'description', 'source')
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    # Даты отдаются в default, чтобы формат совпадал со стандартным провайдером Flask
+    FLASK_OPTIONS = ORJSON_OPTIONS | orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps(value, sort_keys=False):
+    """Компактный JSON (без пробелов, не-ASCII символы как есть)"""
+    if orjson is not None:
+        try:
+            options = ORJSON_OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else ORJSON_OPTIONS
+            return orjson.dumps(value, option=options).decode('utf-8')
+        except TypeError:
+            pass  # например, целые больше 64 бит — стандартный json справляется
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), sort_keys=sort_keys)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    JSON-провайдер приложения: orjson, если установлен (ключи сортируются, как у стандартного)
+    Ответы с отступами (режим отладки) и значения, которые orjson не поддерживает, идут через json
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs.get('indent'):
+            try:
+                return orjson.dumps(obj, default=self.default, option=FLASK_OPTIONS).decode('utf-8')
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+
+def _fragments(values, dumps):
+    """JSON каждого значения списка одним вызовом dumps на весь список"""
+    if not values:
+        return []
+    parts = dumps(values)[1:-1].split(',')
+    if len(parts) != len(values):
+        # Запятые внутри строк — кодируем поштучно
+        parts = [dumps(value) for value in values]
+    return parts
+
+
+def _table(column, dumps):
+    """Коды значений колонки и JSON уникальных значений (последний элемент — null для пропусков)"""
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(column)
+    table = np.array([dumps(value) for value in uniques.tolist()] + ['null'], dtype=object)
+    return codes, table
+
+
+def encode_records(frame, dumps, sort_keys=True, size=ROWS_PER_CHUNK):
+    """
+    JSON-объекты транзакций (формат API, как у frame_to_records) порциями по size строк
+    dumps определяет формат значений; порядок полей — как у RECORD_FIELDS или по алфавиту (sort_keys)
+    Возвращает генератор списков строк
+    """
+    import numpy as np
+
+    from parsing import DAY_NAMES, RECORD_FIELDS, iso_dates
+
+    fields = RECORD_FIELDS + ['source'] if 'source' in frame else list(RECORD_FIELDS)
+    if sort_keys:
+        fields.sort()
+    template = '{{' + ','.join(dumps(field) + ':{}' for field in fields) + '}}'
+
+    tables = {field: _table(frame[field], dumps) for field in TABLE_FIELDS if field in fields}
+    day_names = np.array([dumps(name) for name in DAY_NAMES], dtype=object)
+    weekdays = frame['day_of_week'].to_numpy(dtype=np.int64)
+
+    for start in range(0, len(frame), size):
+        stop = start + size
+        chunk = frame.iloc[start:stop]
+        columns = []
+        for field in fields:
+            if field in tables:
+                codes, table = tables[field]
+                columns.append(table[codes[start:stop]].tolist())
+            elif field == 'date':
+                columns.append(_fragments(iso_dates(chunk).tolist(), dumps))
+            elif field == 'day_name':
+                columns.append(day_names[weekdays[start:stop]].tolist())
+            elif field == 'is_weekend':
+                columns.append(np.where(weekdays[start:stop] >= 5, 'true', 'false').tolist())
+            else:
+                columns.append(_fragments(chunk[field].tolist(), dumps))
+        yield list(map(template.format, *columns))
@@ -0,0 +1,213 @@
+"""
+Статистика по транзакциям
+Агрегация count/sum/mean по всем измерениям за один проход (bincount по кодам групп)
+"""
+
+import numpy as np
+import pandas as pd
+
+from parsing import DAY_NAMES
+
+# Измерения legacy-ответа /api/statistics
+CORE_DIMENSIONS = ('hour', 'day', 'category')
+# Дополнительные измерения (по запросу)
+OPTIONAL_DIMENSIONS = ('month', 'heatmap', 'source')
+
+# Предел размера совместной таблицы категория × день × час для одного bincount
+MAX_JOINT_BINS = 2000000
+
+# Ключи legacy-ответа (как у groupby().agg().to_dict(), но кортеж в виде строки)
+LEGACY_KEYS = {
+    'count': str(('amount', 'count')),
+    'sum': str(('amount', 'sum')),
+    'mean': str(('amount', 'mean'))
+}
+
+
+def _columns(transactions, dimensions):
+    """Извлечение нужных колонок из списка словарей или колоночного DataFrame"""
+    if isinstance(transactions, pd.DataFrame):
+        columns = {
+            'hour': transactions['hour'].to_numpy(dtype=np.int64),
+            'day_of_week': transactions['day_of_week'].to_numpy(dtype=np.int64),
+            'amount': transactions['amount'].to_numpy(dtype=np.float64),
+            # Categorical (компактное представление) передается как есть: factorize берет готовые коды
+            'category': (transactions['category'].array if transactions['category'].dtype == 'category'
+                         else transactions['category'].to_numpy(dtype=object))
+        }
+        if 'month' in dimensions:
+            if 'timestamp' in transactions:
+                # Компактное представление: месяц из timestamp, без ISO-строк
+                columns['month'] = np.datetime_as_string(
+                    transactions['timestamp'].to_numpy(dtype='datetime64[ns]'), unit='M').astype(object)
+            else:
+                columns['date'] = transactions['date'].to_numpy(dtype=object)
+        if 'source' in dimensions:
+            columns['source'] = (transactions['source'].to_numpy(dtype=object)
+                                 if 'source' in transactions else np.full(len(transactions), None))
+        return columns
+
+    n = len(transactions)
+    columns = {
+        'hour': np.fromiter((t['hour'] for t in transactions), dtype=np.int64, count=n),
+        'day_of_week': np.fromiter((t['day_of_week'] for t in transactions), dtype=np.int64, count=n),
+        'amount': np.fromiter((t['amount'] for t in transactions), dtype=np.float64, count=n),
+        'category': np.array([t['category'] for t in transactions], dtype=object)
+    }
+    if 'month' in dimensions:
+        columns['date'] = np.array([t['date'] for t in transactions], dtype=object)
+    if 'source' in dimensions:
+        columns['source'] = np.array([t.get('source') for t in transactions], dtype=object)
+    return columns
+
+
+def _group(codes, size, valid, weights_sum):
+    """count (строк с суммой), sum и size (все строки) по кодам групп"""
+    return {
+        'size': np.bincount(codes, minlength=size),
+        'count': np.bincount(codes, weights=valid, minlength=size),
+        'sum': np.bincount(codes, weights=weights_sum, minlength=size)
+    }
+
+
+def _reduce(table, axes):
+    return {name: values.sum(axis=axes) for name, values in table.items()}
+
+
+def aggregate(transactions, dimensions=CORE_DIMENSIONS):
+    """
+    Агрегаты count/sum/mean по измерениям
+    Возвращает {измерение: {'keys': [...], 'size', 'count', 'sum'}}; для heatmap — матрицы 7×24
+    """
+    dimensions = tuple(dimensions)
+    unknown = set(dimensions) - set(CORE_DIMENSIONS) - set(OPTIONAL_DIMENSIONS)
+    if unknown:
+        raise ValueError(f'Неизвестные измерения: {", ".join(sorted(unknown))}')
+
+    columns = _columns(transactions, dimensions)
+    hours = columns['hour']
+    weekdays = columns['day_of_week']
+    if len(hours) and (hours.min() < 0 or hours.max() > 23 or weekdays.min() < 0 or weekdays.max() > 6):
+        raise ValueError('Некорректные значения hour или day_of_week')
+
+    amount = columns['amount']
+    # count и sum считаются по непустым суммам, как в pandas
+    valid = (~np.isnan(amount)).astype(np.float64)
+    weights_sum = np.where(np.isnan(amount), 0.0, amount)
+
+    result = {}
+    slot = weekdays * 24 + hours
+
+    # Основной проход: совместная таблица категория × день × час
+    category_codes, categories = pd.factorize(columns['category'], sort=True)
+    joint_size = max(len(categories), 1) * 168
+    if 'category' in dimensions and joint_size <= MAX_JOINT_BINS and not (category_codes < 0).any():
+        cube = _group(category_codes * 168 + slot, joint_size, valid, weights_sum)
+        cube = {name: values.reshape(-1, 7, 24) for name, values in cube.items()}
+        result['category'] = dict(_reduce(cube, (1, 2)), keys=list(categories))
+        week = _reduce(cube, 0)
+    else:
+        week = _group(slot, 168, valid, weights_sum)
+        week = {name: values.reshape(7, 24) for name, values in week.items()}
+        if 'category' in dimensions:
+            present = category_codes >= 0
+            table = _group(category_codes[present], len(categories), valid[present], weights_sum[present])
+            result['category'] = dict(table, keys=list(categories))
+
+    if 'hour' in dimensions:
+        result['hour'] = dict(_reduce(week, 0), keys=list(range(24)))
+    if 'day' in dimensions:
+        result['day'] = dict(_reduce(week, 1), keys=list(DAY_NAMES))
+    if 'heatmap' in dimensions:
+        result['heatmap'] = week
+
+    if 'month' in dimensions:
+        months = columns.get('month')
+        if months is None:
+            months = pd.Series(columns['date'], dtype=object).str.slice(0, 7).to_numpy(dtype=object)
+        codes, keys = pd.factorize(months, sort=True)
+        present = codes >= 0
+        table = _group(codes[present], len(keys), valid[present], weights_sum[present])
+        result['month'] = dict(table, keys=list(keys))
+
+    if 'source' in dimensions:
+        codes, keys = pd.factorize(columns['source'], sort=True)
+        present = codes >= 0
+        table = _group(codes[present], len(keys), valid[present], weights_sum[present])
+        result['source'] = dict(table, keys=list(keys))
+
+    return result
+
+
+def _mean(table):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return table['sum'] / table['count']
+
+
+def to_legacy(table):
+    """Формат groupby().agg({'amount': ['count', 'sum', 'mean']}).to_dict()"""
+    present = np.flatnonzero(table['size'])
+    keys = [table['keys'][i] for i in present]
+    keys = [k.item() if isinstance(k, np.generic) else k for k in keys]
+    mean = _mean(table)
+    return {
+        LEGACY_KEYS['count']: dict(zip(keys, table['count'][present].astype(np.int64).tolist())),
+        LEGACY_KEYS['sum']: dict(zip(keys, table['sum'][present].tolist())),
+        LEGACY_KEYS['mean']: dict(zip(keys, mean[present].tolist()))
+    }
+
+
+def to_compact(table):
+    """Компактный формат для фронтенда: параллельные массивы только по непустым группам"""
+    present = np.flatnonzero(table['size'])
+    keys = [table['keys'][i] for i in present]
+    return {
+        'keys': [k.item() if isinstance(k, np.generic) else k for k in keys],
+        'count': table['count'][present].astype(np.int64).tolist(),
+        'sum': np.round(table['sum'][present], 2).tolist(),
+        'mean': np.round(_mean(table)[present], 2).tolist()
+    }
+
+
+def heatmap_to_compact(week):
+    """Матрица день недели × час (7×24), пустые ячейки имеют mean = 0"""
+    mean = np.where(week['count'] > 0, _mean(week), 0.0)
+    return {
+        'rows': list(DAY_NAMES),
+        'columns': list(range(24)),
+        'count': week['count'].astype(np.int64).tolist(),
+        'sum': np.round(week['sum'], 2).tolist(),
+        'mean': np.round(mean, 2).tolist()
+    }
+
+
+# Имена измерений в ответе
+RESPONSE_KEYS = {
+    'hour': 'hourly',
+    'day': 'daily',
+    'category': 'categories',
+    'month': 'monthly',
+    'heatmap': 'heatmap',
+    'source': 'sources'
+}
+
+
+def build_statistics(transactions, dimensions=CORE_DIMENSIONS, output='legacy'):
+    """
+    Ответ /api/statistics
+    output='legacy' — прежняя форма (hourly/daily/categories), 'compact' — параллельные массивы
+    """
+    if output not in ('legacy', 'compact'):
+        raise ValueError(f'Неизвестный формат: {output}')
+
+    tables = aggregate(transactions, dimensions)
+    response = {}
+    for dimension in dimensions:
+        table = tables[dimension]
+        if dimension == 'heatmap':
+            response[RESPONSE_KEYS[dimension]] = heatmap_to_compact(table)
+        elif output == 'compact':
+            response[RESPONSE_KEYS[dimension]] = to_compact(table)
+        else:
+            response[RESPONSE_KEYS[dimension]] = to_legacy(table)
+    return response
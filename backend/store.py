@@ -0,0 +1,571 @@
+"""
+Хранилище транзакций
+Загруженные выписки сохраняются в SQLite как наборы (dataset) с индексами по дате,
+категории, часу и источнику; анализ и статистика считаются запросами к сохраненным данным
+"""
+
+import base64
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from anomalies import compute_baselines, detect_anomalies, with_anomalies
+from parsing import DAY_NAMES, RECORD_FIELDS, iso_dates
+from risk import RiskAccumulator, RULES_VERSION
+
+# Колонки таблицы transactions (day_name и is_weekend вычисляются из day_of_week)
+STORED_FIELDS = ['id', 'date', 'amount', 'category', 'description', 'hour', 'day_of_week', 'source']
+
+# Колонки для накопительного анализа риска
+RISK_FIELDS = ['hour', 'day_of_week', 'amount']
+
+# Колонки, по которым можно фильтровать (параметры запроса -> условие SQL)
+FILTERS = {
+    'date_from': 'date >= ?',
+    'date_to': 'date <= ?',
+    'amount_min': 'amount >= ?',
+    'amount_max': 'amount <= ?'
+}
+LIST_FILTERS = ('category', 'source', 'hour')
+FILTER_NAMES = tuple(FILTERS) + LIST_FILTERS
+
+# Сортировки постраничной выдачи (ключ -> выражение SQL); сумма — по модулю, как в списке транзакций
+SORT_KEYS = {
+    'position': 'position',
+    'date': 'date',
+    'amount': 'IFNULL(ABS(amount), 0)',
+    'category': 'category'
+}
+
+# Строк в одной порции при потоковом чтении набора
+READ_BATCH = 5000
+
+# Время последнего обращения к набору обновляется не чаще раза в столько секунд
+TOUCH_INTERVAL = 60
+
+
+def _where(key, filters=None):
+    """Условие WHERE по набору и фильтрам: (sql, params)"""
+    clauses = ['dataset = ?']
+    params = [key]
+    for name, value in (filters or {}).items():
+        if value is None or value == '' or value == []:
+            continue
+        if name in FILTERS:
+            if name == 'date_to':
+                # Даты хранятся как ISO-строки: '2025-03-31' должна включать весь день
+                value = str(value) + '\uffff'
+            elif name.startswith('amount'):
+                value = float(value)
+            clauses.append(FILTERS[name])
+            params.append(value)
+        elif name in LIST_FILTERS:
+            values = value if isinstance(value, (list, tuple)) else str(value).split(',')
+            if name == 'hour':
+                values = [int(v) for v in values]
+            clauses.append(f'{name} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+        else:
+            raise ValueError(f'Неизвестный фильтр: {name}')
+    return ' AND '.join(clauses), params
+
+
+def encode_cursor(sort, order, value, position):
+    """Курсор постраничной выдачи: сортировка и ключ последней отданной строки"""
+    token = json.dumps([sort, order, value, position], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(token).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(sort, order, value, position) из курсора; ValueError, если курсор поврежден"""
+    try:
+        token = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort, order, value, position = json.loads(token)
+    except (ValueError, TypeError):
+        raise ValueError('Некорректный курсор')
+    return sort, order, value, position
+
+
+def _selection(fields):
+    """Колонки SELECT для запрошенных полей: day_name и is_weekend вычисляются из day_of_week"""
+    derived = [field for field in fields if field in ('day_name', 'is_weekend')]
+    selected = [field for field in fields if field not in derived]
+    if derived and 'day_of_week' not in selected:
+        selected.append('day_of_week')
+    return selected, derived
+
+
+def _to_frame(rows, fields, selected, derived):
+    """DataFrame из строк SQLite с типами колоночного представления (как у parse_frame)"""
+    frame = pd.DataFrame.from_records(rows, columns=selected, coerce_float=True)
+    for field in ('id', 'hour', 'day_of_week'):
+        if field in frame:
+            frame[field] = frame[field].astype(np.int64)
+    if 'amount' in frame:
+        frame['amount'] = frame['amount'].astype(np.float64)
+    if 'day_of_week' in frame:
+        weekdays = frame['day_of_week'].to_numpy()
+        if 'day_name' in derived:
+            frame['day_name'] = DAY_NAMES[weekdays]
+        if 'is_weekend' in derived:
+            frame['is_weekend'] = weekdays >= 5
+    return frame[list(fields)]
+
+
+class TransactionStore:
+    """
+    Наборы транзакций в SQLite (общие для всех воркеров и фоновых задач)
+    Снаружи набор адресуется строковым id, внутри — целым ключом (короче ключи индексов).
+    Набор — серверная сессия пользователя: при max_rows суммарное число строк ограничено,
+    и сверх лимита удаляются наборы, к которым дольше всего не обращались (LRU)
+    """
+
+    def __init__(self, db_path, max_rows=None):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS datasets ('
+                'key INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, name TEXT, file_type TEXT, digest TEXT, '
+                "rows INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL DEFAULT 'ready', "
+                'created REAL NOT NULL, updated REAL NOT NULL, accessed REAL, uploaded_rows INTEGER)'
+            )
+            # Базы, созданные до появления времени обращения и числа строк исходной загрузки
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(datasets)')]
+            for column, sql_type in (('accessed', 'REAL'), ('uploaded_rows', 'INTEGER')):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE datasets ADD COLUMN {column} {sql_type}')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS transactions ('
+                'dataset INTEGER NOT NULL, position INTEGER NOT NULL, id INTEGER, date TEXT, amount REAL, '
+                'category TEXT, description TEXT, hour INTEGER, day_of_week INTEGER, source TEXT, '
+                'PRIMARY KEY (dataset, position)) WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS transactions_date ON transactions (dataset, date)')
+            conn.execute('CREATE INDEX IF NOT EXISTS transactions_category ON transactions (dataset, category)')
+            conn.execute('CREATE INDEX IF NOT EXISTS transactions_hour ON transactions (dataset, hour)')
+            conn.execute('CREATE INDEX IF NOT EXISTS transactions_source ON transactions (dataset, source)')
+            # Состояние накопительного анализа риска (RiskAccumulator.to_state) для дозагрузки за O(новых строк)
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS analysis ('
+                'dataset INTEGER PRIMARY KEY, rules_version TEXT NOT NULL, state TEXT NOT NULL)'
+            )
+            # Базы сумм по категориям и часам и аномалии всего набора (anomalies) по rows строкам;
+            # baseline_rows осталась от баз, которые не пересчитывались при дозагрузке (равна rows)
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS baselines ('
+                'dataset INTEGER PRIMARY KEY, rules_version TEXT NOT NULL, baseline_rows INTEGER NOT NULL, '
+                'rows INTEGER NOT NULL, baselines TEXT NOT NULL, anomalies TEXT NOT NULL)'
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _key(self, conn, dataset_id):
+        row = conn.execute('SELECT key FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+        if row is None:
+            raise KeyError(dataset_id)
+        return row['key']
+
+    def create(self, name, file_type, digest=None, status='loading'):
+        """Новый пустой набор; возвращает его id"""
+        dataset_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO datasets (id, name, file_type, digest, status, created, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (dataset_id, name, file_type, digest, status, now, now)
+            )
+        return dataset_id
+
+    def _accumulator(self, conn, key):
+        """
+        Накопительный анализ набора из сохраненного состояния
+        Без состояния или при смене версии правил пересчитывается по всем транзакциям набора и сохраняется
+        """
+        accumulator = RiskAccumulator()
+        row = conn.execute('SELECT rules_version, state FROM analysis WHERE dataset = ?', (key,)).fetchone()
+        if row is not None and row['rules_version'] == accumulator.version:
+            return RiskAccumulator.from_state(json.loads(row['state']), accumulator.rules)
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(
+            'SELECT hour, day_of_week, amount FROM transactions WHERE dataset = ? ORDER BY position', (key,)
+        ).fetchall()
+        if rows:
+            frame = pd.DataFrame.from_records(rows, columns=RISK_FIELDS, coerce_float=True)
+            frame['amount'] = frame['amount'].astype(np.float64)
+            accumulator.update(frame)
+        self._save_accumulator(conn, key, accumulator)
+        return accumulator
+
+    def _save_accumulator(self, conn, key, accumulator):
+        conn.execute(
+            'INSERT OR REPLACE INTO analysis (dataset, rules_version, state) VALUES (?, ?, ?)',
+            (key, accumulator.version, json.dumps(accumulator.to_state(), separators=(',', ':')))
+        )
+
+    def _profile(self, conn, key):
+        """
+        Базы сумм набора и аномалии всего набора (с кэшем в таблице baselines)
+        Кэш действует, пока не изменилось число строк и версия алгоритма (RULES_VERSION; от набора
+        правил риска базы не зависят). После дозагрузки медианы и MAD групп меняются, поэтому базы
+        и аномалии пересчитываются по всему набору — как при анализе всех транзакций заново
+        """
+        rows = conn.execute('SELECT rows FROM datasets WHERE key = ?', (key,)).fetchone()['rows']
+        cached = conn.execute('SELECT * FROM baselines WHERE dataset = ?', (key,)).fetchone()
+        if cached is not None and cached['rules_version'] == RULES_VERSION and cached['rows'] == rows:
+            return json.loads(cached['baselines']), json.loads(cached['anomalies'])
+
+        arrays = self._anomaly_arrays(conn, key, rows)
+        baselines = compute_baselines(*arrays[1:])
+        anomalies = detect_anomalies(*arrays, baselines=baselines)
+        self._save_profile(conn, key, rows, baselines, anomalies)
+        return baselines, anomalies
+
+    def _anomaly_arrays(self, conn, key, rows):
+        """
+        Массивы для поиска аномалий (как anomalies.anomaly_arrays) по первым rows строкам набора
+        Строки читаются порциями по READ_BATCH в заранее выделенные массивы, категории — сразу
+        в коды: ~20 байт на строку вместо объектов Python в DataFrame
+        """
+        ids = np.empty(rows, dtype=np.int64)
+        hours = np.empty(rows, dtype=np.int64)
+        amounts = np.empty(rows, dtype=np.float64)
+        codes = np.empty(rows, dtype=np.int32)
+        keys = {}
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(
+            'SELECT id, category, hour, amount FROM transactions WHERE dataset = ? AND position < ? '
+            'ORDER BY position', (key, rows)
+        )
+        n = 0
+        while True:
+            batch = cursor.fetchmany(READ_BATCH)
+            if not batch:
+                break
+            batch_ids, categories, batch_hours, batch_amounts = zip(*batch)
+            end = n + len(batch)
+            ids[n:end] = batch_ids
+            hours[n:end] = batch_hours
+            # NULL в суммах -> NaN
+            amounts[n:end] = np.array(batch_amounts, dtype=np.float64)
+            codes[n:end] = [-1 if category is None else keys.setdefault(category, len(keys))
+                            for category in categories]
+            n = end
+
+        # Коды в порядке отсортированных категорий (как pd.factorize(sort=True));
+        # код -1 (без категории) попадает в последний элемент remap и остается -1
+        order = sorted(keys)
+        remap = np.full(len(order) + 1, -1, dtype=np.int32)
+        remap[[keys[category] for category in order]] = np.arange(len(order), dtype=np.int32)
+        categories = pd.Categorical.from_codes(remap[codes[:n]], categories=order)
+        return ids[:n], categories, hours[:n], amounts[:n]
+
+    def _save_profile(self, conn, key, rows, baselines, anomalies):
+        conn.execute(
+            'INSERT OR REPLACE INTO baselines (dataset, rules_version, baseline_rows, rows, baselines, anomalies) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, RULES_VERSION, rows, rows, json.dumps(baselines, ensure_ascii=False, separators=(',', ':')),
+             json.dumps(anomalies, ensure_ascii=False, separators=(',', ':')))
+        )
+
+    def append(self, dataset_id, frame, renumber=False):
+        """
+        Пакетная вставка транзакций из колоночного DataFrame (в конец набора)
+        В той же транзакции обновляется состояние анализа риска (только по новым строкам).
+        Транзакция берет блокировку записи до чтения числа строк и состояния, поэтому параллельные
+        дозагрузки одного набора выполняются по очереди. renumber — продолжить id транзакций
+        после последней строки набора (id в frame сдвигаются на месте)
+        """
+        if frame.empty:
+            return 0
+        n = len(frame)
+        dates = iso_dates(frame).tolist()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            key, offset = conn.execute('SELECT key, rows FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+            if renumber:
+                frame['id'] += self._next_id(conn, key)
+            columns = [frame[field].tolist() if field in frame else [None] * n for field in STORED_FIELDS]
+            # ISO-даты компактного представления выводятся из timestamp
+            columns[1] = dates
+            # NaN в суммах хранится как NULL
+            columns[2] = [None if amount != amount else amount for amount in columns[2]]
+            accumulator = self._accumulator(conn, key)
+            conn.executemany(
+                'INSERT INTO transactions (dataset, position, id, date, amount, category, description, '
+                'hour, day_of_week, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                ((key, offset + i) + row for i, row in enumerate(zip(*columns)))
+            )
+            now = time.time()
+            conn.execute('UPDATE datasets SET rows = rows + ?, updated = ?, accessed = ? WHERE key = ?',
+                         (n, now, now, key))
+            accumulator.update(frame[RISK_FIELDS])
+            self._save_accumulator(conn, key, accumulator)
+        self.evict(keep=dataset_id)
+        return n
+
+    def analysis(self, dataset_id, anomalies=True):
+        """
+        Анализ риска всего набора из накопленного состояния и сохраненных аномалий
+        Транзакции читаются, только если набор изменился с прошлого анализа (см. _profile);
+        anomalies=False — только накопленный анализ риска, без чтения транзакций (ответы загрузок
+        и дозагрузок; аномалии набора — в GET /api/datasets/<id>/analysis)
+        """
+        with self._connect() as conn:
+            key = self._key(conn, dataset_id)
+            accumulator = self._accumulator(conn, key)
+            if accumulator.count == 0 or not anomalies:
+                return accumulator.result()
+            _, anomalies = self._profile(conn, key)
+        return with_anomalies(accumulator.result(), anomalies)
+
+    def baselines(self, dataset_id):
+        """Базы сумм всего набора (для анализа выборки по фильтрам относительно всего набора)"""
+        with self._connect() as conn:
+            baselines, _ = self._profile(conn, self._key(conn, dataset_id))
+        return baselines
+
+    def _next_id(self, conn, key):
+        """id для следующей дозагруженной транзакции (после id последней строки набора)"""
+        row = conn.execute(
+            'SELECT id FROM transactions WHERE dataset = ? ORDER BY position DESC LIMIT 1', (key,)
+        ).fetchone()
+        return 0 if row is None or row['id'] is None else row['id'] + 1
+
+    def finish(self, dataset_id):
+        """Набор загружен: строки исходной загрузки (uploaded_rows) — до последующих дозагрузок"""
+        with self._connect() as conn:
+            now = time.time()
+            conn.execute("UPDATE datasets SET status = 'ready', updated = ?, accessed = ?, uploaded_rows = rows "
+                         'WHERE id = ?', (now, now, dataset_id))
+        self.evict(keep=dataset_id)
+
+    def copy_upload(self, digest, file_type, name):
+        """
+        Новый набор с транзакциями исходной загрузки того же файла (по хешу и типу) или None
+        Повторная загрузка из кэша результатов получает свой набор: строки копируются внутри SQLite
+        без повторного парсинга, дозагрузки в исходный набор (чужие данные) не копируются
+        """
+        if not digest:
+            return None
+        dataset_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            source = conn.execute(
+                "SELECT key, rows, uploaded_rows FROM datasets WHERE digest = ? AND file_type = ? AND status = 'ready' "
+                'AND uploaded_rows > 0 ORDER BY updated DESC LIMIT 1', (digest, file_type)
+            ).fetchone()
+            if source is None:
+                return None
+            now = time.time()
+            key = conn.execute(
+                "INSERT INTO datasets (id, name, file_type, digest, rows, status, created, updated, accessed, "
+                "uploaded_rows) VALUES (?, ?, ?, ?, ?, 'ready', ?, ?, ?, ?)",
+                (dataset_id, name, file_type, digest, source['uploaded_rows'], now, now, now, source['uploaded_rows'])
+            ).lastrowid
+            conn.execute(
+                'INSERT INTO transactions (dataset, position, id, date, amount, category, description, hour, '
+                'day_of_week, source) SELECT ?, position, id, date, amount, category, description, hour, '
+                'day_of_week, source FROM transactions WHERE dataset = ? AND position < ?',
+                (key, source['key'], source['uploaded_rows'])
+            )
+            if source['rows'] == source['uploaded_rows']:
+                # Состояние анализа относится ровно к этим строкам; иначе пересчитается при первом анализе
+                conn.execute('INSERT INTO analysis SELECT ?, rules_version, state FROM analysis WHERE dataset = ?',
+                             (key, source['key']))
+                conn.execute('INSERT INTO baselines SELECT ?, rules_version, baseline_rows, rows, baselines, '
+                             'anomalies FROM baselines WHERE dataset = ?', (key, source['key']))
+        self.evict(keep=dataset_id)
+        return dataset_id
+
+    def save(self, frame, name, file_type, digest=None):
+        """Сохранение разобранной выписки целиком; возвращает id набора"""
+        dataset_id = self.create(name, file_type, digest)
+        try:
+            self.append(dataset_id, frame)
+        except Exception:
+            self.delete(dataset_id)
+            raise
+        self.finish(dataset_id)
+        return dataset_id
+
+    def get(self, dataset_id):
+        """
+        Описание набора (в том числе еще загружаемого, status=loading) или None
+        Отмечает обращение к набору (для LRU и срока хранения), но не меняет updated
+        """
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row['accessed'] is None or now - row['accessed'] > TOUCH_INTERVAL:
+                conn.execute('UPDATE datasets SET accessed = ? WHERE key = ?', (now, row['key']))
+        dataset = dict(row)
+        del dataset['key'], dataset['accessed'], dataset['uploaded_rows']
+        return dataset
+
+    def list_datasets(self, limit=100):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM datasets WHERE status = 'ready' ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()
+        datasets = [dict(row) for row in rows]
+        for dataset in datasets:
+            del dataset['key'], dataset['accessed'], dataset['uploaded_rows']
+        return datasets
+
+    def delete(self, dataset_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT key FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute('DELETE FROM transactions WHERE dataset = ?', (row['key'],))
+            conn.execute('DELETE FROM analysis WHERE dataset = ?', (row['key'],))
+            conn.execute('DELETE FROM baselines WHERE dataset = ?', (row['key'],))
+            conn.execute('DELETE FROM datasets WHERE key = ?', (row['key'],))
+            return True
+
+    def cleanup(self, max_age):
+        """Удаление наборов, к которым не обращались max_age секунд (и брошенных незавершенных загрузок)"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT id FROM datasets WHERE MAX(updated, IFNULL(accessed, 0)) < ?', (time.time() - max_age,)
+            ).fetchall()
+        for row in rows:
+            self.delete(row['id'])
+        return len(rows)
+
+    def evict(self, keep=None):
+        """
+        Удаление наборов, к которым дольше всего не обращались, пока строк больше max_rows
+        Набор keep (только что загруженный) и еще загружаемые наборы не удаляются; возвращает число удаленных
+        """
+        if not self.max_rows:
+            return 0
+        with self._connect() as conn:
+            total = conn.execute('SELECT IFNULL(SUM(rows), 0) FROM datasets').fetchone()[0]
+            if total <= self.max_rows:
+                return 0
+            candidates = conn.execute(
+                "SELECT id, rows FROM datasets WHERE status = 'ready' AND id != ? "
+                'ORDER BY MAX(updated, IFNULL(accessed, 0))', (keep or '',)
+            ).fetchall()
+        evicted = 0
+        for row in candidates:
+            if total <= self.max_rows:
+                break
+            if self.delete(row['id']):
+                total -= row['rows']
+                evicted += 1
+        if evicted:
+            print(f"🧹 Удалено наборов сверх лимита {self.max_rows} строк: {evicted}")
+        return evicted
+
+    def query(self, dataset_id, fields=STORED_FIELDS, filters=None):
+        """
+        Колонки набора (в порядке загрузки) с фильтрами
+        Возвращает DataFrame; day_name и is_weekend добавляются, если запрошены
+        """
+        selected, derived = _selection(fields)
+        with self._connect() as conn:
+            where, params = _where(self._key(conn, dataset_id), filters)
+            conn.row_factory = None
+            rows = conn.execute(
+                f'SELECT {", ".join(selected)} FROM transactions WHERE {where} ORDER BY position', params
+            ).fetchall()
+        return _to_frame(rows, fields, selected, derived)
+
+    def iter_frames(self, dataset_id, fields=None, filters=None, batch=READ_BATCH):
+        """
+        Потоковое чтение набора порциями по batch строк (в порядке загрузки)
+        Память не зависит от размера набора; соединение открыто, пока идет итерация
+        """
+        fields = fields or self.fields(dataset_id)
+        selected, derived = _selection(fields)
+        with self._connect() as conn:
+            where, params = _where(self._key(conn, dataset_id), filters)
+            conn.row_factory = None
+            cursor = conn.execute(
+                f'SELECT {", ".join(selected)} FROM transactions WHERE {where} ORDER BY position', params
+            )
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    return
+                yield _to_frame(rows, fields, selected, derived)
+
+    def page(self, dataset_id, fields=None, sort='position', order='asc', limit=100, cursor=None, filters=None):
+        """
+        Страница транзакций с сортировкой на стороне сервера (keyset-пагинация)
+        Возвращает (DataFrame, курсор следующей страницы или None); ValueError при неверных параметрах
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f'Неизвестная сортировка: {sort}')
+        if order not in ('asc', 'desc'):
+            raise ValueError(f'Неизвестный порядок: {order}')
+        fields = fields or self.fields(dataset_id)
+        selected, derived = _selection(fields)
+        key = SORT_KEYS[sort]
+        direction = 'ASC' if order == 'asc' else 'DESC'
+
+        with self._connect() as conn:
+            where, params = _where(self._key(conn, dataset_id), filters)
+            if cursor:
+                cursor_sort, cursor_order, value, position = decode_cursor(cursor)
+                if (cursor_sort, cursor_order) != (sort, order):
+                    raise ValueError('Курсор относится к другой сортировке')
+                # Позиция в наборе — уникальный второй ключ, поэтому строки не повторяются и не теряются
+                where += f' AND ({key}, position) {">" if order == "asc" else "<"} (?, ?)'
+                params += [value, position]
+            conn.row_factory = None
+            rows = conn.execute(
+                f'SELECT {key}, position, {", ".join(selected)} FROM transactions WHERE {where} '
+                f'ORDER BY {key} {direction}, position {direction} LIMIT ?', params + [limit + 1]
+            ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(sort, order, rows[-1][0], rows[-1][1])
+        return _to_frame([row[2:] for row in rows], fields, selected, derived), next_cursor
+
+    def count(self, dataset_id, filters=None):
+        """Количество транзакций набора с фильтрами"""
+        with self._connect() as conn:
+            where, params = _where(self._key(conn, dataset_id), filters)
+            return conn.execute(f'SELECT COUNT(*) FROM transactions WHERE {where}', params).fetchone()[0]
+
+    def has_sources(self, dataset_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT 1 FROM transactions WHERE dataset = ? AND source IS NOT NULL LIMIT 1',
+                (self._key(conn, dataset_id),)
+            ).fetchone()
+        return row is not None
+
+    def fields(self, dataset_id):
+        """Поля транзакций набора в формате API (source — только у пакетных загрузок)"""
+        return RECORD_FIELDS + ['source'] if self.has_sources(dataset_id) else RECORD_FIELDS
+
+    def load_frame(self, dataset_id, filters=None):
+        """Набор в колоночном представлении (поля API, даты — ISO-строками, без timestamp)"""
+        return self.query(dataset_id, self.fields(dataset_id), filters)
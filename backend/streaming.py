@@ -0,0 +1,62 @@
+"""
+Потоковые ответы NDJSON
+Первая строка — сводка (все поля ответа, кроме transactions: analysis, count, dataset_id...),
+далее по одной транзакции в строке. Клиент может показать анализ до получения всех строк,
+а сервер не собирает весь ответ в памяти
+
+Здесь же сборка обычного JSON-ответа из колоночного представления порциями (json_body)
+"""
+
+from serialization import dumps, encode_records
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Метка места списка транзакций в сериализованной сводке
+TRANSACTIONS_MARK = '\x00transactions\x00'
+
+
+def _line(value):
+    return dumps(value) + '\n'
+
+
+def summary_line(payload):
+    """Строка сводки: поля ответа без списка транзакций"""
+    return _line({key: value for key, value in payload.items() if key != 'transactions'})
+
+
+def record_lines(records):
+    """Транзакции, по одной JSON-строке на каждую"""
+    return ''.join(_line(record) for record in records)
+
+
+def ndjson_body(payload):
+    """Весь ответ NDJSON одним телом (для готовых ответов в памяти, например примеров)"""
+    return (summary_line(payload) + record_lines(payload.get('transactions', []))).encode('utf-8')
+
+
+def iter_ndjson(payload, frames):
+    """
+    Фрагменты ответа NDJSON: сводка, затем транзакции из последовательности DataFrame
+    Транзакции сериализуются порциями прямо из колонок, без списка словарей
+    """
+    yield summary_line(payload).encode('utf-8')
+    for frame in frames:
+        for rows in encode_records(frame, dumps, sort_keys=False):
+            yield ('\n'.join(rows) + '\n').encode('utf-8')
+
+
+def json_body(payload, frame, dumps):
+    """
+    Тело JSON-ответа: поля payload и transactions из колоночного представления
+    Транзакции сериализуются порциями прямо из колонок (serialization.encode_records), поэтому
+    в памяти нет списка словарей на каждую строку. dumps — функция сериализации приложения
+    (порядок ключей и формат значений как у jsonify)
+    """
+    head, tail = dumps(dict(payload, transactions=TRANSACTIONS_MARK)).split(dumps(TRANSACTIONS_MARK))
+    parts = [head, '[']
+    for rows in encode_records(frame, dumps):
+        if len(parts) > 2:
+            parts.append(',')
+        parts.append(','.join(rows))
+    parts.extend([']', tail])
+    return ''.join(parts).encode('utf-8')
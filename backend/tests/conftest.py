@@ -0,0 +1,36 @@
+"""
+Тесты backend: python -m pytest tests (из папки backend)
+Модули backend импортируются напрямую, как в app.py; синтетические выписки — генератором бенчмарков
+"""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def statement():
+    """Разобранная синтетическая выписка: statement(rows, seed) -> колоночный DataFrame (parse_records)"""
+    from generate_statements import generate_frame
+    from parsing import parse_records
+
+    def build(rows, seed=0):
+        return parse_records(generate_frame(rows, seed=seed).to_dict('records'))
+    return build
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Тестовый клиент Flask с хранилищем наборов и кэшем результатов во временной папке"""
+    import app as backend
+    from cache import ResultCache
+    from store import TransactionStore
+    monkeypatch.setattr(backend, 'transaction_store', TransactionStore(str(tmp_path / 'transactions.sqlite3')))
+    monkeypatch.setattr(backend, 'result_cache', ResultCache(persist_path=str(tmp_path / 'result_cache.sqlite3')))
+    return backend.app.test_client()
@@ -0,0 +1,47 @@
+"""Дозагрузка в набор: инкрементальный анализ совпадает с анализом набора, загруженного целиком"""
+
+import io
+
+import numpy as np
+
+import app as backend
+
+from generate_statements import generate_frame
+
+
+def upload(client, frame, name):
+    body = frame.to_csv(index=False).encode('utf-8')
+    response = client.post('/api/upload', data={'file': (io.BytesIO(body), name)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response.get_json()['dataset_id']
+
+
+def boundaries(frame, parts):
+    """Границы частей между разными датами: повторов на стыке частей нет, дедупликации нечего удалять"""
+    dates = frame['date'].str.slice(0, 10).to_numpy()
+    cuts = []
+    for cut in np.linspace(0, len(frame), parts + 1).astype(int)[1:-1]:
+        while dates[cut] == dates[cut - 1]:
+            cut += 1
+        cuts.append(cut)
+    return [0] + cuts + [len(frame)]
+
+
+def test_appended_analysis_matches_full_upload(client):
+    frame = generate_frame(3000, seed=7)
+    bounds = boundaries(frame, 3)
+    dataset_id = upload(client, frame.iloc[:bounds[1]], 'first.csv')
+    for start, end in zip(bounds[1:-1], bounds[2:]):
+        response = client.post(f'/api/datasets/{dataset_id}/transactions',
+                               json={'transactions': frame.iloc[start:end].to_dict('records')})
+        assert response.status_code == 200
+        appended = response.get_json()
+        assert appended['added'] == end - start
+        assert appended['dedup']['duplicates_removed'] == 0
+
+    full_id = upload(client, frame, 'full.csv')
+    full = client.get(f'/api/datasets/{full_id}/analysis').get_json()['analysis']
+    # Ответ дозагрузки — без аномалий (и их паттерна), как analysis(anomalies=False) полного набора
+    assert appended['analysis'] == backend.transaction_store.analysis(full_id, anomalies=False)
+    assert client.get(f'/api/datasets/{dataset_id}/analysis').get_json()['analysis'] == full
@@ -0,0 +1,48 @@
+"""Пакетная загрузка: пул процессов после аварийного завершения процесса"""
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import batch
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for number in range(2):
+        path = tmp_path / f'statement_{number}.csv'
+        path.write_text('date,amount,category,description\n' + ''.join(
+            f'2025-0{number + 1}-{day:02d} 12:00:00,-{100 + day},Еда,Покупка {day}\n' for day in range(1, 11)
+        ), encoding='utf-8')
+        paths.append((path.name, str(path), 'csv'))
+    return paths
+
+
+def test_broken_pool_is_recreated(files):
+    executor = batch._pool(2)
+    with pytest.raises(BrokenProcessPool):
+        executor.submit(os._exit, 1).result()
+
+    frame, reports, _ = batch.parse_batch(files, 2)
+    assert [report['error'] for report in reports] == [None, None]
+    assert len(frame) == 20
+    assert batch._executor is not executor
+
+
+def test_crash_during_parse_fails_files(files, monkeypatch):
+    def crashing(files, max_workers):
+        # Процесс пула падает во время разбора: все незавершенные файлы получают BrokenProcessPool
+        executor = batch._pool(max_workers)
+        crash = executor.submit(os._exit, 1)
+        return executor, [crash] * len(files)
+
+    monkeypatch.setattr(batch, '_submit', crashing)
+    frame, reports, _ = batch.parse_batch(files, 2)
+    assert frame is None
+    assert [report['error'] for report in reports] == [batch.POOL_BROKEN_ERROR] * 2
+
+    monkeypatch.undo()
+    frame, reports, _ = batch.parse_batch(files, 2)
+    assert len(frame) == 20
@@ -0,0 +1,50 @@
+"""Кэш ответов по наборам: удаление и вытеснение наборов не требуют очистки кэша"""
+
+import io
+
+import app as backend
+
+
+def statement(description='Покупка'):
+    return ('date,amount,category,description\n' + ''.join(
+        f'2025-03-{day:02d} 12:00:00,-{100 + day},Еда,{description} {day}\n' for day in range(1, 21))).encode('utf-8')
+
+
+CSV = statement()
+
+
+def upload(client, body=CSV, name='statement.csv'):
+    response = client.post('/api/upload', data={'file': (io.BytesIO(body), name)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response
+
+
+def test_delete_keeps_unrelated_cache(client):
+    uploaded = upload(client).get_json()
+    dataset_id, transactions = uploaded['dataset_id'], {'transactions': uploaded['transactions']}
+    assert client.post('/api/analyze', json=transactions).headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/datasets/{dataset_id}/analysis').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/datasets/{dataset_id}/analysis').headers['X-Cache'] == 'HIT'
+
+    assert client.delete(f'/api/datasets/{dataset_id}').status_code == 200
+    # Ответ по удаленному набору остался в кэше, но не отдается
+    assert client.get(f'/api/datasets/{dataset_id}/analysis').status_code == 404
+    assert client.post('/api/analyze', json=transactions).headers['X-Cache'] == 'HIT'
+
+    # Повторная загрузка того же файла создает новый набор
+    again = upload(client).get_json()['dataset_id']
+    assert again != dataset_id
+    assert client.get(f'/api/datasets/{again}/analysis').status_code == 200
+
+
+def test_evicted_dataset_is_not_served_from_cache(client, monkeypatch):
+    dataset_id = upload(client).get_json()['dataset_id']
+    assert client.get(f'/api/datasets/{dataset_id}/statistics').headers['X-Cache'] == 'MISS'
+
+    # Лимит строк на один набор: следующая загрузка вытесняет первую
+    monkeypatch.setattr(backend.transaction_store, 'max_rows', 20)
+    other = upload(client, statement('Оплата'), 'other.csv').get_json()['dataset_id']
+    assert backend.transaction_store.get(dataset_id) is None
+    assert client.get(f'/api/datasets/{dataset_id}/statistics').status_code == 404
+    assert client.get(f'/api/datasets/{other}/statistics').status_code == 200
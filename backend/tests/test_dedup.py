@@ -0,0 +1,64 @@
+"""Дедупликация выписок: повторы внутри одной выписки сохраняются, почти-повторы только попадают в отчет"""
+
+import pandas as pd
+
+from dedup import drop_known, merge_statements
+from parsing import frame_to_records, parse_records
+
+
+def statement(rows):
+    return parse_records([{'date': date, 'amount': amount, 'category': 'Транспорт', 'description': description}
+                          for date, amount, description in rows])
+
+
+def operations(frame):
+    return [(record['date'], record['amount'], record['description']) for record in frame_to_records(frame)]
+
+
+METRO = ('2025-03-01 08:00:00', -60, 'Метро')
+CAFE = ('2025-03-01 12:00:00', -500, 'Кафе')
+# Та же сумма и описание внутри окна — почти-повтор, а не повтор
+CAFE_LATER = ('2025-03-01 12:02:00', -500, 'Кафе')
+TAXI = ('2025-03-02 10:00:00', -100, 'Такси')
+
+
+def test_merge_keeps_repeats_within_statement():
+    # Две одинаковые поездки в первой выписке и три во второй: удаляются только две уже известные
+    first = statement([METRO, METRO, CAFE])
+    second = statement([('2025-03-01 08:00:00', -60, ' метро '), METRO, METRO, CAFE_LATER, TAXI])
+    merged, report, removed = merge_statements([first, second])
+
+    assert removed == [0, 2]
+    assert report['duplicates_removed'] == 2
+    assert operations(merged).count(('2025-03-01T08:00:00', -60.0, 'Метро')) == 3
+    assert len(merged) == 6
+
+
+def test_merge_reports_near_duplicates_without_removing():
+    merged, report, removed = merge_statements([statement([CAFE]), statement([CAFE_LATER, TAXI])])
+    assert removed == [0, 0]
+    assert len(merged) == 3
+    assert report['near_duplicates'] == 1
+    assert report['near_duplicate_rows'] == [{'id': 0}]
+
+
+def test_merge_outside_window_is_not_near_duplicate():
+    merged, report, _ = merge_statements([statement([CAFE]), statement([CAFE_LATER])], window=60)
+    assert len(merged) == 2
+    assert report['near_duplicates'] == 0
+
+
+def test_drop_known_keeps_extra_repeats():
+    existing = pd.DataFrame(
+        [{'date': '2025-03-01T08:00:00', 'amount': -60.0, 'description': 'Метро'},
+         {'date': '2025-03-01T12:00:00', 'amount': -500.0, 'description': 'Кафе'}]
+    )
+    frame, report = drop_known(statement([METRO, METRO, CAFE, CAFE_LATER, TAXI]), existing)
+
+    assert report['duplicates_removed'] == 2
+    assert report['near_duplicates'] == 1
+    assert operations(frame) == [
+        ('2025-03-01T08:00:00', -60.0, 'Метро'),
+        ('2025-03-01T12:02:00', -500.0, 'Кафе'),
+        ('2025-03-02T10:00:00', -100.0, 'Такси')
+    ]
@@ -0,0 +1,27 @@
+"""Примеры выписок: готовые ответы из памяти без обращений к диску на каждый запрос"""
+
+import os
+
+import example_store
+
+
+def test_load_example_hot_path_skips_filesystem(client, monkeypatch):
+    monkeypatch.setattr(example_store, 'CHECK_INTERVAL', 60)
+    path = {'file_path': 'examples/vtb_statement.csv'}
+    first = client.post('/api/load-example', json=path)
+    assert first.status_code == 200
+
+    calls = []
+    stat = os.stat
+    monkeypatch.setattr(os, 'stat', lambda *args, **kwargs: calls.append(args) or stat(*args, **kwargs))
+    for _ in range(5):
+        response = client.post('/api/load-example', json=path)
+        assert response.status_code == 200
+        assert response.get_data() == first.get_data()
+    assert calls == []
+
+
+def test_unknown_example_is_checked_on_disk(client):
+    response = client.post('/api/load-example', json={'file_path': 'examples/missing.csv'})
+    assert response.status_code == 404
+    assert 'error' in response.get_json()
@@ -0,0 +1,112 @@
+"""Реестр форматов: файл выученных форматов перечитывается только после изменения; формат даты
+запоминается только по однозначной выборке"""
+
+import json
+import os
+
+import numpy as np
+
+import formats
+import parsing
+from formats import FormatRegistry
+
+HEADER = ['Когда', 'Сколько', 'Что']
+MAPPING = {'date': 'когда', 'amount': 'сколько', 'category': 'что', 'description': None}
+
+
+def count_reads(monkeypatch):
+    reads = []
+    original = formats.json.load
+
+    def load(f):
+        reads.append(f.name)
+        return original(f)
+
+    monkeypatch.setattr(formats.json, 'load', load)
+    return reads
+
+
+def test_lookup_miss_does_not_reread_unchanged_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'formats.json')
+    FormatRegistry().enable_persistence(path)
+    writer = FormatRegistry()
+    writer.enable_persistence(path)
+    writer.learn('csv', ['a', 'b'], MAPPING, None)
+
+    registry = FormatRegistry()
+    registry.enable_persistence(path)
+    reads = count_reads(monkeypatch)
+    for _ in range(5):
+        assert registry.lookup('csv', HEADER) is None
+    assert reads == []
+
+
+def test_lookup_sees_format_learned_by_another_process(tmp_path, monkeypatch):
+    path = str(tmp_path / 'formats.json')
+    registry = FormatRegistry()
+    registry.enable_persistence(path)
+    assert registry.lookup('csv', HEADER) is None
+
+    # Другой воркер выучил формат и записал файл
+    other = FormatRegistry()
+    other.enable_persistence(path)
+    other.learn('csv', HEADER, MAPPING, '%Y-%m-%d')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+    reads = count_reads(monkeypatch)
+    entry = registry.lookup('csv', HEADER)
+    assert entry is not None and entry['date_format'] == '%Y-%m-%d'
+    assert len(reads) == 1
+    assert registry.lookup('csv', ['x']) is None
+    assert len(reads) == 1
+
+
+def test_own_write_is_not_reread(tmp_path, monkeypatch):
+    path = str(tmp_path / 'formats.json')
+    registry = FormatRegistry()
+    registry.enable_persistence(path)
+    registry.learn('csv', HEADER, MAPPING, None)
+    with open(path, 'r', encoding='utf-8') as f:
+        assert len(json.load(f)) == 1
+
+    reads = count_reads(monkeypatch)
+    assert registry.lookup('csv', ['x']) is None
+    assert reads == []
+
+
+def write_statement(tmp_path, name, dates):
+    path = tmp_path / name
+    path.write_text('Когда,Сколько,Что\n' + ''.join(f'{date} 10:00:00,-{100 + i},Еда\n' for i, date in enumerate(dates)),
+                    encoding='utf-8')
+    return str(path)
+
+
+def timestamps(frame):
+    return [str(value)[:10] for value in frame['timestamp'].to_numpy(dtype='datetime64[D]')]
+
+
+def test_ambiguous_sample_does_not_fix_date_format(tmp_path, monkeypatch):
+    registry = FormatRegistry()
+    monkeypatch.setattr(parsing, 'registry', registry)
+
+    # Все дни не больше 12: порядок дня и месяца по выборке не определить
+    parsing.load_transactions_frame(write_statement(tmp_path, 'first.csv', ['03/04/2025', '05/06/2025']), 'csv')
+    assert registry.lookup('csv', HEADER)['date_format'] is None
+
+    # Следующая выписка с тем же заголовком однозначна — формат выводится по ней и запоминается
+    frame = parsing.load_transactions_frame(write_statement(tmp_path, 'second.csv', ['04/25/2025', '03/04/2025']),
+                                            'csv')
+    assert timestamps(frame) == ['2025-04-25', '2025-03-04']
+    assert registry.lookup('csv', HEADER)['date_format'] == '%m/%d/%Y %H:%M:%S'
+
+
+def test_registry_format_not_trusted_when_rows_do_not_fit(tmp_path, monkeypatch):
+    registry = FormatRegistry()
+    monkeypatch.setattr(parsing, 'registry', registry)
+    # Формат, выученный раньше по выписке с другим порядком дня и месяца
+    registry.learn('csv', HEADER, MAPPING, '%d/%m/%Y %H:%M:%S')
+
+    frame = parsing.load_transactions_frame(write_statement(tmp_path, 'us.csv', ['04/25/2025', '03/04/2025']), 'csv')
+    assert timestamps(frame) == ['2025-04-25', '2025-03-04']
+    assert np.all(frame['hour'].to_numpy() == 10)
@@ -0,0 +1,33 @@
+"""Фоновые задачи: долгий разбор XLS/JSON не считается прерванным"""
+
+import json
+import time
+
+import jobs
+from jobs import JobStore
+
+
+def test_json_job_heartbeat_during_parse(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'), str(tmp_path / 'jobs'))
+    path = tmp_path / 'statement.json'
+    path.write_text(json.dumps([{'date': f'2025-03-{day:02d} 12:00:00', 'amount': -100 * day, 'category': 'Еда'}
+                                for day in range(1, 11)]), encoding='utf-8')
+    job_id = store.create('statement.json', str(path), 'json')
+
+    parse = jobs.parse_transactions_frame
+    seen = []
+
+    def slow_parse(file_path, file_type):
+        started = store.get(job_id)['updated']
+        time.sleep(0.3)
+        seen.append(store.get(job_id)['updated'] > started)
+        return parse(file_path, file_type)
+
+    monkeypatch.setattr(jobs, 'HEARTBEAT_SECONDS', 0.05)
+    monkeypatch.setattr(jobs, 'parse_transactions_frame', slow_parse)
+    jobs.run_upload_job(store.db_path, store.results_dir, job_id)
+
+    assert seen == [True]
+    job = store.get(job_id)
+    assert job['status'] == 'done'
+    assert job['rows'] == 10
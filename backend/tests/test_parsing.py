@@ -0,0 +1,35 @@
+"""Колоночный разбор: результат на примерах выписок совпадает с построчным разбором до перехода на колонки"""
+
+import json
+import os
+
+import pytest
+
+import parsing
+from formats import FormatRegistry
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+# Вывод исходного parse_transactions (iterrows) на examples/, зафиксированный до оптимизации
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'baseline_transactions.json')
+
+with open(BASELINE_PATH, encoding='utf-8') as f:
+    BASELINE = json.load(f)
+
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    # Выученные форматы не должны попадать в data/processed и влиять на другие тесты
+    monkeypatch.setattr(parsing, 'registry', FormatRegistry())
+
+
+@pytest.mark.parametrize('name', sorted(BASELINE))
+def test_parse_matches_baseline(name):
+    records = parsing.parse_transactions(os.path.join(EXAMPLES_DIR, name), name.rsplit('.', 1)[1])
+    assert records == BASELINE[name]
+
+
+@pytest.mark.parametrize('name', sorted(BASELINE))
+def test_parse_records_matches_file_parse(name):
+    # /api/analyze и /api/statistics разбирают JSON тем же колоночным разбором
+    raw = [{key: record[key] for key in ('date', 'amount', 'category', 'description')} for record in BASELINE[name]]
+    assert parsing.frame_to_records(parsing.parse_records(raw)) == BASELINE[name]
@@ -0,0 +1,50 @@
+"""Векторный анализ риска: результат на примерах выписок совпадает с построчным расчетом до перехода на NumPy"""
+
+import json
+import os
+
+import pytest
+
+import parsing
+from formats import FormatRegistry
+from risk import analyze_risk_patterns
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def load(name):
+    with open(os.path.join(DATA_DIR, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Вывод исходного analyze_risk_patterns (цикл по транзакциям) на examples/; anomalies появились позже
+BASELINE = load('baseline_analysis.json')
+TRANSACTIONS = load('baseline_transactions.json')
+
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(parsing, 'registry', FormatRegistry())
+
+
+def without_anomalies(analysis):
+    assert 'anomalies' in analysis
+    return {key: value for key, value in analysis.items() if key != 'anomalies'}
+
+
+@pytest.mark.parametrize('name', sorted(BASELINE))
+def test_analysis_of_frame_matches_baseline(name):
+    frame = parsing.load_transactions_frame(os.path.join(EXAMPLES_DIR, name), name.rsplit('.', 1)[1])
+    assert without_anomalies(analyze_risk_patterns(frame)) == BASELINE[name]
+
+
+@pytest.mark.parametrize('name', sorted(BASELINE))
+def test_analysis_of_records_matches_baseline(name):
+    # Список словарей (JSON /api/analyze) считается тем же векторным кодом
+    assert without_anomalies(analyze_risk_patterns(TRANSACTIONS[name])) == BASELINE[name]
+
+
+def test_analysis_of_frame_matches_records(statement):
+    frame = statement(5000, seed=3)
+    assert analyze_risk_patterns(frame) == analyze_risk_patterns(parsing.frame_to_records(frame))
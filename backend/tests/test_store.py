@@ -0,0 +1,77 @@
+"""Хранилище наборов: параллельные дозагрузки и анализ набора после дозагрузок"""
+
+import sqlite3
+import threading
+
+from anomalies import compute_baselines
+from parsing import parse_records
+from risk import analyze_risk_patterns
+from store import TransactionStore
+
+WRITERS = 12
+ROWS = 25
+
+
+def records(writer):
+    return [{'date': f'2025-03-{day:02d} {writer % 24:02d}:15:00', 'amount': -(100 * writer + day),
+             'category': 'Еда', 'description': f'Покупка {writer}-{day}'} for day in range(1, ROWS + 1)]
+
+
+def test_concurrent_appends_do_not_collide(tmp_path):
+    path = str(tmp_path / 'transactions.sqlite3')
+    store = TransactionStore(path)
+    dataset_id = store.save(parse_records(records(0)), 'base.csv', 'csv')
+
+    barrier = threading.Barrier(WRITERS)
+    errors = []
+
+    def append(writer):
+        frame = parse_records(records(writer))
+        # Отдельный экземпляр хранилища — как у другого воркера gunicorn
+        other = TransactionStore(path)
+        barrier.wait()
+        try:
+            other.append(dataset_id, frame, renumber=True)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=append, args=(writer,)) for writer in range(1, WRITERS + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    total = ROWS * (WRITERS + 1)
+    assert store.get(dataset_id)['rows'] == total
+    with sqlite3.connect(path) as conn:
+        positions, ids = zip(*conn.execute('SELECT position, id FROM transactions ORDER BY position'))
+    assert list(positions) == list(range(total))
+    assert sorted(ids) == list(range(total))
+
+    # Накопленное состояние анализа учитывает все дозагрузки (ни одно обновление не потеряно)
+    expected = TransactionStore(str(tmp_path / 'expected.sqlite3'))
+    reference = expected.save(parse_records(sum((records(writer) for writer in range(WRITERS + 1)), [])),
+                              'all.csv', 'csv')
+    analysis = store.analysis(dataset_id)
+    assert analysis['total_transactions'] == total
+    assert analysis['statistics'] == expected.analysis(reference)['statistics']
+
+
+def test_analysis_after_appends_matches_full_recompute(tmp_path, statement):
+    frame = statement(5000, seed=3)
+    store = TransactionStore(str(tmp_path / 'transactions.sqlite3'))
+    dataset_id = store.save(frame.iloc[:4500], 'base.csv', 'csv')
+    # Анализ после каждой дозагрузки: кэш баз и аномалий предыдущего размера не должен использоваться
+    store.analysis(dataset_id)
+    store.append(dataset_id, frame.iloc[4500:4600])
+    store.analysis(dataset_id)
+    store.append(dataset_id, frame.iloc[4600:])
+
+    analysis = store.analysis(dataset_id)
+    assert analysis['anomalies']['count'] > 0
+    assert analysis == analyze_risk_patterns(frame)
+    assert store.baselines(dataset_id) == compute_baselines(frame['category'], frame['hour'], frame['amount'])
+    # Ответы дозагрузок — накопленный анализ риска без аномалий (без чтения набора)
+    assert 'anomalies' not in store.analysis(dataset_id, anomalies=False)
+
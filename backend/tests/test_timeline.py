@@ -0,0 +1,68 @@
+"""Риск во времени: окна и дневной ряд"""
+
+import numpy as np
+import pytest
+
+from parsing import frame_to_records, parse_records
+from risk import risk_scores
+from timeline import build_timeline
+
+# Разобранные транзакции (с hour и day_of_week), как их возвращает /api/upload
+TRANSACTIONS = frame_to_records(parse_records([
+    {'date': f'2025-03-{day:02d} {hour:02d}:00:00', 'amount': -100 * day, 'category': 'Еда'}
+    for day in range(1, 31) for hour in (9, 23)
+]))
+
+
+@pytest.mark.parametrize('days', ['abc', '-3', '0', '2.5'])
+def test_invalid_days_is_rejected(client, days):
+    response = client.post(f'/api/timeline?days={days}', json={'transactions': TRANSACTIONS})
+    assert response.status_code == 400
+    assert 'days' in response.get_json()['error']
+
+
+def test_days_limits_daily_series(client):
+    response = client.post('/api/timeline?days=7', json={'transactions': TRANSACTIONS})
+    assert response.status_code == 200
+    assert len(response.get_json()['timeline']['daily']['dates']) == 7
+
+
+def reference_window(timestamps, risk, amounts, end, window):
+    """Окно (end - window, end] перебором всех транзакций"""
+    inside = (timestamps > end - window) & (timestamps <= end)
+    return int(inside.sum()), round(float(amounts[inside].sum()), 2), round(float(risk[inside].mean()), 2)
+
+
+def test_windows_match_brute_force(statement):
+    frame = statement(2000, seed=5)
+    timeline = build_timeline(frame, '24h,7d,30d')
+    timestamps = frame['timestamp'].to_numpy().astype('datetime64[s]')
+    risk = risk_scores(frame['hour'].to_numpy(), frame['day_of_week'].to_numpy(),
+                       frame['amount'].to_numpy()).astype(np.float64)
+    amounts = np.abs(frame['amount'].to_numpy(dtype=np.float64))
+    last = timestamps.max()
+
+    assert [window['window'] for window in timeline['windows']] == ['24h', '7d', '30d']
+    for window, length in zip(timeline['windows'], (np.timedelta64(24, 'h'), np.timedelta64(7, 'D'),
+                                                    np.timedelta64(30, 'D'))):
+        length = length.astype('m8[s]')
+        assert (window['count'], window['amount'], window['risk_score']) == reference_window(
+            timestamps, risk, amounts, last, length)
+        # Пик — окно с наибольшим суммарным риском среди окон, заканчивающихся транзакциями
+        totals = [risk[(timestamps > end - length) & (timestamps <= end)].sum() for end in timestamps]
+        peak_end = np.datetime64(window['peak']['end'])
+        assert risk[(timestamps > peak_end - length) & (timestamps <= peak_end)].sum() == max(totals)
+
+
+def test_days_is_suffix_of_full_series(statement):
+    frame = statement(2000, seed=5)
+    full = build_timeline(frame)['daily']
+    last_week = build_timeline(frame, days=7)['daily']
+    assert set(last_week) == set(full)
+    for name, values in last_week.items():
+        assert values == full[name][-7:]
+    # Ряд без пропусков: семь подряд идущих дней до последней транзакции
+    dates = np.array(last_week['dates'], dtype='datetime64[D]')
+    assert np.all(np.diff(dates) == np.timedelta64(1, 'D'))
+    assert dates[-1] == frame['timestamp'].max().to_datetime64().astype('datetime64[D]')
+    assert len(build_timeline(frame, days=10000)['daily']['dates']) == len(full['dates'])
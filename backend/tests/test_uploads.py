@@ -0,0 +1,29 @@
+"""Лимиты тела запроса: большой — только у загрузок файлов"""
+
+import io
+import json
+
+import uploads
+
+
+def test_json_routes_keep_small_limit(client, monkeypatch):
+    monkeypatch.setattr(uploads, 'BODY_MAX_SIZE', 1024)
+    body = json.dumps({'transactions': [{'date': '2025-03-01 12:00:00', 'amount': -100}] * 50})
+    assert len(body) > 1024
+
+    response = client.post('/api/analyze', data=body, content_type='application/json')
+    assert response.status_code == 413
+    assert 'error' in response.get_json()
+    assert client.post('/api/statistics', data=body, content_type='application/json').status_code == 413
+
+
+def test_file_upload_uses_upload_limit(client, monkeypatch):
+    monkeypatch.setattr(uploads, 'BODY_MAX_SIZE', 1024)
+    content = ('date,amount,category,description\n' + ''.join(
+        f'2025-03-{day:02d} 12:00:00,-{100 + day},Еда,Покупка {day}\n' for day in range(1, 29))).encode('utf-8')
+    assert len(content) > 1024
+
+    response = client.post('/api/upload', data={'file': (io.BytesIO(content), 'statement.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 28
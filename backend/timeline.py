@@ -0,0 +1,161 @@
+"""
+Риск во времени
+analyze_risk_patterns оценивает риск по последним позициям списка (в порядке файла), а здесь —
+по реальному времени: окна последних 24 часов, 7 и 30 дней и дневной ряд для графиков.
+
+Транзакции сортируются по времени один раз. Суммы по окнам — разности накопленных сумм (cumsum):
+начало окна каждой транзакции находится одним searchsorted по отсортированным временам, поэтому
+окна не пересматриваются, а время после сортировки линейно и на многолетней истории.
+Дневной ряд — bincount по номеру дня и те же накопленные суммы по дням
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from risk import risk_level, risk_scores
+
+# Окна по умолчанию (от последней транзакции назад)
+DEFAULT_WINDOWS = ('24h', '7d', '30d')
+
+# Скользящие средние дневного ряда (в днях)
+DAILY_WINDOWS = (7, 30)
+
+WINDOW_UNITS = {'h': 'h', 'd': 'D'}
+MAX_WINDOWS = 10
+
+
+def parse_windows(text):
+    """Окна из строки вида '24h,7d,30d' -> [(имя, numpy.timedelta64)]; ValueError при ошибке"""
+    names = [name.strip() for name in text.split(',') if name.strip()] if isinstance(text, str) else list(text)
+    if not names or len(names) > MAX_WINDOWS:
+        raise ValueError(f'Нужно от 1 до {MAX_WINDOWS} окон')
+    windows = []
+    for name in names:
+        match = re.fullmatch(r'(\d+)([hd])', name)
+        if match is None or int(match.group(1)) == 0:
+            raise ValueError(f'Некорректное окно: {name} (например, 24h или 7d)')
+        windows.append((name, np.timedelta64(int(match.group(1)), WINDOW_UNITS[match.group(2)]).astype('m8[s]')))
+    return windows
+
+
+def _timestamps(values):
+    """ISO-строки -> datetime64[s] (местное время без смещения пояса, как timestamp у parse_frame); ошибки -> NaT"""
+    local = pd.Series(values, dtype=object).str.slice(0, 19)
+    return pd.to_datetime(local, errors='coerce', format='ISO8601').to_numpy(dtype='datetime64[s]')
+
+
+def _arrays(transactions):
+    """(timestamps, hours, weekdays, amounts) из списка словарей или колоночного DataFrame"""
+    if isinstance(transactions, pd.DataFrame):
+        if 'timestamp' in transactions:
+            timestamps = transactions['timestamp'].to_numpy(dtype='datetime64[ns]').astype('datetime64[s]')
+        else:
+            timestamps = _timestamps(transactions['date'].to_numpy(dtype=object))
+        return (timestamps, transactions['hour'].to_numpy(dtype=np.int64),
+                transactions['day_of_week'].to_numpy(dtype=np.int64),
+                transactions['amount'].to_numpy(dtype=np.float64))
+
+    n = len(transactions)
+    return (
+        _timestamps([t['date'] for t in transactions]),
+        np.fromiter((t['hour'] for t in transactions), dtype=np.int64, count=n),
+        np.fromiter((t['day_of_week'] for t in transactions), dtype=np.int64, count=n),
+        np.array([t['amount'] for t in transactions], dtype=np.float64)
+    )
+
+
+def _cumsum(values):
+    """Накопленные суммы с нулем в начале: сумма values[i:j] = result[j] - result[i]"""
+    return np.concatenate(([0], np.cumsum(values)))
+
+
+def _iso(value):
+    return np.datetime_as_string(value, unit='s')
+
+
+def _round(values):
+    """Список для JSON: NaN (нет транзакций) -> None"""
+    return [None if value != value else value for value in np.round(values, 2).tolist()]
+
+
+def _window_summary(count, amount, risk, index, end, window):
+    """Окно, заканчивающееся транзакцией index: количество, сумма и средний риск"""
+    score = float(risk[index] / count[index])
+    return {
+        'start': _iso(end - window),
+        'end': _iso(end),
+        'count': int(count[index]),
+        'amount': round(float(amount[index]), 2),
+        'risk_score': round(score, 2),
+        'risk_level': risk_level(score)
+    }
+
+
+def build_timeline(transactions, windows=DEFAULT_WINDOWS, days=None):
+    """
+    Риск по окнам времени и дневной ряд
+    windows — окна ('24h', '7d'...), days — сколько последних дней дневного ряда вернуть (по умолчанию все)
+    Для каждого окна: текущее (заканчивается последней транзакцией) и пиковое (наибольший суммарный риск)
+    """
+    windows = parse_windows(windows)
+    timestamps, hours, weekdays, amounts = _arrays(transactions)
+    risk = risk_scores(hours, weekdays, amounts)
+
+    # Единственная сортировка — по времени; транзакции без даты не участвуют
+    dated = ~np.isnat(timestamps)
+    order = np.argsort(timestamps[dated], kind='stable')
+    timestamps = timestamps[dated][order]
+    risk = risk[dated][order].astype(np.float64)
+    amounts = np.nan_to_num(np.abs(amounts[dated][order]))
+    n = len(timestamps)
+    result = {'total_transactions': n, 'skipped': int(np.count_nonzero(~dated))}
+    if n == 0:
+        daily = ['dates', 'count', 'amount', 'risk_score'] + [f'risk_{length}d' for length in DAILY_WINDOWS]
+        return dict(result, range=None, windows=[], daily={name: [] for name in daily})
+
+    result['range'] = {'from': _iso(timestamps[0]), 'to': _iso(timestamps[-1])}
+    risk_sum = _cumsum(risk)
+    amount_sum = _cumsum(amounts)
+    # Окно транзакции включает все транзакции с тем же временем
+    ends = np.searchsorted(timestamps, timestamps, side='right')
+
+    # Окна (t - window, t] для каждой транзакции: начало — searchsorted, суммы — разности cumsum
+    result['windows'] = []
+    for name, window in windows:
+        starts = np.searchsorted(timestamps, timestamps - window, side='right')
+        count = ends - starts
+        window_risk = risk_sum[ends] - risk_sum[starts]
+        window_amount = amount_sum[ends] - amount_sum[starts]
+        peak = int(np.argmax(window_risk))
+        result['windows'].append(dict(
+            _window_summary(count, window_amount, window_risk, n - 1, timestamps[-1], window),
+            window=name,
+            peak=_window_summary(count, window_amount, window_risk, peak, timestamps[peak], window)
+        ))
+
+    # Дневной ряд без пропусков между первым и последним днем
+    day_numbers = timestamps.astype('datetime64[D]').astype(np.int64)
+    day_index = day_numbers - day_numbers[0]
+    span = int(day_index[-1]) + 1
+    day_count = np.bincount(day_index, minlength=span)
+    day_risk = np.bincount(day_index, weights=risk, minlength=span)
+    day_amount = np.bincount(day_index, weights=amounts, minlength=span)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        daily = {
+            'count': day_count.tolist(),
+            'amount': np.round(day_amount, 2).tolist(),
+            'risk_score': _round(day_risk / day_count)
+        }
+        count_sum, day_risk_sum = _cumsum(day_count), _cumsum(day_risk)
+        ends = np.arange(1, span + 1)
+        for length in DAILY_WINDOWS:
+            starts = np.maximum(ends - length, 0)
+            daily[f'risk_{length}d'] = _round((day_risk_sum[ends] - day_risk_sum[starts])
+                                              / (count_sum[ends] - count_sum[starts]))
+
+    first = 0 if days is None else max(span - int(days), 0)
+    dates = np.datetime_as_string(np.datetime64(int(day_numbers[0]), 'D') + np.arange(first, span), unit='D')
+    result['daily'] = dict({name: values[first:] for name, values in daily.items()}, dates=dates.tolist())
+    return result
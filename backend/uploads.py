@@ -0,0 +1,92 @@
+"""
+Прием загружаемых файлов без промежуточного сохранения
+Werkzeug пишет файл из multipart-запроса в поток, который создает UploadRequest: до UPLOAD_SPOOL_SIZE
+байт — в память, больше — во временный файл без имени в папке загрузок (уникален для запроса и
+удаляется при закрытии, в том числе если процесс упал). SHA-256 считается по ходу записи, поэтому
+для ключа кэша файл не перечитывается; парсеры читают тот же поток (parsing принимает потоки)
+"""
+
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+
+from cache import file_digest
+
+# Сколько байт загрузки держать в памяти до перехода во временный файл
+UPLOAD_SPOOL_SIZE = int(os.getenv('UPLOAD_SPOOL_MB', 16)) * 1024 * 1024
+
+# Маршруты загрузки файлов: тело принимается потоком в HashingSpool, для них действует общий лимит
+# MAX_CONTENT_LENGTH. JSON остальных маршрутов разбирается в памяти целиком — лимит BODY_MAX_SIZE
+UPLOAD_ENDPOINTS = ('upload_file', 'upload_batch')
+BODY_MAX_SIZE = 16 * 1024 * 1024
+
+
+class HashingSpool:
+    """
+    Поток загрузки: tempfile.SpooledTemporaryFile и SHA-256 записанных байтов
+    Werkzeug только дописывает в поток и затем переводит его на начало, поэтому хеш
+    после разбора запроса — хеш всего файла
+    """
+
+    def __init__(self, max_size, directory=None):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_size, mode='w+b', dir=directory)
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    # SpooledTemporaryFile в Python < 3.11 не объявляет эти методы, а pandas и zipfile их проверяют
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Запрос, файлы которого принимаются в HashingSpool (app.request_class)"""
+
+    @property
+    def max_content_length(self):
+        """Лимит тела запроса: MAX_CONTENT_LENGTH у загрузок файлов, BODY_MAX_SIZE у остальных маршрутов"""
+        limit = super().max_content_length
+        if self.endpoint in UPLOAD_ENDPOINTS or limit is None:
+            return limit
+        return min(limit, BODY_MAX_SIZE)
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpool(UPLOAD_SPOOL_SIZE, current_app.config.get('UPLOAD_FOLDER'))
+
+
+def upload_digest(file):
+    """SHA-256 загруженного файла (werkzeug FileStorage): посчитанный при приеме или чтением потока"""
+    if isinstance(file.stream, HashingSpool):
+        return file.stream.hexdigest()
+    return file_digest(file.stream)
+
+
+def upload_size(file):
+    """Размер загруженного файла в байтах"""
+    if isinstance(file.stream, HashingSpool):
+        return file.stream.size
+    position = file.stream.tell()
+    size = file.stream.seek(0, os.SEEK_END)
+    file.stream.seek(position)
+    return size
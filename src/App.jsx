@@ -11,17 +11,35 @@ function App() {
   const [transactions, setTransactions] = useState([])
   const [analysis, setAnalysis] = useState(null)
   const [loading, setLoading] = useState(false)
+  // Набор на сервере: анализ запрашивается по id, транзакции повторно не отправляются
+  const [datasetId, setDatasetId] = useState(null)
 
   const handleFileUpload = async (fileData) => {
+    setDatasetId(fileData.dataset_id || null)
     setTransactions(fileData.transactions || [])
     setAnalysis(fileData.analysis || null)
   }
 
+  // Анализ сохраненного набора; браузер перепроверяет его по ETag и получает 304, если набор не менялся
+  const fetchDatasetAnalysis = async (id) => {
+    const response = await fetch(`${API_ENDPOINTS.datasets}/${id}/analysis`)
+    if (!response.ok) return null
+    const data = await response.json()
+    return data.success ? data.analysis : null
+  }
+
   const handleAnalyze = async (newTransactions) => {
     if (!newTransactions || newTransactions.length === 0) return
 
     setLoading(true)
     try {
+      // Набор мог быть удален по сроку или лимиту хранения — тогда анализ по самим транзакциям
+      const datasetAnalysis = datasetId ? await fetchDatasetAnalysis(datasetId) : null
+      if (datasetAnalysis) {
+        setAnalysis(datasetAnalysis)
+        return
+      }
+
       const response = await fetch(API_ENDPOINTS.analyze, {
         method: 'POST',
         headers: {
@@ -42,7 +60,8 @@ function App() {
   }
 
   useEffect(() => {
-    if (transactions.length > 0) {
+    // Ответ загрузки уже содержит анализ
+    if (transactions.length > 0 && !analysis) {
       handleAnalyze(transactions)
     }
   }, [transactions])
@@ -1,10 +1,14 @@
 import React, { useState } from 'react'
 import './TransactionList.css'
 
+// Сколько транзакций рисовать за раз (большие выписки показываются порциями)
+const PAGE_SIZE = 100
+
 const TransactionList = ({ transactions }) => {
   const [sortBy, setSortBy] = useState('date')
   const [sortOrder, setSortOrder] = useState('desc')
   const [filterCategory, setFilterCategory] = useState('all')
+  const [visibleCount, setVisibleCount] = useState(PAGE_SIZE)
 
   const categories = ['all', ...new Set(transactions.map(t => t.category))]
 
@@ -37,6 +41,8 @@ const TransactionList = ({ transactions }) => {
     ? sortedTransactions
     : sortedTransactions.filter(t => t.category === filterCategory)
 
+  const visibleTransactions = filteredTransactions.slice(0, visibleCount)
+
   const formatDate = (dateString) => {
     const date = new Date(dateString)
     return date.toLocaleDateString('ru-RU', {
@@ -73,7 +79,7 @@ const TransactionList = ({ transactions }) => {
         <div className="transaction-controls">
           <select
             value={sortBy}
-            onChange={(e) => setSortBy(e.target.value)}
+            onChange={(e) => { setSortBy(e.target.value); setVisibleCount(PAGE_SIZE) }}
             className="control-select"
           >
             <option value="date">Сортировать по дате</option>
@@ -82,7 +88,7 @@ const TransactionList = ({ transactions }) => {
           </select>
 
           <button
-            onClick={() => setSortOrder(sortOrder === 'asc' ? 'desc' : 'asc')}
+            onClick={() => { setSortOrder(sortOrder === 'asc' ? 'desc' : 'asc'); setVisibleCount(PAGE_SIZE) }}
             className="control-button"
           >
             {sortOrder === 'asc' ? '↑' : '↓'}
@@ -90,7 +96,7 @@ const TransactionList = ({ transactions }) => {
 
           <select
             value={filterCategory}
-            onChange={(e) => setFilterCategory(e.target.value)}
+            onChange={(e) => { setFilterCategory(e.target.value); setVisibleCount(PAGE_SIZE) }}
             className="control-select"
           >
             {categories.map(cat => (
@@ -108,7 +114,7 @@ const TransactionList = ({ transactions }) => {
             <p>Нет транзакций для отображения</p>
           </div>
         ) : (
-          filteredTransactions.map((transaction) => (
+          visibleTransactions.map((transaction) => (
             <div key={transaction.id} className="transaction-item">
               <div className="transaction-main">
                 <div className="transaction-info">
@@ -126,6 +132,14 @@ const TransactionList = ({ transactions }) => {
             </div>
           ))
         )}
+        {filteredTransactions.length > visibleTransactions.length && (
+          <button
+            onClick={() => setVisibleCount(visibleCount + PAGE_SIZE)}
+            className="control-button"
+          >
+            Показать еще ({filteredTransactions.length - visibleTransactions.length})
+          </button>
+        )}
       </div>
     </div>
   )
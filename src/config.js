@@ -24,6 +24,7 @@ export const API_ENDPOINTS = {
   upload: `${API_BASE_URL}/upload`,
   analyze: `${API_BASE_URL}/analyze`,
   statistics: `${API_BASE_URL}/statistics`,
+  datasets: `${API_BASE_URL}/datasets`,
   examples: `${API_BASE_URL}/examples`,
   loadExample: `${API_BASE_URL}/load-example`,
   loadAllExamples: `${API_BASE_URL}/load-all-examples`,